@@ -1,12 +1,19 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, request, jsonify, send_file
 from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 import os
 from database.db import DatabaseManager
-from settings import get_db_config, get_paths, is_development
-from engine.model import Model
+from settings import get_db_config, get_paths, get_vector_index_config, get_knn_graph_config, get_keyword_scores_config, get_columnar_index_config, get_encoder_config, get_embedding_cache_config, get_model_registry_config, get_encoder_service_config, get_ranking_cache_config, get_result_cache_config, get_single_flight_config, is_development
+from engine.model import get_cache_key, load_model as load_model_from_config
+from engine.encoder_service import RemoteModel
+from engine.cache import EmbeddingCache
+from engine.registry import ModelRegistry
+from engine.ranking_cache import RankingCache
+from engine.ttl_cache import TTLCache, canonical_key
+from engine.singleflight import SingleFlight
 import math
+import threading
 import torch
 
 app = Flask(__name__)
@@ -24,50 +31,143 @@ def formatReturn(
     data: dict = None,
     python_error: Exception = None,
     user_error: str = "",
-    error_code: int = 200
+    error_code: int = 200,
+    cursor: str = None
 ):
     if python_error is not None:
         # TODO: Log the error into a Logger
         print(f"Error: {python_error}")
     
-    response = jsonify({
+    body = {
         "success": success,
         "data": data,
         "error_message": user_error,
         "error_code": error_code
-    })
+    }
+    if cursor is not None:
+        # Sent back with the next pages (see RankingCache)
+        body["cursor"] = cursor
+    response = jsonify(body)
     response.headers['Content-Type'] = 'application/json; charset=utf-8'
     return response
 
+def formatCachedReturn(payload: bytes):
+    # Response already serialized by formatReturn (see RESULT_CACHE)
+    return Response(payload, status=200, headers={'Content-Type': 'application/json; charset=utf-8'})
+
 # Initialize models
 device = "cuda" if torch.cuda.is_available() else "cpu"
 # CUDA not needed for one inference at a time !
-# TODO: Batch inference for long queries
+# The terms of a query are encoded in one batch, and concurrent requests can be coalesced (ENCODER_MICRO_BATCHING)
 device = "cpu"
 
 print(f"Using device: {device}")
 
-MODELS = {}
-print(f"Loading models...")
-for embedding in get_paths()["embeddings"]:
-    print(f"Loading model {embedding['name']}...")
-    MODELS[embedding["name"]] = Model(
-        embedding["name"],
-        embedding["base_name"],
-        embedding["weights_path"],
-        device=device
+ENCODER_CONFIG = get_encoder_config()
+
+# Shared by every model (the keys contain the model name)
+EMBEDDING_CACHE_CONFIG = get_embedding_cache_config()
+EMBEDDING_CACHE = None
+if EMBEDDING_CACHE_CONFIG["enabled"]:
+    EMBEDDING_CACHE = EmbeddingCache(
+        max_entries=EMBEDDING_CACHE_CONFIG["max_entries"],
+        path=EMBEDDING_CACHE_CONFIG["path"]
     )
-    print(f"✓ : Model {embedding['name']} loaded")
-print(f"Models loaded")
+
+EMBEDDINGS_CONFIG = {embedding["name"]: embedding for embedding in get_paths()["embeddings"]}
+
+ENCODER_SERVICE_CONFIG = get_encoder_service_config()
+
+def load_model(model_name):
+    embedding = EMBEDDINGS_CONFIG[model_name]
+    if ENCODER_SERVICE_CONFIG["socket_path"] is not None:
+        # The model lives in the encoder service (encoder_service.py), shared by every worker
+        return RemoteModel(
+            model_name,
+            ENCODER_SERVICE_CONFIG["socket_path"],
+            timeout=ENCODER_SERVICE_CONFIG["timeout"],
+            cache=EMBEDDING_CACHE,
+            cache_key=get_cache_key(model_name, embedding["backend"], embedding["weights_path"])
+        )
+
+    print(f"Loading model {model_name}...")
+    model = load_model_from_config(embedding, device, ENCODER_CONFIG, cache=EMBEDDING_CACHE)
+    print(f"✓ : Model {model_name} loaded")
+    return model
+
+# The models are loaded on first use, or in background at startup (MODEL_REGISTRY_PRELOAD)
+MODEL_REGISTRY_CONFIG = get_model_registry_config()
+MODELS = ModelRegistry(
+    list(EMBEDDINGS_CONFIG.keys()),
+    load_model,
+    idle_timeout=MODEL_REGISTRY_CONFIG["idle_timeout"],
+    memory_budget=MODEL_REGISTRY_CONFIG["memory_budget"],
+    pinned=MODEL_REGISTRY_CONFIG["pinned"],
+    load_timeout=MODEL_REGISTRY_CONFIG["load_timeout"]
+)
+if MODEL_REGISTRY_CONFIG["preload"] is None:
+    preloaded_models = MODELS.keys()
+else:
+    preloaded_models = [model_name for model_name in MODEL_REGISTRY_CONFIG["preload"] if model_name in MODELS]
+print(f"Loading models {', '.join(preloaded_models)}...")
+MODELS.preload(preloaded_models, background=MODEL_REGISTRY_CONFIG["background"])
 
 # Initialize database manager
 print("Initializing database manager...")
-DB_MANAGER = DatabaseManager(get_db_config(), get_paths(), MODELS)
+DB_MANAGER = DatabaseManager(get_db_config(), get_paths(), MODELS, get_vector_index_config(), get_knn_graph_config(), get_keyword_scores_config(), get_columnar_index_config())
 print("MODELS:")
 for modelData in list(DB_MANAGER.get_models().keys()):
     print(f"  - {modelData}")
 print("✓ : Database manager initialized")
 
+# Ranked lists of the queries and similar artworks, under the cursors sent back to the client
+RANKING_CACHE_CONFIG = get_ranking_cache_config()
+RANKING_CACHE = RankingCache(
+    max_entries=RANKING_CACHE_CONFIG["max_entries"],
+    ttl=RANKING_CACHE_CONFIG["ttl"],
+    depth=RANKING_CACHE_CONFIG["depth"]
+)
+
+# Serialized responses of the identical queries, keyed by the canonical request (after the clamping)
+RESULT_CACHE_CONFIG = get_result_cache_config()
+RESULT_CACHE = None
+if RESULT_CACHE_CONFIG["enabled"]:
+    RESULT_CACHE = TTLCache(
+        max_entries=RESULT_CACHE_CONFIG["max_entries"],
+        ttl=RESULT_CACHE_CONFIG["ttl"],
+        max_size=RESULT_CACHE_CONFIG["max_size"],
+        sizeof=len
+    )
+
+# Concurrent identical requests wait for the first one instead of computing the same result
+SINGLE_FLIGHT = SingleFlight(timeout=get_single_flight_config()["timeout"])
+
+# Incremented on each data change: the results computed before are never cached (see cache_if_fresh)
+DATA_GENERATION = 0
+DATA_GENERATION_LOCK = threading.Lock()
+
+def dataChangedHandler():
+    # The cached results and rankings are stale once the data changes (populate, reset, ...)
+    global DATA_GENERATION
+    with DATA_GENERATION_LOCK:
+        DATA_GENERATION += 1
+        if RESULT_CACHE is not None:
+            RESULT_CACHE.clear()
+        RANKING_CACHE.clear()
+    print("✓ : Result caches cleared")
+
+def cache_if_fresh(generation, put):
+    """
+        Calls put (which stores a result computed during the given generation) unless the data changed since,
+        returns its result or None. Under the lock of dataChangedHandler: a result is never stored after the clear.
+    """
+    with DATA_GENERATION_LOCK:
+        if generation != DATA_GENERATION:
+            return None
+        return put()
+
+DB_MANAGER.add_data_change_handler(dataChangedHandler)
+
 MIN_PAGE_SIZE = 1
 MAX_PAGE_SIZE = 100
 MIN_PAGE = 1
@@ -94,6 +194,9 @@ CONVEX_FILL__MAX_DECAY_RATE = 0.95
 CONVEX_FILL__MIN_PATIENCE = 1
 CONVEX_FILL__MAX_PATIENCE = 10
 
+# Sort by similarity parameters
+SORT_BY_SIMILARITY__TIME_BUDGET = 0.5 # seconds
+
 # Autocomplete parameters
 MIN_AUTOCOMPLETE_PREFIX_LENGTH = 1
 MAX_AUTOCOMPLETE_PREFIX_LENGTH = 100
@@ -112,6 +215,7 @@ def get_similar_artworks(record_id):
         page = int(data.get('page', 1))
         page_size = int(data.get('page_size', 10))
         keep_original_record = data.get('keep_original_record', False)
+        include_artworks = data.get('include_artworks', False)
         model_name = data.get('model_name', DEFAULT_MODEL)
 
         if model_name not in MODELS:
@@ -133,13 +237,52 @@ def get_similar_artworks(record_id):
 
         page = max(MIN_PAGE, min(page, max_page))
 
-        results = DB_MANAGER.get_nearest_artworks_to_recordID(
-            recordID=record_id,
-            page=page,
-            page_size=page_size,
-            keep_original_record=keep_original_record,
-            model_name=model_name
-        )
+        # The next pages are slices of the ranking computed for the first one
+        ranking_key = canonical_key({
+            "route": "similar",
+            "record_id": record_id,
+            "keep_original_record": keep_original_record,
+            "model_name": model_name,
+        })
+        generation = DATA_GENERATION
+        cursor = data.get('cursor', None)
+        ranking = RANKING_CACHE.get(cursor, ranking_key)
+        if ranking is not None and not ranking.covers(page, page_size):
+            # Beyond the neighbours of the graph: a deeper ranking is computed
+            ranking = None
+        # Only exact rankings are kept (the approximate indexes of the database stop after ef_search results)
+        if ranking is None and RANKING_CACHE.covers(page, page_size) and DB_MANAGER.get_vector_index(model_name) is not None:
+            # The first pages are served by the nearest neighbours graph when there is one
+            ranked_results, depth = DB_MANAGER.get_similarity_ranking(
+                recordID=record_id,
+                page=page,
+                page_size=page_size,
+                depth=RANKING_CACHE.depth,
+                keep_original_record=keep_original_record,
+                model_name=model_name
+            )
+            if ranked_results is not None:
+                ranking = RANKING_CACHE.create({
+                    "recordID": [result["recordID"] for result in ranked_results],
+                    "distance": [result["distance"] for result in ranked_results],
+                }, depth=depth)
+                cursor = cache_if_fresh(generation, lambda: RANKING_CACHE.put(ranking_key, ranking))
+
+        ranking_page = RANKING_CACHE.get_page(ranking, page, page_size) if ranking is not None else None
+        if ranking_page is not None:
+            results = [
+                {"recordID": resultRecordID, "distance": distance}
+                for resultRecordID, distance in zip(ranking_page["recordID"], ranking_page["distance"])
+            ]
+        else:
+            cursor = None
+            results = DB_MANAGER.get_nearest_artworks_to_recordID(
+                recordID=record_id,
+                page=page,
+                page_size=page_size,
+                keep_original_record=keep_original_record,
+                model_name=model_name
+            )
         
         if results is None:
             return formatReturn(
@@ -147,14 +290,20 @@ def get_similar_artworks(record_id):
                 user_error="Oeuvre non trouvée",
                 error_code=404
             )
+
+        data = {
+            "results": results,
+            "page": page,
+            "page_size": page_size
+        }
+        if include_artworks:
+            # Avoids one /api/artwork/<id> request per result
+            data["artworks"] = DB_MANAGER.get_artworks_by_recordIDs([result["recordID"] for result in results])
             
         return formatReturn(
             success=True,
-            data={
-                "results": results,
-                "page": page,
-                "page_size": page_size
-            }
+            data=data,
+            cursor=cursor
         )
         
     except Exception as e:
@@ -226,7 +375,8 @@ def get_artwork_image(record_id):
 @limiter.limit("60 per minute")
 def get_artist(creator_id):
     try:
-        artist = DB_MANAGER.get_artist_by_creatorID(creator_id)
+        include_artworks = request.args.get('include_artworks', 'false').lower() == 'true'
+        artist = DB_MANAGER.get_artist_by_creatorID(creator_id, include_artworks=include_artworks)
         return formatReturn(success=True, data=artist)
     except Exception as e:
         return formatReturn(
@@ -319,17 +469,75 @@ def query_artworks():
         rocchio_k = max(MIN_ROCCHIO_K, min(rocchio_k, MAX_ROCCHIO_K))
         rocchio_scale = max(MIN_ROCCHIO_SCALE, min(rocchio_scale, MAX_ROCCHIO_SCALE))    
 
-        results = DB_MANAGER.query(
-            hard_constraints,
-            soft_constraints,
-            page,
-            page_size,
-            model_name,
-            version,
-            rocchio_k,
-            rocchio_scale
-        )
-        return formatReturn(success=True, data=results)
+        # Identical requests (once clamped) share the same serialized response, within a generation of the data
+        generation = DATA_GENERATION
+        result_key = canonical_key({
+            "generation": generation,
+            "hard_constraints": hard_constraints,
+            "soft_constraints": soft_constraints,
+            "model_name": model_name,
+            "page": page,
+            "page_size": page_size,
+            "version": version,
+            "rocchio_k": rocchio_k,
+            "rocchio_scale": rocchio_scale,
+        })
+        if RESULT_CACHE is not None:
+            payload = RESULT_CACHE.get(result_key)
+            if payload is not None:
+                return formatCachedReturn(payload)
+
+        def compute_payload():
+            # The next pages are slices of the ranking computed for the first one
+            ranking_key = canonical_key({
+                "route": "query",
+                "hard_constraints": hard_constraints,
+                "soft_constraints": soft_constraints,
+                "model_name": model_name,
+                "version": version,
+                "rocchio_k": rocchio_k,
+                "rocchio_scale": rocchio_scale,
+            })
+            cursor = data.get('cursor', None)
+            ranking = RANKING_CACHE.get(cursor, ranking_key)
+            # Only exact rankings are kept (the approximate indexes of the database stop after ef_search results)
+            if ranking is None and RANKING_CACHE.covers(page, page_size) and DB_MANAGER.get_vector_index(model_name) is not None:
+                recordIDs = DB_MANAGER.rank_query(
+                    hard_constraints,
+                    soft_constraints,
+                    1,
+                    RANKING_CACHE.depth,
+                    model_name,
+                    version,
+                    rocchio_k,
+                    rocchio_scale
+                )
+                ranking = RANKING_CACHE.create({"recordID": recordIDs})
+                cursor = cache_if_fresh(generation, lambda: RANKING_CACHE.put(ranking_key, ranking))
+
+            ranking_page = RANKING_CACHE.get_page(ranking, page, page_size) if ranking is not None else None
+            if ranking_page is not None:
+                results = DB_MANAGER.get_artworks_by_recordIDs(ranking_page["recordID"])
+            else:
+                # Beyond the depth of the ranking
+                cursor = None
+                results = DB_MANAGER.query(
+                    hard_constraints,
+                    soft_constraints,
+                    page,
+                    page_size,
+                    model_name,
+                    version,
+                    rocchio_k,
+                    rocchio_scale
+                )
+            payload = formatReturn(success=True, data=results, cursor=cursor).get_data()
+            if RESULT_CACHE is not None:
+                cache_if_fresh(generation, lambda: RESULT_CACHE.put(result_key, payload))
+            return payload
+
+        # The identical requests in flight share the computation of the first one
+        return formatCachedReturn(SINGLE_FLIGHT.do(result_key, compute_payload))
     except Exception as e:
         return formatReturn(
             success=False,
@@ -370,11 +578,16 @@ def augment_collection():
             decay_rate = max(CONVEX_FILL__MIN_DECAY_RATE, min(decay_rate, CONVEX_FILL__MAX_DECAY_RATE))
             patience = data.get('patience', 10)
             patience = max(CONVEX_FILL__MIN_PATIENCE, min(patience, CONVEX_FILL__MAX_PATIENCE))
+            # Optional seed for reproducible augmentations
+            seed = data.get('seed', None)
+            if seed is not None:
+                seed = int(seed)
             parameters = {
                 "numberOfImages": number_of_images,
                 "similarityThreshold": similarity_threshold,
                 "decayRate": decay_rate,
-                "patience": patience
+                "patience": patience,
+                "seed": seed
             }
 
         model_name = data.get('model_name', DEFAULT_MODEL)
@@ -385,7 +598,18 @@ def augment_collection():
                 error_code=400
             )
 
-        new_record_ids = DB_MANAGER.augment_collection(model_name, record_ids, method, parameters)
+        # The identical requests in flight share the computation of the first one
+        augment_key = canonical_key({
+            "route": "augment",
+            "recordIDs": record_ids,
+            "method": method,
+            "parameters": parameters,
+            "model_name": model_name,
+        })
+        new_record_ids = SINGLE_FLIGHT.do(
+            augment_key,
+            lambda: DB_MANAGER.augment_collection(model_name, record_ids, method, parameters)
+        )
 
         return formatReturn(success=True, data=new_record_ids)
     except Exception as e:
@@ -417,7 +641,7 @@ def sort_by_similarity():
                 error_code=400
             ) 
         
-        sorted_record_ids = DB_MANAGER.sort_by_similarity(model_name, record_ids)
+        sorted_record_ids = DB_MANAGER.sort_by_similarity(model_name, record_ids, time_budget=SORT_BY_SIMILARITY__TIME_BUDGET)
 
         return formatReturn(success=True, data=sorted_record_ids)
     except Exception as e:
@@ -548,6 +772,25 @@ def get_settings_infos():
         "max_convex_fill_patience": CONVEX_FILL__MAX_PATIENCE,
     })
 
+@app.route('/api/stats', methods=['GET'])
+def get_stats():
+    try:
+        return formatReturn(success=True, data={
+            "result_cache": RESULT_CACHE.get_stats() if RESULT_CACHE is not None else None,
+            "ranking_cache": RANKING_CACHE.get_stats(),
+            "single_flight": SINGLE_FLIGHT.get_stats(),
+            "embedding_cache": EMBEDDING_CACHE.get_stats() if EMBEDDING_CACHE is not None else None,
+            "models": MODELS.get_stats(),
+            "pool": DB_MANAGER.get_pool_stats(),
+        })
+    except Exception as e:
+        return formatReturn(
+            success=False,
+            python_error=e,
+            user_error="Une erreur est survenue lors de la récupération des statistiques",
+            error_code=500
+        )
+
 # /api/get_settings_infos should replace the routes below
 @app.route('/api/get_columns', methods=['GET'])
 def get_columns():
@@ -0,0 +1,301 @@
+import re
+import numpy as np
+from database.hard_query import column_mapping, column_is_list, column_types
+
+# Three-valued logic of SQL (NULL is UNKNOWN): AND is the minimum, OR the maximum and NOT is TRUE - value
+FALSE = 0
+UNKNOWN = 1
+TRUE = 2
+
+class UnsupportedConstraint(Exception):
+    # The constraints must be evaluated by the database (see build_hard_query)
+    pass
+
+def to_logic(mask, null = None):
+    values = np.where(mask, TRUE, FALSE).astype(np.int8)
+    if null is not None:
+        values[null] = UNKNOWN
+    return values
+
+def like_to_regex(pattern):
+    """
+        Compiles a LIKE pattern: % is any sequence, _ any character and \\ escapes the next character.
+    """
+    parts = []
+    position = 0
+    while position < len(pattern):
+        character = pattern[position]
+        if character == "\\":
+            if position + 1 == len(pattern):
+                raise UnsupportedConstraint("ColumnarIndex: LIKE pattern ending with an escape character")
+            parts.append(re.escape(pattern[position + 1]))
+            position += 2
+            continue
+        if character == "%":
+            parts.append(".*")
+        elif character == "_":
+            parts.append(".")
+        else:
+            parts.append(re.escape(character))
+        position += 1
+    return re.compile("".join(parts), re.DOTALL)
+
+class TextColumn:
+    def __init__(self, values):
+        self.values = np.asarray(values, dtype=object)
+        self.null = np.array([value is None for value in self.values], dtype=bool)
+        self._lowered = None
+
+    def get_values(self, case_sensitive):
+        if case_sensitive:
+            return self.values
+        if self._lowered is None:
+            self._lowered = np.array([value.lower() if value is not None else None for value in self.values], dtype=object)
+        return self._lowered
+
+    def check_text(self, value):
+        # text = integer does not exist in PostgreSQL
+        if not isinstance(value, str):
+            raise UnsupportedConstraint("ColumnarIndex: Non-text value for a text column")
+        return value
+
+    def equals(self, value, case_sensitive):
+        value = self.check_text(value)
+        if not case_sensitive:
+            value = value.lower()
+        return to_logic(self.get_values(case_sensitive) == value, self.null)
+
+    def like(self, pattern, case_sensitive):
+        pattern = self.check_text(pattern)
+        regex = like_to_regex(pattern if case_sensitive else pattern.lower())
+        values = self.get_values(case_sensitive)
+        mask = np.array([value is not None and regex.fullmatch(value) is not None for value in values], dtype=bool)
+        return to_logic(mask, self.null)
+
+    def between(self, low, high, case_sensitive):
+        # The order of the texts depends on the collation of the database
+        raise UnsupportedConstraint("ColumnarIndex: BETWEEN on a text column")
+
+class NumericColumn:
+    def __init__(self, values, is_integer = False):
+        self.is_integer = is_integer
+        self.values = np.array([float(value) if value is not None else np.nan for value in values], dtype=np.float64)
+        self.null = np.isnan(self.values)
+
+    def to_number(self, value):
+        # The texts are cast to the type of the column, like PostgreSQL does with the params
+        if isinstance(value, bool):
+            raise UnsupportedConstraint("ColumnarIndex: Boolean value for a numeric column")
+        if isinstance(value, str):
+            try:
+                return float(int(value.strip())) if self.is_integer else float(value)
+            except ValueError:
+                raise UnsupportedConstraint("ColumnarIndex: Invalid number")
+        if isinstance(value, (int, float)):
+            return float(value)
+        raise UnsupportedConstraint("ColumnarIndex: Invalid number")
+
+    def equals(self, value, case_sensitive):
+        with np.errstate(invalid="ignore"):
+            return to_logic(self.values == self.to_number(value), self.null)
+
+    def like(self, pattern, case_sensitive):
+        # integer ~~ unknown does not exist in PostgreSQL
+        raise UnsupportedConstraint("ColumnarIndex: LIKE on a numeric column")
+
+    def between(self, low, high, case_sensitive):
+        low = self.to_number(low)
+        high = self.to_number(high)
+        with np.errstate(invalid="ignore"):
+            return to_logic((self.values >= low) & (self.values <= high), self.null)
+
+class ListColumn:
+    """
+        TEXT[] column, with an inverted index term -> rows.
+    """
+    def __init__(self, values):
+        self.size = len(values)
+        self.null = np.array([value is None for value in values], dtype=bool)
+        rows_per_term = {}
+        for row, terms in enumerate(values):
+            for term in terms or []:
+                rows_per_term.setdefault(term, []).append(row)
+        self.index = {term: np.unique(np.asarray(rows, dtype=np.int64)) for term, rows in rows_per_term.items()}
+
+    def check_terms(self, terms):
+        if not all(isinstance(term, str) for term in terms):
+            raise UnsupportedConstraint("ColumnarIndex: Non-text value for a TEXT[] column")
+        return terms
+
+    def get_rows_mask(self, terms):
+        mask = np.zeros(self.size, dtype=bool)
+        for term in terms:
+            rows = self.index.get(term, None)
+            if rows is not None:
+                mask[rows] = True
+        return mask
+
+    def contains_all(self, terms):
+        # column @> terms
+        mask = np.ones(self.size, dtype=bool)
+        for term in self.check_terms(terms):
+            mask &= self.get_rows_mask([term])
+        return to_logic(mask, self.null)
+
+    def overlaps(self, terms):
+        # column && terms
+        return to_logic(self.get_rows_mask(self.check_terms(terms)), self.null)
+
+    def any_like(self, pattern, case_sensitive):
+        # EXISTS (SELECT 1 FROM unnest(column) AS term WHERE term LIKE pattern): never UNKNOWN
+        if not isinstance(pattern, str):
+            raise UnsupportedConstraint("ColumnarIndex: Non-text pattern")
+        regex = like_to_regex(pattern if case_sensitive else pattern.lower())
+        terms = [term for term in self.index if term is not None and regex.fullmatch(term if case_sensitive else term.lower())]
+        return to_logic(self.get_rows_mask(terms))
+
+def evaluate_tokens(tokens):
+    """
+        Evaluates a sequence operand (AND|OR operand)* with the precedence of SQL (AND before OR).
+    """
+    if len(tokens) == 0 or len(tokens) % 2 == 0:
+        raise UnsupportedConstraint("ColumnarIndex: Invalid sequence of constraints")
+    result = None
+    term = None
+    for position, token in enumerate(tokens):
+        is_operator = isinstance(token, str)
+        if is_operator != (position % 2 == 1):
+            raise UnsupportedConstraint("ColumnarIndex: Invalid sequence of constraints")
+        if not is_operator:
+            term = token if term is None else np.minimum(term, token)
+        elif token == "OR":
+            result = term if result is None else np.maximum(result, term)
+            term = None
+    return term if result is None else np.maximum(result, term)
+
+class ColumnarIndex:
+    """
+        In-memory copy of the columns the hard constraints can be applied to (one row per artwork),
+        evaluating the constraints like build_hard_query: same operators, same precedence (the
+        connectors are not nested, AND binds before OR) and same NULL semantics.
+
+        columns maps each key of column_mapping to its values, aligned with recordIDs (None is NULL).
+        Any constraint whose result could differ from the database (missing column, text ordering,
+        invalid SQL, ...) raises UnsupportedConstraint: the database must be used instead.
+    """
+    def __init__(self, recordIDs, columns):
+        self.recordIDs = np.asarray(recordIDs, dtype=np.int64)
+        self.columns = {}
+        for key, values in columns.items():
+            if len(values) != len(self.recordIDs):
+                raise Exception(f"ColumnarIndex: Invalid number of values for column {key}")
+            if column_is_list.get(key, False):
+                self.columns[key] = ListColumn(values)
+            elif column_types.get(key, None) in ["INTEGER", "NUMERIC"]:
+                self.columns[key] = NumericColumn(values, is_integer=column_types[key] == "INTEGER")
+            else:
+                self.columns[key] = TextColumn(values)
+
+    def __len__(self):
+        return len(self.recordIDs)
+
+    def get_column(self, key):
+        column = self.columns.get(key, None)
+        if column is None:
+            raise UnsupportedConstraint(f"ColumnarIndex: Column {key} not loaded")
+        return column
+
+    def compile(self, constraint):
+        """
+            Returns the tokens of one constraint (see compile_constraint): operands (three-valued
+            arrays) and the connectors "AND" / "OR" the SQL condition contains.
+        """
+        constraint_type = constraint["type"]
+        key = constraint.get("selectedColumn", {}).get("key", None)
+        is_not = constraint.get("isNot", False)
+        exact_match = constraint.get("exactMatch", False)
+        case_sensitive = constraint.get("caseSensitive", False)
+        keep_null = constraint.get("keepNull", False)
+
+        if constraint_type in ["AND", "OR"]:
+            return [constraint_type]
+        if constraint_type == "GROUP":
+            tokens = []
+            for child in constraint["children"]:
+                tokens.extend(self.compile(child))
+            group = evaluate_tokens(tokens)
+            return [TRUE - group if is_not else group]
+        if constraint_type not in ["EQUAL", "BETWEEN", "INCLUDES"] or key not in column_mapping:
+            return []
+
+        column = self.get_column(key)
+        isColumnAList = isinstance(column, ListColumn)
+        if isinstance(column, NumericColumn):
+            case_sensitive = True
+        # "NOT condition OR column IS NULL": NOT only applies to the condition
+        suffix = ["OR", to_logic(column.null)] if keep_null else []
+
+        def negate(operand, count = 1):
+            return TRUE - operand if count % 2 == 1 else operand
+
+        if constraint_type == "EQUAL":
+            value = constraint.get("equalTo", None)
+            if value is None:
+                return []
+            if isColumnAList:
+                if exact_match:
+                    if not case_sensitive:
+                        # LOWER(text[]) does not exist in PostgreSQL
+                        raise UnsupportedConstraint("ColumnarIndex: LOWER on a TEXT[] column")
+                    operand = column.contains_all([value])
+                else:
+                    operand = column.any_like(f"%{value}%", case_sensitive)
+            elif exact_match:
+                operand = column.equals(value, case_sensitive)
+            else:
+                operand = column.like(f"%{value}%", case_sensitive)
+            return [negate(operand, int(is_not))] + suffix
+
+        if constraint_type == "BETWEEN":
+            low = constraint.get("from", None)
+            high = constraint.get("to", None)
+            if low is None or high is None or isColumnAList:
+                return []
+            return [negate(column.between(low, high, case_sensitive), int(is_not))] + suffix
+
+        values = constraint.get("values", None)
+        if values is None:
+            return []
+        if isColumnAList:
+            operand = column.contains_all(values) if exact_match else column.overlaps(values)
+            return [negate(operand, int(is_not))] + suffix
+        if len(values) == 0:
+            if is_not:
+                # "NOT " alone is not valid SQL
+                raise UnsupportedConstraint("ColumnarIndex: Invalid sequence of constraints")
+            return suffix
+        # not_prefix + " AND ".join(not_prefix + term): the first term is negated twice
+        tokens = []
+        for position, value in enumerate(values):
+            if position > 0:
+                tokens.append("AND")
+            operand = column.like(f"%{value}%", case_sensitive)
+            tokens.append(negate(operand, 2 * int(is_not) if position == 0 else int(is_not)))
+        return tokens + suffix
+
+    def evaluate(self, constraints):
+        """
+            Returns the boolean mask of the rows matching the constraints.
+        """
+        tokens = []
+        for constraint in constraints or []:
+            tokens.extend(self.compile(constraint))
+        if len(tokens) == 0:
+            return np.ones(len(self.recordIDs), dtype=bool)
+        return evaluate_tokens(tokens) == TRUE
+
+    def filter(self, constraints):
+        """
+            Returns the recordIDs of the artworks matching the constraints.
+        """
+        return self.recordIDs[self.evaluate(constraints)]
@@ -3,9 +3,15 @@ import numpy as np
 import pandas as pd
 import json
 from pgvector.psycopg2 import register_vector
-import random
-import networkx as nx
-from sklearn.metrics.pairwise import cosine_similarity
+from engine.vector_index import VectorIndex
+from engine.keyword_index import KeywordIndex
+from engine.keyword_scores import KeywordScores
+from engine.knn_graph import KnnGraph, DEFAULT_K as DEFAULT_KNN_GRAPH_K, DEFAULT_BLOCK_SIZE as DEFAULT_KNN_GRAPH_BLOCK_SIZE
+from database.pool import ConnectionPool
+from database.hard_query import column_mapping, column_is_list, column_types, hard_query_tables, get_column_alias, build_hard_query
+from database.columnar import ColumnarIndex, UnsupportedConstraint
+from engine.augmentation import draw_convex_pairs, greedy_unique_assignment
+from engine.ordering import order_by_similarity, DEFAULT_TIME_BUDGET
 
 def betterInt(x):
     # If x is nan, return None
@@ -23,12 +29,19 @@ def betterList(x):
         return []
     return x.split('|')
 
-def convert_embedding_to_numpy(embedding: str):
-    # pgvector stores the embedding as a string
-    embedding_string = embedding.strip('[]')
-    embedding_list = [float(x.strip()) for x in embedding_string.split(',')]
-    embedding_array = np.array(embedding_list)
-    return embedding_array
+def decode_vector(value):
+    """
+        Decodes the binary representation of a pgvector vector (SELECT vector_send(column))
+        into a float32 numpy array, without going through the text representation.
+        Layout: dimension (uint16), unused (uint16), then the big-endian float32 values.
+    """
+    buffer = memoryview(value)
+    dim = int.from_bytes(buffer[0:2], "big")
+    return np.frombuffer(buffer, dtype=">f4", count=dim, offset=4).astype(np.float32)
+
+def parse_version(version):
+    # "0.8.0" -> (0, 8, 0), the suffixes (e.g. "0.8.0-dev") are ignored
+    return tuple(betterInt(part.split("-")[0]) or 0 for part in version.split("."))
 
 subject_matter_to_table_name = {
     "subjectMatterSubjectTerms": "SubjectTerms",
@@ -39,76 +52,6 @@ subject_matter_to_table_name = {
     "subjectMatterSpecificSubjectIdentification": "SpecificSubjectIdentification"
 }
 
-column_mapping = {
-    # Artwork
-    "recordID": "a.recordID",
-    "workID": "a.workID",
-    "language": "a.language",
-    "title": "a.title",
-    "objectType": "a.objectWorkType",
-    "classification": "a.termClassification",
-    "materials": "a.materials",
-    "inscription": "a.signatureFullDescription",
-    "creationEarliestDate": "a.creationEarliestDate",
-    "creationLatestDate": "a.creationLatestDate",
-    "creator": "a.creatorFullDescription",
-    "physicalAppearance": "a.physicalAppearanceDescription",
-    "imageType": "a.imageType",
-    "imageColor": "a.imageColor",
-    "imageLowResFilename": "a.imageLowResFilename",
-    "imageHighResFilename": "a.imageHighResFilename",
-    "imageCopyright": "a.imageCopyright",
-    "imageStyle": "a.formalDescriptionTermStylesPeriods",
-    "height": "a.height",
-    "width": "a.width",
-    "ratio": "a.ratio",
-    
-    # Artist
-    "creatorID": "ar.creatorID",
-    "creatorFirstName": "ar.creatorFirstName",
-    "creatorLastName": "ar.creatorLastName",
-    "creatorBirthDate": "ar.creatorBirthDate",
-    "creatorDeathDate": "ar.creatorDeathDate",
-    "creatorBirthDeathPlace": "ar.creatorBirthAndDeathDescription",
-    "creatorNationality": "ar.creatorNationality",
-
-    # ConceptualTerms_Flat
-    "CFT_values": "CFT.values",
-
-    # IconographicTerms_Flat
-    "IFT_values": "IFT.values",
-
-    # SubjectTerms_Flat
-    "STF_values": "STF.values",
-
-    # SubjectTerms_Tree
-    "STT_tree": "STT.tree",
-
-    # IconographicTerms_Tree
-    "IFT_tree": "IFT.tree",
-
-    # IconographicInterpretation
-    "II_value": "II.value",
-
-    # GeneralSubjectDescription
-    "GSD_value": "GSD.value",
-
-    # SpecificSubjectIdentification
-    "SSI_value": "SSI.value",
-}
-column_is_list = {
-    # Artwork
-    "objectType": True,
-    "materials": True,
-    "imageStyle": True,
-    
-    # ConceptualTerms_Flat
-    "CFT_values": True,
-    # IconographicTerms_Flat
-    "IFT_values": True,
-    # SubjectTerms_Flat
-    "STF_values": True,
-}
 blockType_per_column = {
     # Artwork
     "recordID": ["EQUAL", "BETWEEN", "INCLUDES"],
@@ -253,54 +196,11 @@ columnsWithAutocomplete = {
     # SpecificSubjectIdentification
     "SSI_value": "SpecificSubjectIdentification AS SSI",
 }
-column_types = {
-    # Artwork
-    "recordID": "INTEGER",
-    "workID": "TEXT",
-    "language": "TEXT",
-    "title": "TEXT",
-    "objectType": "TEXT[]",
-    "classification": "TEXT",
-    "materials": "TEXT[]",
-    "inscription": "TEXT",
-    "creationEarliestDate": "INTEGER",
-    "creationLatestDate": "INTEGER",
-    "creator": "TEXT",
-    "physicalAppearance": "TEXT",
-    "imageType": "TEXT",
-    "imageColor": "TEXT",
-    "imageCopyright": "TEXT",
-    "imageStyle": "TEXT",
-    "height": "NUMERIC",
-    "width": "NUMERIC",
-    "ratio": "NUMERIC",
-    
-    # Artist
-    "creatorID": "TEXT",
-    "creatorFirstName": "TEXT",
-    "creatorLastName": "TEXT",
-    "creatorBirthDate": "INTEGER",
-    "creatorDeathDate": "INTEGER",
-    "creatorBirthDeathPlace": "TEXT",
-    "creatorNationality": "TEXT",
-
-    # ConceptualTerms_Flat
-    "CFT_values": "TEXT[]",
-
-    # IconographicTerms_Flat
-    "IFT_values": "TEXT[]",
-
-    # SubjectTerms_Flat
-    "STF_values": "TEXT[]",
-
-    # IconographicInterpretation
-    "II_value": "TEXT",
-
-    # GeneralSubjectDescription
-    "GSD_value": "TEXT",
-
-    # SpecificSubjectIdentification
-    "SSI_value": "TEXT",
+# Soft constraints answered by a precomputed keyword embedding, and the field holding the keyword
+KEYWORD_CONSTRAINT_FIELDS = {
+    "KEYWORD": "keyword",
+    "COLOR": "color",
+    "LUMINOSITY": "luminosity",
 }
 
 class DatabaseManager:
@@ -309,19 +209,41 @@ class DatabaseManager:
         config,
         paths,
         models,
+        vector_index_config = None,
+        knn_graph_config = None,
+        keyword_scores_config = None,
+        columnar_index_config = None,
     ):
         self.db_host = config["host"]
         self.db_port = config["port"]
         self.db_name = config["name"]
         self.db_user = config["user"]
         self.db_password = config["password"]
+        if vector_index_config is None:
+            vector_index_config = {"method": "none"}
+        self.vector_index_config = vector_index_config
         self.enable_pgvector()
+        self.pool = ConnectionPool(
+            self._connection_kwargs(),
+            min_size=int(config.get("pool_min_size", 1)),
+            max_size=int(config.get("pool_max_size", 10)),
+            timeout=float(config.get("pool_timeout", 30)),
+            on_connect=register_vector,
+        )
         self.initialize_tables()
         self.paths = paths
         self.models = models
+        # Called after populate, reset, ... (see add_data_change_handler)
+        self.data_change_handlers = []
+        # In-memory evaluation of the hard constraints (see preload_columnar_index)
+        self.columnar_index_config = columnar_index_config if columnar_index_config is not None else {"enabled": False}
+        self.columnar_index = None
+        # The in-memory indexes are reloaded on data changes once loaded (see reload_indexes)
+        self.indexes_loaded = False
         self.newModelAddedHandler()
         self.preloaded_models_formatted = None
         self.preloaded_models = None
+        self.preloaded_models_dims = None
 
         self.preloaded_keywords = None
         self.preloaded_colors = None
@@ -330,11 +252,29 @@ class DatabaseManager:
         self.preloaded_recordIDs = None
         self.preload_models()
 
+        self.vector_indexes = {}
+        self.preload_vector_indexes()
+
+        # Precomputed nearest neighbours (see build_knn_graphs)
+        self.knn_graph_config = knn_graph_config if knn_graph_config is not None else {"folder": None}
+        self.knn_graphs = {}
+        self.preload_knn_graphs()
+
+        self.keyword_indexes = {}
+        self.preload_keyword_indexes()
+
+        # Precomputed keywords x artworks scores (see preload_keyword_scores)
+        self.keyword_scores_config = keyword_scores_config if keyword_scores_config is not None else {"enabled": False}
+        self.keyword_scores = {}
+        self.preload_keyword_scores()
+
         self.preload_keywords()
         self.preload_colors()
         self.preload_luminosities()
         
         self.preload_recordIDs()
+        self.preload_columnar_index()
+        self.indexes_loaded = True
         self.refresh_autocomplete_views()
         
     def preload_recordIDs(self):
@@ -343,14 +283,67 @@ class DatabaseManager:
                 cur.execute("SELECT recordID FROM Artwork")
                 self.preloaded_recordIDs = [row[0] for row in cur.fetchall()]
     
+    def _connection_kwargs(self):
+        return {
+            "host": self.db_host,
+            "port": self.db_port,
+            "dbname": self.db_name,
+            "user": self.db_user,
+            "password": self.db_password,
+        }
+
     def _connect(self):
-        return psycopg2.connect(
-            host=self.db_host,
-            port=self.db_port,
-            dbname=self.db_name,
-            user=self.db_user,
-            password=self.db_password
-        )
+        # Borrows a pooled connection (with the pgvector adapters registered) for one transaction
+        return self.pool.connection()
+
+    def add_data_change_handler(self, handler):
+        """
+            Registers a function (no arguments) called whenever this manager changes the data:
+            populate, reset, rebuild_subject_matter_tables, populate_keywords and newModelAddedHandler.
+        """
+        self.data_change_handlers.append(handler)
+
+    def data_changed(self):
+        # The handlers (e.g. the caches of the API) must see the reloaded indexes
+        if self.indexes_loaded:
+            self.reload_indexes()
+        for handler in self.data_change_handlers:
+            handler()
+
+    def reload_indexes(self):
+        """
+            Reloads the in-memory copies of the data: models, vector indexes, keyword indexes and scores,
+            columnar index, ... The nearest neighbours graphs of the models whose embeddings changed are
+            dropped until build_knn_graphs is run again.
+        """
+        self.preload_models()
+        self.vector_indexes = {}
+        self.preload_vector_indexes()
+
+        knn_graphs = {}
+        for model_name, knn_graph in self.knn_graphs.items():
+            # Same check as preload_knn_graphs
+            if knn_graph.matches(self.get_vector_index(model_name)):
+                knn_graphs[model_name] = knn_graph
+            else:
+                print(f"    The nearest neighbours graph of model {model_name} is outdated, rebuild it with init_db.py")
+        self.knn_graphs = knn_graphs
+
+        self.keyword_indexes = {}
+        self.preload_keyword_indexes()
+        self.preload_keyword_scores()
+
+        self.preload_keywords()
+        self.preload_colors()
+        self.preload_luminosities()
+        self.preload_recordIDs()
+        self.preload_columnar_index()
+
+    def get_pool_stats(self):
+        return self.pool.get_stats()
+
+    def close(self):
+        self.pool.close()
         
     # Methods to initialize the various tables
     def initialize_tables(self):
@@ -374,6 +367,7 @@ class DatabaseManager:
 
     def newModelAddedHandler(self):
         # Verify that each model is present in the Model table
+        model_added = False
         for model_name in self.models:
             # Query the Model table to check if the model is present
             with self._connect() as conn:
@@ -412,6 +406,12 @@ class DatabaseManager:
                             correspondingEmbeddingData["keywords"],
                         )
                         print(f"✓ : Model {model_name} added to the database")
+                        model_added = True
+
+        # Make sure that every model has its vector index
+        self.create_vector_indexes()
+        if model_added:
+            self.data_changed()
 
     def _create_keywords_table(self):
         with self._connect() as conn:
@@ -424,6 +424,8 @@ class DatabaseManager:
                     modelID INTEGER REFERENCES Model(modelID),
                     embedding VECTOR
                 )""")
+                # Lookups of get_keyword_embedding when the keyword index is not loaded
+                cur.execute("CREATE INDEX IF NOT EXISTS idx_keywords_modelid_lower_keyword ON Keywords (modelID, LOWER(keyword))")
                 conn.commit()
 
     def rebuild_subject_matter_tables(self):
@@ -447,6 +449,7 @@ class DatabaseManager:
 
         # Populate the tables
         self.populate_subject_matter_table(self.paths["subjectmatter"])
+        self.data_changed()
 
 
     def reset(self, full_reset: bool = False):
@@ -476,13 +479,23 @@ class DatabaseManager:
                 conn.commit()
         # Recreate all tables
         self.initialize_tables()
+        self.data_changed()
 
     def enable_pgvector(self):
-        with self._connect() as conn:
-            with conn.cursor() as cur:
-                cur.execute("CREATE EXTENSION IF NOT EXISTS vector;")
-                conn.commit()
-                register_vector(conn)
+        # Dedicated connection: the pooled connections can only register the adapters once the extension exists
+        conn = psycopg2.connect(**self._connection_kwargs())
+        try:
+            with conn:
+                with conn.cursor() as cur:
+                    cur.execute("CREATE EXTENSION IF NOT EXISTS vector;")
+                    cur.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+                    version = cur.fetchone()[0]
+        finally:
+            conn.close()
+        # Without iterative scans (pgvector >= 0.8), an HNSW search stops after ef_search rows
+        self.supports_iterative_scan = parse_version(version) >= (0, 8, 0)
+        if self.vector_index_config.get("method", "none") == "hnsw" and not self.supports_iterative_scan:
+            print(f"    pgvector {version} has no iterative scans, the HNSW searches return at most ef_search ({self.vector_index_config['ef_search']}) artworks")
 
     def _create_unstructured_subject_matter_tables(self, table_name):
         with self._connect() as conn:
@@ -578,6 +591,90 @@ class DatabaseManager:
                 """)
                 conn.commit()
 
+    def create_vector_indexes(self):
+        """
+            The embedding_vector column is untyped since it is shared by every model.
+            For each model we build a partial index (WHERE modelid = ...) on the column casted to the
+            dimension of the model, the query paths must use the same expression (see _embedding_expression).
+        """
+        method = self.vector_index_config.get("method", "none")
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                cur.execute("CREATE INDEX IF NOT EXISTS idx_embedding_modelid_recordid ON Embedding (modelID, recordID)")
+                conn.commit()
+
+                if method == "none":
+                    return
+                if method not in ["hnsw", "ivfflat"]:
+                    raise Exception(f"Unknown vector index method {method}")
+
+                cur.execute("SELECT modelID, model_name, img_dim FROM Model")
+                for model_id, model_name, img_dim in cur.fetchall():
+                    index_name = f"idx_embedding_{method}_{model_id}"
+                    cur.execute("SELECT 1 FROM pg_indexes WHERE indexname = %s", (index_name.lower(),))
+                    if cur.fetchone() is not None:
+                        continue
+
+                    print(f"Building {method} index for model {model_name}...")
+                    if method == "hnsw":
+                        cur.execute(f"""
+                            CREATE INDEX {index_name} ON Embedding
+                            USING hnsw ((embedding_vector::vector({int(img_dim)})) vector_ip_ops)
+                            WITH (m = %s, ef_construction = %s)
+                            WHERE modelID = {int(model_id)}
+                        """, (self.vector_index_config["m"], self.vector_index_config["ef_construction"]))
+                    else:
+                        cur.execute(f"""
+                            CREATE INDEX {index_name} ON Embedding
+                            USING ivfflat ((embedding_vector::vector({int(img_dim)})) vector_ip_ops)
+                            WITH (lists = %s)
+                            WHERE modelID = {int(model_id)}
+                        """, (self.vector_index_config["lists"],))
+                    conn.commit()
+                    print(f"✓ : {method} index for model {model_name} built")
+
+    def drop_vector_indexes(self):
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT indexname FROM pg_indexes
+                    WHERE tablename = 'embedding'
+                    AND (indexname LIKE 'idx_embedding_hnsw_%' OR indexname LIKE 'idx_embedding_ivfflat_%')
+                """)
+                for (index_name,) in cur.fetchall():
+                    cur.execute(f"DROP INDEX IF EXISTS {index_name}")
+                conn.commit()
+
+    def rebuild_vector_indexes(self):
+        # Needed when the index parameters (m, ef_construction, lists) change
+        self.drop_vector_indexes()
+        self.create_vector_indexes()
+
+    def set_vector_search_parameters(self, ef_search = None, probes = None):
+        # Runtime knobs of the approximate searches (recall vs latency)
+        if ef_search is not None:
+            self.vector_index_config["ef_search"] = int(ef_search)
+        if probes is not None:
+            self.vector_index_config["probes"] = int(probes)
+
+    def _configure_vector_search(self, cur):
+        # SET LOCAL only lasts until the end of the current transaction
+        method = self.vector_index_config.get("method", "none")
+        if method == "hnsw":
+            cur.execute("SET LOCAL hnsw.ef_search = %s", (self.vector_index_config["ef_search"],))
+            if self.supports_iterative_scan:
+                # Keeps scanning the graph until the page (filters and OFFSET included) is filled, in the exact order
+                cur.execute("SET LOCAL hnsw.iterative_scan = strict_order")
+        elif method == "ivfflat":
+            cur.execute("SET LOCAL ivfflat.probes = %s", (self.vector_index_config["probes"],))
+
+    def _embedding_expression(self, model_name, alias = None):
+        # Must match the expression of the partial indexes built in create_vector_indexes
+        column = "embedding_vector" if alias is None else f"{alias}.embedding_vector"
+        if self.vector_index_config.get("method", "none") == "none":
+            return column
+        return f"({column}::vector({int(self.preloaded_models_dims[model_name])}))"
+
     def _create_metric_table(self):
         with self._connect() as conn:
             with conn.cursor() as cur:
@@ -594,11 +691,13 @@ class DatabaseManager:
     # Preload data (for small datasets)
     def preload_models(self):
         db_models = {}
+        db_models_dims = {}
         with self._connect() as conn:
             with conn.cursor() as cur:
-                cur.execute("SELECT model_name, modelID FROM Model")
-                for model_name, model_id in cur.fetchall():
+                cur.execute("SELECT model_name, modelID, img_dim FROM Model")
+                for model_name, model_id, img_dim in cur.fetchall():
                     db_models[model_name] = model_id
+                    db_models_dims[model_name] = img_dim
 
         enabled_models_names = list(self.models.keys())
         db_models_names = list(db_models.keys())
@@ -610,10 +709,12 @@ class DatabaseManager:
                 common_models.append(model_name)
         
         preloaded_models = {}
+        preloaded_models_dims = {}
         preloaded_models_formatted = []
         for model_name in common_models:
             model_id = db_models[model_name]
             preloaded_models[model_name] = model_id
+            preloaded_models_dims[model_name] = db_models_dims[model_name]
 
             preloaded_models_formatted.append({
                 "model_name": model_name,
@@ -621,8 +722,187 @@ class DatabaseManager:
             })
 
         self.preloaded_models = preloaded_models
+        self.preloaded_models_dims = preloaded_models_dims
         self.preloaded_models_formatted = preloaded_models_formatted
 
+    def preload_vector_indexes(self):
+        for model_name, model_id in self.preloaded_models.items():
+            print(f"Loading vector index of model {model_name}...")
+            recordIDs = []
+            vectors = []
+            with self._connect() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT recordID, vector_send(embedding_vector) FROM Embedding WHERE modelid = %s ORDER BY recordID", (model_id,))
+                    for recordID, embedding in cur.fetchall():
+                        recordIDs.append(recordID)
+                        vectors.append(decode_vector(embedding))
+            if len(recordIDs) == 0:
+                print(f"    No embeddings found for model {model_name}, the database will be used instead")
+                continue
+            self.vector_indexes[model_name] = VectorIndex(model_name, recordIDs, np.stack(vectors))
+            print(f"✓ : Vector index of model {model_name} loaded ({len(recordIDs)} vectors)")
+
+    def preload_knn_graphs(self):
+        folder = self.knn_graph_config.get("folder", None)
+        if folder is None:
+            return
+        for model_name in self.preloaded_models:
+            knn_graph = KnnGraph.load(folder, model_name)
+            if knn_graph is None:
+                continue
+            if not knn_graph.matches(self.get_vector_index(model_name)):
+                # Built from other embeddings (before the last ingest, other weights, ...) or without checksum
+                print(f"    The nearest neighbours graph of model {model_name} is outdated, rebuild it with init_db.py")
+                continue
+            self.knn_graphs[model_name] = knn_graph
+            print(f"✓ : Nearest neighbours graph of model {model_name} loaded (k={knn_graph.k})")
+
+    def build_knn_graphs(self):
+        """
+            Computes the k nearest neighbours of every artwork under every model and saves them
+            in the knn graph folder. Must be run again after each ingest.
+        """
+        folder = self.knn_graph_config.get("folder", None)
+        if folder is None:
+            raise Exception("build_knn_graphs: No folder configured for the nearest neighbours graphs")
+        k = int(self.knn_graph_config.get("k", DEFAULT_KNN_GRAPH_K))
+        block_size = int(self.knn_graph_config.get("block_size", DEFAULT_KNN_GRAPH_BLOCK_SIZE))
+
+        # The embeddings may have changed since the start
+        self.preload_models()
+        self.vector_indexes = {}
+        self.preload_vector_indexes()
+        # Their columns follow the rows of the vector indexes
+        self.preload_keyword_scores()
+
+        self.knn_graphs = {}
+        for model_name, vector_index in self.vector_indexes.items():
+            print(f"Building the nearest neighbours graph of model {model_name}...")
+            knn_graph = KnnGraph.build(vector_index, k=k, block_size=block_size)
+            knn_graph.save(folder)
+            self.knn_graphs[model_name] = KnnGraph.load(folder, model_name)
+            print(f"✓ : Nearest neighbours graph of model {model_name} built (k={knn_graph.k})")
+
+    def preload_keyword_indexes(self):
+        for model_name, model_id in self.preloaded_models.items():
+            keywords = []
+            vectors = []
+            langs = []
+            with self._connect() as conn:
+                with conn.cursor() as cur:
+                    # By id: the first inserted keyword wins when several normalize to the same key
+                    cur.execute("SELECT keyword, vector_send(embedding), lang FROM Keywords WHERE modelid = %s ORDER BY id", (model_id,))
+                    for keyword, embedding, lang in cur.fetchall():
+                        keywords.append(keyword)
+                        vectors.append(decode_vector(embedding))
+                        langs.append(lang)
+            if len(keywords) == 0:
+                print(f"    No keywords found for model {model_name}, the database will be used instead")
+                continue
+            self.keyword_indexes[model_name] = KeywordIndex(model_name, keywords, np.stack(vectors), langs=langs)
+            print(f"✓ : Keyword index of model {model_name} loaded ({len(keywords)} keywords)")
+
+    def preload_keyword_scores(self):
+        self.keyword_scores = {}
+        if not self.keyword_scores_config.get("enabled", False):
+            return
+        dtype = np.dtype(self.keyword_scores_config.get("dtype", "float32"))
+        for model_name, keyword_index in self.keyword_indexes.items():
+            vector_index = self.get_vector_index(model_name)
+            if vector_index is None:
+                continue
+            keyword_scores = KeywordScores(
+                keyword_index,
+                vector_index,
+                langs=self.keyword_scores_config.get("langs", None),
+                dtype=dtype
+            )
+            self.keyword_scores[model_name] = keyword_scores
+            print(f"✓ : Keyword scores of model {model_name} computed ({keyword_scores.get_memory_size() / 1024 / 1024:.1f} MB)")
+
+    def preload_columnar_index(self):
+        """
+            Loads the columns the hard constraints can be applied to (see ColumnarIndex).
+            The tables with several rows per artwork are left to the database.
+        """
+        self.columnar_index = None
+        if not self.columnar_index_config.get("enabled", False):
+            return
+
+        keys_per_alias = {}
+        for key, column in column_mapping.items():
+            # The JSONB trees are left to the database
+            if column_types.get(key, None) == "JSONB":
+                continue
+            keys_per_alias.setdefault(get_column_alias(column), []).append(key)
+
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                # Same artworks as build_hard_query (inner join on Artist)
+                keys = keys_per_alias.get("a", []) + keys_per_alias.get("ar", [])
+                cur.execute(f"""
+                    SELECT a.recordID, {", ".join(column_mapping[key] for key in keys)}
+                    FROM Artwork a
+                    JOIN Artist ar ON a.creatorID = ar.creatorID
+                    ORDER BY a.recordID
+                """)
+                rows = cur.fetchall()
+                recordIDs = [row[0] for row in rows]
+                columns = {key: [row[position + 1] for row in rows] for position, key in enumerate(keys)}
+
+                recordID_to_row = {recordID: row for row, recordID in enumerate(recordIDs)}
+                for alias, alias_keys in keys_per_alias.items():
+                    if alias in ["a", "ar"]:
+                        continue
+                    table_name = hard_query_tables[alias]
+                    cur.execute(
+                        """
+                        SELECT column_name FROM information_schema.columns
+                        WHERE table_schema = 'public' AND LOWER(table_name) = LOWER(%s)
+                        """,
+                        (table_name,)
+                    )
+                    existing_columns = {row[0].lower() for row in cur.fetchall()}
+                    # Keys mapped to a column the table does not have are left to the database
+                    alias_keys = [key for key in alias_keys if column_mapping[key].split(".", 1)[1].lower() in existing_columns]
+                    if len(alias_keys) == 0:
+                        continue
+                    cur.execute(f"SELECT {alias}.recordID, {', '.join(column_mapping[key] for key in alias_keys)} FROM {table_name} {alias}")
+                    table_columns = {key: [None] * len(recordIDs) for key in alias_keys}
+                    seen = set()
+                    duplicated = False
+                    for row in cur.fetchall():
+                        if row[0] in seen:
+                            # A left join would match several rows per artwork
+                            duplicated = True
+                            break
+                        seen.add(row[0])
+                        position = recordID_to_row.get(row[0], None)
+                        if position is None:
+                            continue
+                        for column_position, key in enumerate(alias_keys):
+                            table_columns[key][position] = row[column_position + 1]
+                    if not duplicated:
+                        columns.update(table_columns)
+
+        self.columnar_index = ColumnarIndex(recordIDs, columns)
+        print(f"✓ : Columnar index loaded ({len(self.columnar_index)} artworks, {len(columns)} columns)")
+
+    def get_subset_mask(self, hard_constraints, base_query, params, model_name):
+        """
+            Returns the mask (aligned with the rows of the vector index) of the artworks matching the hard constraints,
+            evaluated in memory when possible.
+        """
+        vector_index = self.get_vector_index(model_name)
+        if self.columnar_index is not None:
+            try:
+                subset = self.columnar_index.filter(hard_constraints)
+                return np.isin(vector_index.recordIDs, subset)
+            except UnsupportedConstraint:
+                pass
+        subset = np.asarray(self.get_subset_recordIDs(base_query, params, model_name), dtype=np.int64)
+        return np.isin(vector_index.recordIDs, subset)
+
     def preload_keywords(self):
         with self._connect() as conn:
             with conn.cursor() as cur:
@@ -670,6 +950,9 @@ class DatabaseManager:
             raise Exception("Luminosities are not preloaded")
         return self.preloaded_luminosities
 
+    def get_vector_index(self, model_name):
+        return self.vector_indexes.get(model_name, None)
+
     def get_tables(self):
         with self._connect() as conn:
             with conn.cursor() as cur:
@@ -753,6 +1036,20 @@ class DatabaseManager:
                 return artworks
 
     def get_artwork_by_recordID(self, recordID: int):
+        artworks = self.get_artworks_by_recordIDs([recordID])
+        if len(artworks) == 0:
+            return None
+        return artworks[0]
+
+    def get_artworks_by_recordIDs(self, recordIDs):
+        """
+            Fetches the artworks of all the recordIDs in one round trip.
+            The artworks are returned in the order of recordIDs, unknown recordIDs are skipped.
+        """
+        recordIDs = [int(recordID) for recordID in recordIDs]
+        if len(recordIDs) == 0:
+            return []
+
         with self._connect() as conn:
             with conn.cursor() as cur:
                 cur.execute(
@@ -809,17 +1106,20 @@ class DatabaseManager:
                     LEFT JOIN GeneralSubjectDescription GSD ON Artwork.recordID = GSD.recordID
                     LEFT JOIN SpecificSubjectIdentification SSI ON Artwork.recordID = SSI.recordID
 
-                    WHERE Artwork.recordID = %s
+                    WHERE Artwork.recordID = ANY(%s)
                     """,
-                    (recordID,)
+                    (recordIDs,)
                 )
-                result = cur.fetchone()
-                if result:
-                    columns = [desc[0] for desc in cur.description]
-                    results = dict(zip(columns, result))
-                    results["image_url"] = f"http://127.0.0.1:5000/api/artwork/{recordID}/image"
-                    return results
-                return None
+                columns = [desc[0] for desc in cur.description]
+                artworks_per_recordID = {}
+                for result in cur.fetchall():
+                    artwork = dict(zip(columns, result))
+                    recordID = artwork["recordid"]
+                    if recordID not in artworks_per_recordID:
+                        artwork["image_url"] = f"http://127.0.0.1:5000/api/artwork/{recordID}/image"
+                        artworks_per_recordID[recordID] = artwork
+
+        return [artworks_per_recordID[recordID] for recordID in recordIDs if recordID in artworks_per_recordID]
 
     def get_image_path_by_recordID(self, recordID: int):
         with self._connect() as conn:
@@ -828,7 +1128,7 @@ class DatabaseManager:
                 result = cur.fetchone()
                 return result[0] if result else None
 
-    def get_artist_by_creatorID(self, creatorID: int):
+    def get_artist_by_creatorID(self, creatorID: int, include_artworks: bool = False):
         with self._connect() as conn:
             with conn.cursor() as cur:
                 cur.execute(
@@ -852,8 +1152,14 @@ class DatabaseManager:
                 result = cur.fetchone()
                 if result:
                     columns = [desc[0] for desc in cur.description]
-                    return dict(zip(columns, result))
-                return None
+                    artist = dict(zip(columns, result))
+                else:
+                    return None
+
+        if include_artworks:
+            recordIDs = [recordID for recordID in artist["artworkrecordids"] if recordID is not None]
+            artist["artworks"] = self.get_artworks_by_recordIDs(recordIDs)
+        return artist
             
     def get_model_id_from_model_name(self, model_name: str):
         try:
@@ -861,6 +1167,35 @@ class DatabaseManager:
         except KeyError:
             raise Exception(f"Model {model_name} not found in the database")
 
+    def get_similarity_ranking(
+        self,
+        recordID: int,
+        page: int,
+        page_size: int,
+        depth: int,
+        keep_original_record: bool = False,
+        model_name: str = None
+    ):
+        """
+            Returns the first results of the ranking of the nearest artworks to recordID (see get_nearest_artworks_to_recordID)
+            and the depth they cover: the neighbours of the graph when the page is within them, otherwise the first depth results.
+        """
+        knn_graph = self.knn_graphs.get(model_name, None)
+        if knn_graph is not None:
+            ranking = knn_graph.get_ranking(recordID, page, page_size, depth, keep_original_record=keep_original_record)
+            if ranking is not None:
+                results, graph_depth = ranking
+                return [{"recordID": resultRecordID, "distance": -score} for resultRecordID, score in results], graph_depth
+
+        results = self.get_nearest_artworks_to_recordID(
+            recordID=recordID,
+            page=1,
+            page_size=depth,
+            keep_original_record=keep_original_record,
+            model_name=model_name
+        )
+        return results, depth
+
     def get_nearest_artworks_to_recordID(
         self,
         recordID: int,
@@ -870,27 +1205,46 @@ class DatabaseManager:
         model_name: str = None
     ):
         model_id = self.get_model_id_from_model_name(model_name)
-        
+        offset = (page - 1) * page_size
+
+        knn_graph = self.knn_graphs.get(model_name, None)
+        if knn_graph is not None:
+            # None when the page goes beyond the precomputed neighbours
+            results = knn_graph.get_neighbours(recordID, offset, page_size, keep_original_record=keep_original_record)
+            if results is not None:
+                return [{"recordID": resultRecordID, "distance": -score} for resultRecordID, score in results]
+
+        vector_index = self.get_vector_index(model_name)
+        if vector_index is not None:
+            embedding = vector_index.get_vector(recordID)
+            if embedding is None:
+                return None
+            exclude = None if keep_original_record else [recordID]
+            results = vector_index.search(embedding, page_size, offset=offset, exclude=exclude)
+            # Same convention as pgvector's <#> operator (negative inner product)
+            return [{"recordID": resultRecordID, "distance": -score} for resultRecordID, score in results]
+
         # First get the embedding of the artwork with the given recordID
         with self._connect() as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
-                    SELECT embedding_vector FROM Embedding WHERE recordID = %s AND modelid = %s;
+                    SELECT vector_send(embedding_vector) FROM Embedding WHERE recordID = %s AND modelid = %s;
                     """,
                     (recordID, model_id,)
                 )
                 embedding = cur.fetchone()
                 if embedding:
-                    embedding = embedding[0]
+                    embedding = decode_vector(embedding[0])
                 else:
                     return None
                 # Get the page_size nearest artworks to the embedding with the offset 
-                offset = (page - 1) * page_size
+                self._configure_vector_search(cur)
+                embedding_expression = self._embedding_expression(model_name)
                 if keep_original_record:
                     cur.execute(
-                        """
-                        SELECT recordID, embedding_vector <#> %s as distance 
+                        f"""
+                        SELECT recordID, {embedding_expression} <#> %s as distance 
                         FROM Embedding 
                         WHERE modelid = %s
                         ORDER BY distance
@@ -900,8 +1254,8 @@ class DatabaseManager:
                     )
                 else:   
                     cur.execute(
-                        """
-                        SELECT recordID, embedding_vector <#> %s as distance 
+                        f"""
+                        SELECT recordID, {embedding_expression} <#> %s as distance 
                         FROM Embedding 
                         WHERE modelid = %s
                         AND recordID != %s
@@ -914,206 +1268,114 @@ class DatabaseManager:
                 return [{"recordID": row[0], "distance": float(row[1])} for row in results]
 
     def get_hard_query(self, constraints):
-        base_query = """
-            SELECT
-            *
-            FROM Artwork a
-            JOIN Artist ar ON a.creatorID = ar.creatorID
-            LEFT JOIN ConceptualTerms_Flat CFT ON a.recordID = CFT.recordID
-            LEFT JOIN IconographicTerms_Flat IFT ON a.recordID = IFT.recordID
-            LEFT JOIN SubjectTerms_Flat STF ON a.recordID = STF.recordID
-            LEFT JOIN IconographicTerms_Tree IFTT ON a.recordID = IFTT.recordID
-            LEFT JOIN ConceptualTerms_Tree CFTT ON a.recordID = CFTT.recordID
-            LEFT JOIN SubjectTerms_Tree STT ON a.recordID = STT.recordID
-            LEFT JOIN IconographicInterpretation II ON a.recordID = II.recordID
-            LEFT JOIN GeneralSubjectDescription GSD ON a.recordID = GSD.recordID
-            LEFT JOIN SpecificSubjectIdentification SSI ON a.recordID = SSI.recordID
-            JOIN Embedding e ON (a.recordID = e.recordID AND e.modelid = %s)
-            WHERE 1=1
-        """
-
-        if not constraints:
-            return base_query, []
-
-        def parse_constraint(constraint):
-            constraint_type = constraint["type"]
-
-            selected_column = constraint.get("selectedColumn", {})
-            key = selected_column.get("key", None)
-
-            is_not = constraint.get("isNot", False)
-            exact_match = constraint.get("exactMatch", False)
-            case_sensitive = constraint.get("caseSensitive", False)
-            keep_null = constraint.get("keepNull", False)
-
-            column = ""
-            isColumnAList = False
-            columnType = None
-
-            if constraint_type not in ["AND", "OR", "GROUP"]:
-                if key not in column_mapping:
-                    return "", []
-                column = column_mapping[key]
-                isColumnAList = column_is_list.get(key, False)
-                columnType = column_types.get(key, None)
-
-            # If the columnType is either INTEGER or NUMERIC, we will override the case_sensitive to True to avoid LOWER()
-            if columnType in ["INTEGER", "NUMERIC"]:
-                case_sensitive = True
-
-            if is_not:
-                not_prefix = "NOT "
-            else:
-                not_prefix = " "
-                
-            if keep_null:
-                suffix = f" OR {column} IS NULL "
-            else:
-                suffix = " "
-
-            if constraint_type == "AND":
-                return "AND" + suffix, []
-            elif constraint_type == "OR":
-                return "OR" + suffix, []
-            elif constraint_type == "GROUP":
-                subquery = ""
-                subparams = []
-
-                for child in constraint["children"]:
-                    subquery_temp, subparams_temp = parse_constraint(child)
-                    subquery += subquery_temp
-                    subparams.extend(subparams_temp)
-
-                return not_prefix + "(" + subquery + ")" + suffix, subparams
-            elif constraint_type == "EQUAL":
-                """
-                ==> "column = %s", [value] if exact_match and case_sensitive
-                ==> "LOWER(column) = LOWER(%s)", [value] if exact_match and not case_sensitive
-                ==> "LIKE", ["%value%"] if not exact_match and case_sensitive
-                ==> "LOWER(column) LIKE LOWER(%s)", ["%value%"] if not exact_match and not case_sensitive
-                """
-                inp_equalTo = constraint.get("equalTo", None)
-                if inp_equalTo is None:
-                    return "", []
-                if exact_match:
-                    if case_sensitive:
-                        if isColumnAList:
-                            return not_prefix + f"{column} @> ARRAY[%s]" + suffix, [inp_equalTo]
-                        else:
-                            return not_prefix + f"{column} = %s" + suffix, [inp_equalTo]
-                    else:
-                        if isColumnAList:
-                            return not_prefix + f"LOWER({column}) @> ARRAY[LOWER(%s)]" + suffix, [inp_equalTo]
-                        else:
-                            return not_prefix + f"LOWER({column}) = LOWER(%s)" + suffix, [inp_equalTo]
-                else:
-                    if case_sensitive:
-                        if isColumnAList:
-                            # At least one term from the TEXT[] column must be LIKE the input
-                            return not_prefix + f"""
-                                EXISTS (
-                                    SELECT 1
-                                    FROM unnest({column}) AS term
-                                    WHERE term LIKE %s
-                                )
-                            """ + suffix, [f"%{inp_equalTo}%"]
-                        else:
-                            return not_prefix + f"{column} LIKE %s" + suffix, [f"%{inp_equalTo}%"]
-                    else:
-                        if isColumnAList:
-                            # At least one lowered term from the TEXT[] column must be LIKE the lowered input
-                            return not_prefix + f"""
-                                EXISTS (
-                                    SELECT 1
-                                    FROM unnest({column}) AS term
-                                    WHERE LOWER(term) LIKE LOWER(%s)
-                                ) 
-                            """ + suffix, [f"%{inp_equalTo}%"]
-                        else:
-                            return not_prefix + f"LOWER({column}) LIKE LOWER(%s)" + suffix, [f"%{inp_equalTo}%"]
-            elif constraint_type == "BETWEEN":
-                """
-                ==> "column BETWEEN %s AND %s", [value1, value2] if case_sensitive
-                ==> "LOWER(column) BETWEEN LOWER(%s) AND LOWER(%s)", [value1, value2] if not case_sensitive (and column is text)
-                """
-                inp_from = constraint.get("from", None)
-                inp_to = constraint.get("to", None)
-                if inp_from is None or inp_to is None:
-                    return "", []
-                if isColumnAList:
-                    return suffix
-                else:
-                    if case_sensitive:
-                        q, params = f"{column} BETWEEN %s AND %s", [inp_from, inp_to]
-                    else:
-                        q, params = f"LOWER({column}) BETWEEN LOWER(%s) AND LOWER(%s)", [inp_from, inp_to]
-                    if is_not:
-                        q = f"NOT ({q}) "
-                    return q + suffix, params
-            elif constraint_type == "INCLUDES":
-                """
-                Includes uses the exact_match differently, if exact match is set to true, it means that every query term
-                must be present in the selected column.
-                If exact match is set to false, it means that at least one query term must be present in the selected column.
-
-                If the selected column is a list, we want && operator (at least one term must be present) and the "@>" (all terms must be present) operator:
-                    ==> "column @> ARRAY[%s]" AND "column @> ARRAY[%s]", ["value1", "value2", ...] if exact_match 
-                    ==> "column && ARRAY[%s]" OR "column && ARRAY[%s]", ["value1", "value2", ...] if not exact_match
-                    # TODO: Add case sensitive and not case sensitive versions (maybe one table for lower and one for upper ? Faster queries ?)
-                If the selected column is not a list:
-                    ==> "column LIKE %s" AND "column LIKE %s", ["%value1%", "%value2%"], ... if exact_match and case_sensitive
-                    ==> "LOWER(column) LIKE LOWER(%s)" AND "LOWER(column) LIKE LOWER(%s)", ["%value1%", "%value2%"], ... if exact_match and not case_sensitive
-                    ==> "column LIKE %s" OR "column LIKE %s", ["%value1%", "%value2%"], ... if not exact_match and case_sensitive
-                    ==> "LOWER(column) LIKE LOWER(%s)" OR "LOWER(column) LIKE LOWER(%s)", ["%value1%", "%value2%"], ... if not exact_match and not case_sensitive
-                """
-                inp_values = constraint.get("values", None)
-                if inp_values is None:
-                    return "", []
-                if isColumnAList:
-                    if exact_match:
-                        return not_prefix + f"{column} @> %s" + suffix, [inp_values]
-                    else:
-                        return not_prefix + f"{column} && %s" + suffix, [inp_values]
-                else:
-                    per_term_queries = []
-                    for value in inp_values:
-                        if case_sensitive:
-                            per_term_queries.append(not_prefix + f"{column} LIKE %s")
-                        else:
-                            per_term_queries.append(not_prefix + f"LOWER({column}) LIKE LOWER(%s)")
-                    return not_prefix + " AND ".join(per_term_queries) + suffix, [f"%{value}%" for value in inp_values]
-                
-            # If the constraint is not supported, return an empty string and an empty list
-            # We should maybe raise an error instead and log it #TODO
-            return "", []
-
-        conditions = ""
-        params = []
-        for constraint in constraints:
-            new_condition, new_params = parse_constraint(constraint)
-            conditions += new_condition
-            params.extend(new_params)
-        
-        if len(conditions) > 0:
-            return base_query + " AND " + conditions, params
-        else:
-            return base_query, []
+        # Only the recordIDs are selected, and only the tables used by the constraints are joined
+        return build_hard_query(constraints)
 
     def get_embedding_from_recordID(self, recordID: int, model_name: str):
         model_id = self.get_model_id_from_model_name(model_name)
         with self._connect() as conn:
             with conn.cursor() as cur:
                 cur.execute("""
-                    SELECT embedding_vector
+                    SELECT vector_send(embedding_vector)
                     FROM Embedding e
                     WHERE e.recordID = %s AND e.modelid = %s
                     """,
                     (recordID, model_id))
                 result = cur.fetchone()
                 if result:
-                    return convert_embedding_to_numpy(result[0])
+                    return decode_vector(result[0])
                 return None
 
+    def get_embeddings_for_recordIDs(self, recordIDs, model_name: str):
+        """
+            Returns the (n, d) float32 matrix of the embeddings of the recordIDs and the list of the recordIDs found,
+            aligned with the rows of the matrix. Served by the in-memory vector index when there is one,
+            otherwise by a single query.
+        """
+        recordIDs = [int(recordID) for recordID in recordIDs]
+
+        vector_index = self.get_vector_index(model_name)
+        if vector_index is not None:
+            return vector_index.get_vectors(recordIDs)
+
+        model_id = self.get_model_id_from_model_name(model_name)
+        embeddings_per_recordID = {}
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT recordID, vector_send(embedding_vector)
+                    FROM Embedding e
+                    WHERE e.recordID = ANY(%s) AND e.modelid = %s
+                    """,
+                    (recordIDs, model_id))
+                for recordID, embedding in cur.fetchall():
+                    embeddings_per_recordID[recordID] = decode_vector(embedding)
+
+        found_recordIDs = [recordID for recordID in recordIDs if recordID in embeddings_per_recordID]
+        if len(found_recordIDs) == 0:
+            return np.empty((0, self.preloaded_models_dims[model_name]), dtype=np.float32), []
+        matrix = np.stack([embeddings_per_recordID[recordID] for recordID in found_recordIDs])
+        return matrix, found_recordIDs
+
+    def get_rocchio_neighbours(self, seed_matrix, seed_recordIDs, k: int, model_name: str):
+        """
+            Returns the (s, k, d) embeddings of the k nearest artworks of each seed (the seed itself excluded)
+            and their (s, k) scores (inner products). Missing neighbours have a score of -inf.
+            Served by the in-memory vector index when there is one, otherwise by a single query.
+        """
+        number_of_seeds = len(seed_recordIDs)
+        dim = seed_matrix.shape[1]
+
+        vector_index = self.get_vector_index(model_name)
+        knn_graph = self.knn_graphs.get(model_name, None)
+        if vector_index is not None and knn_graph is not None and k <= knn_graph.k:
+            graph_rows = [knn_graph.recordID_to_row.get(int(recordID), None) for recordID in seed_recordIDs]
+            if all(row is not None for row in graph_rows):
+                # The graph is validated against the vector index: same recordIDs
+                neighbours_recordIDs = knn_graph.neighbours[graph_rows, :k]
+                rows = np.vectorize(vector_index.recordID_to_row.get, otypes=[np.int64])(neighbours_recordIDs)
+                return vector_index.matrix[rows], np.array(knn_graph.scores[graph_rows, :k], dtype=np.float32)
+
+        if vector_index is not None:
+            rows, scores = vector_index.search_batch(seed_matrix, k, exclude=[[recordID] for recordID in seed_recordIDs])
+            return vector_index.matrix[rows], scores
+
+        neighbours = np.zeros((number_of_seeds, k, dim), dtype=np.float32)
+        scores = np.full((number_of_seeds, k), -np.inf, dtype=np.float32)
+        if number_of_seeds == 0 or k <= 0:
+            return neighbours, scores
+
+        model_id = self.get_model_id_from_model_name(model_name)
+        neighbour_expression = self._embedding_expression(model_name, alias="e")
+        seed_expression = self._embedding_expression(model_name, alias="se")
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                self._configure_vector_search(cur)
+                cur.execute(
+                    f"""
+                    SELECT s.position, vector_send(n.embedding_vector), n.distance
+                    FROM unnest(%s::integer[]) WITH ORDINALITY AS s(recordID, position)
+                    JOIN Embedding se ON se.recordID = s.recordID AND se.modelid = %s
+                    CROSS JOIN LATERAL (
+                        SELECT e.embedding_vector, {neighbour_expression} <#> {seed_expression} AS distance
+                        FROM Embedding e
+                        WHERE e.modelid = %s
+                        AND e.recordID != s.recordID
+                        ORDER BY distance
+                        LIMIT %s
+                    ) n
+                    ORDER BY s.position, n.distance
+                    """,
+                    ([int(recordID) for recordID in seed_recordIDs], model_id, model_id, k)
+                )
+                counts = np.zeros(number_of_seeds, dtype=np.int64)
+                for position, embedding, distance in cur.fetchall():
+                    seed_index = position - 1
+                    neighbours[seed_index, counts[seed_index]] = decode_vector(embedding)
+                    scores[seed_index, counts[seed_index]] = -distance
+                    counts[seed_index] += 1
+        return neighbours, scores
+
     def get_nearest_artworks_to_embedding_from_subset(
         self,
         base_query,
@@ -1146,6 +1408,7 @@ class DatabaseManager:
                     return recordIDs
                 else:
                     # Soft constraints, we get the artworks ordered by the query embedding
+                    self._configure_vector_search(cur)
                     params_full = []
                     params_full.append(model_id)
                     params_full.extend(params)
@@ -1153,8 +1416,8 @@ class DatabaseManager:
                     params_full.append(page_size)
                     params_full.append(offset)
                     cur.execute(
-                        base_query + """
-                        ORDER BY e.embedding_vector <#> %s
+                        base_query + f"""
+                        ORDER BY {self._embedding_expression(model_name, "e")} <#> %s
                         LIMIT %s OFFSET %s;
                         """,
                         tuple(params_full)
@@ -1174,15 +1437,82 @@ class DatabaseManager:
         rocchio_k: int,
         rocchio_scale: float,
     ):
+        nearest_artworks = self.rank_query(
+            hard_constraints,
+            soft_constraints,
+            page,
+            page_size,
+            model_name,
+            version,
+            rocchio_k,
+            rocchio_scale
+        )
+
+        # Return the artworks (one round trip, in the order of the ranking)
+        artworks = self.get_artworks_by_recordIDs(nearest_artworks)
+        return artworks
+
+    def rank_query(
+        self,
+        hard_constraints,
+        soft_constraints,
+        page: int,
+        page_size: int,
+        model_name: str,
+        version: str,
+        rocchio_k: int,
+        rocchio_scale: float,
+    ):
+        """
+            Returns the recordIDs of the page of the ranking of the query.
+            With page=1 and a large page_size, this is the ranked list used by the cursors (see RankingCache).
+        """
         # Get the base query and the params
         base_query, params = self.get_hard_query(hard_constraints)
 
         # Soft constraints are a list of text, colors, keywords, ... and recordIDs
         # that will form a query embedding using the model.
-        query_embedding = self.get_query_embedding(soft_constraints, model_name, version, rocchio_k, rocchio_scale)
-        
+        keyword_scores = self.keyword_scores.get(model_name, None)
+        embeddings, weights, keyword_rows, keyword_weights = self.get_query_vectors(
+            soft_constraints,
+            model_name,
+            version,
+            rocchio_k,
+            rocchio_scale,
+            keyword_scores=keyword_scores
+        )
+
+        if len(keyword_rows) > 0:
+            # The query is ranked in score space, in memory (see compose_query_scores)
+            scores = self.compose_query_scores(embeddings, weights, keyword_rows, keyword_weights, model_name, version)
+            return self.get_nearest_artworks_from_scores(
+                base_query,
+                params,
+                model_name,
+                scores,
+                page,
+                page_size,
+                is_subset=bool(hard_constraints),
+                hard_constraints=hard_constraints
+            )
+
+        query_embedding = self.combine_query_vectors(embeddings, weights, version)
+        vector_index = self.get_vector_index(model_name)
+        if query_embedding is not None and vector_index is not None:
+            # Exact ranking in memory (the approximate indexes of the database stop after ef_search results)
+            return self.get_nearest_artworks_from_scores(
+                base_query,
+                params,
+                model_name,
+                vector_index.scores(query_embedding),
+                page,
+                page_size,
+                is_subset=bool(hard_constraints),
+                hard_constraints=hard_constraints
+            )
+
         # Get the page_size nearest artworks to the query embedding with the offset page
-        nearest_artworks = self.get_nearest_artworks_to_embedding_from_subset(
+        return self.get_nearest_artworks_to_embedding_from_subset(
             base_query,
             params,
             model_name,
@@ -1191,16 +1521,49 @@ class DatabaseManager:
             page_size,
         )
 
-        # Return the artworks
-        artworks = [self.get_artwork_by_recordID(recordID) for recordID in nearest_artworks]
-        return artworks
+    def get_subset_recordIDs(self, base_query, params, model_name):
+        """
+            Returns the recordIDs of the artworks matching the hard constraints.
+        """
+        model_id = self.get_model_id_from_model_name(model_name)
+        with self._connect() as conn:
+            with conn.cursor() as cur:
+                cur.execute(base_query, tuple([model_id] + list(params)))
+                return [row[0] for row in cur.fetchall()]
+
+    def get_nearest_artworks_from_scores(
+        self,
+        base_query,
+        params,
+        model_name,
+        scores,
+        page,
+        page_size,
+        is_subset = True,
+        hard_constraints = None,
+    ):
+        """
+            Returns the recordIDs of the page of the best scores (aligned with the rows of the vector index)
+            among the artworks matching the hard constraints.
+        """
+        vector_index = self.get_vector_index(model_name)
+        mask = None
+        if is_subset:
+            mask = self.get_subset_mask(hard_constraints, base_query, params, model_name)
+        rows = vector_index.top_k(scores, page_size, offset=(page - 1) * page_size, mask=mask)
+        return [int(recordID) for recordID in vector_index.recordIDs[rows]]
 
     def get_keyword_embedding(self, keyword: str, model_name: str):
+        keyword_index = self.keyword_indexes.get(model_name, None)
+        if keyword_index is not None:
+            # The returned embedding is read-only
+            return keyword_index.get(keyword)
+
         model_id = self.get_model_id_from_model_name(model_name)
         with self._connect() as conn:
             with conn.cursor() as cur:
                 cur.execute("""
-                    SELECT embedding
+                    SELECT vector_send(embedding)
                     FROM Keywords k
                     WHERE LOWER(k.keyword) = LOWER(%s) AND k.modelid = %s
                     """,
@@ -1208,24 +1571,36 @@ class DatabaseManager:
                 )
                 result = cur.fetchone()
                 if result:
-                    return convert_embedding_to_numpy(result[0])
+                    return decode_vector(result[0])
                 return None
 
-    def get_query_embedding(
-        self, 
-        soft_constraints, 
+    def get_query_vectors(
+        self,
+        soft_constraints,
         model_name: str,
         version: str = "rocchio",
         rocchio_k: int = 5,
-        rocchio_scale: float = 1.0
+        rocchio_scale: float = 1.0,
+        keyword_scores = None,
     ):
+        """
+            Returns the (m, d) embeddings and the (m,) weights (before the weighting of the version) of the soft constraints,
+            and the lists of the rows (in the keyword index) and weights of the keywords.
+            The keywords (KEYWORD, COLOR, LUMINOSITY) are only returned apart when they are in keyword_scores,
+            otherwise (and without keyword_scores) their embeddings are returned with the other ones.
+        """
         if model_name not in self.models:
             raise Exception(f"Model {model_name} not found")
-        
-        model = self.models[model_name]
-        
+
         embeddings = []
         weights = []
+        # The terms are encoded together after the loop (one batch), we keep their position in embeddings
+        terms = []
+        terms_positions = []
+        seeds = []
+        seeds_weights = []
+        keyword_rows = []
+        keyword_weights = []
         for constraint in soft_constraints:
             weight = constraint.get("weight", 0)
 
@@ -1233,123 +1608,130 @@ class DatabaseManager:
                 # A term can be anything that the user inputs
                 text = constraint.get("term", "")
                 if len(text) > 0 and weight != 0:
-                    text_embedding = model.encode_text(text)
-                    embeddings.append(text_embedding)
+                    terms.append(text)
+                    terms_positions.append(len(embeddings))
+                    embeddings.append(None)
                     weights.append(weight)
 
-            elif constraint['type'] == 'KEYWORD':
-                # A keyword is a precomputed embedding that we should be able to retrieve from the database
-                keyword = constraint.get("keyword", "")
+            elif constraint['type'] in KEYWORD_CONSTRAINT_FIELDS:
+                # Keywords, colors and luminosities are precomputed embeddings (see preload_keyword_indexes)
+                keyword = constraint.get(KEYWORD_CONSTRAINT_FIELDS[constraint['type']], "")
                 if len(keyword) > 0 and weight != 0:
+                    if keyword_scores is not None:
+                        keyword_row = self.keyword_indexes[model_name].get_row(keyword)
+                        if keyword_row is not None and keyword_row in keyword_scores:
+                            # Its scores against every artwork are precomputed
+                            keyword_rows.append(keyword_row)
+                            keyword_weights.append(weight)
+                            continue
                     keyword_embedding = self.get_keyword_embedding(keyword, model_name)
                     if keyword_embedding is not None:
                         embeddings.append(keyword_embedding)
                         weights.append(weight)
 
-            elif constraint['type'] == 'COLOR':
-                # A color is a precomputed embedding that we should be able to retrieve from the database
-                color = constraint.get("color", "")
-                if len(color) > 0 and weight != 0:
-                    keyword_embedding = self.get_keyword_embedding(color, model_name)
-                    if keyword_embedding is not None:
-                        embeddings.append(keyword_embedding)
-                        weights.append(weight)
-
-            elif constraint['type'] == 'LUMINOSITY':
-                # A color is a precomputed embedding that we should be able to retrieve from the database
-                luminosity = constraint.get("luminosity", "")
-                if len(luminosity) > 0 and weight != 0:
-                    keyword_embedding = self.get_keyword_embedding(luminosity, model_name)
-                    if keyword_embedding is not None:
-                        embeddings.append(keyword_embedding)
-                        weights.append(weight)
-
             elif constraint['type'] == 'PRECOMPUTED':
                 # A precomputed is a recordID of an artwork that we should be able to retrieve from the database
                 # We should use the embedding of the artwork to form the query embedding
+                # The seeds are fetched together after the loop (as well as their neighbours for rocchio)
                 recordID = constraint.get("recordID", None)
                 if recordID is not None and weight != 0:
-                    artwork_embedding = self.get_embedding_from_recordID(recordID, model_name)
-                    if artwork_embedding is not None:
-                        
-                        # We add the artwork embedding to the embeddings list
-                        embeddings.append(artwork_embedding)
-                        weights.append(weight)
+                    seeds.append(recordID)
+                    seeds_weights.append(weight)
+
+        if len(terms) > 0:
+            # Only the terms need the text encoder (loaded on demand by the registry)
+            model = self.models[model_name]
+            terms_embeddings = model.encode_texts(terms)
+            for position, term_embedding in zip(terms_positions, terms_embeddings):
+                embeddings[position] = term_embedding
+
+        dim = self.preloaded_models_dims[model_name]
+        embeddings = np.array(embeddings, dtype=np.float32).reshape(-1, dim)
+        weights = np.array(weights, dtype=np.float32)
+
+        if len(seeds) > 0:
+            seed_matrix, found_seeds = self.get_embeddings_for_recordIDs(seeds, model_name)
+            # Seeds without embedding are ignored (found_seeds is seeds without them, in the same order)
+            found_recordIDs = set(found_seeds)
+            seed_weights = np.array(
+                [weight for recordID, weight in zip(seeds, seeds_weights) if int(recordID) in found_recordIDs],
+                dtype=np.float32
+            )
+            embeddings = np.concatenate([embeddings, seed_matrix])
+            weights = np.concatenate([weights, seed_weights])
 
-                        if version == "rocchio":
-                            # Get k nearest artworks to the artwork embedding
-                            nearest_artworks = self.get_nearest_artworks_to_recordID(
-                                recordID,
-                                page=1,
-                                page_size=rocchio_k,
-                                keep_original_record=False,
-                                model_name=model_name
-                            )
-
-                            # We add the nearest artworks to the embeddings list
-                            for nearest_artwork in nearest_artworks:
-                                recordID = nearest_artwork["recordID"]
-                                distance = -nearest_artwork["distance"] # The closest distance possible is -1 (pgvector quirk ?)
-                                nearest_artwork_embedding = self.get_embedding_from_recordID(recordID, model_name)
-                                if nearest_artwork_embedding is not None:
-                                    embeddings.append(nearest_artwork_embedding)
-                                    distance = max(distance, 0)
-                                    weights.append(rocchio_scale * weight * np.power(distance, 2))
+            if version == "rocchio" and len(found_seeds) > 0 and rocchio_k > 0:
+                # The k nearest artworks of each seed, weighted by their squared (positive) similarity to the seed
+                neighbours, scores = self.get_rocchio_neighbours(seed_matrix, found_seeds, rocchio_k, model_name)
+                neighbours_weights = rocchio_scale * seed_weights[:, None] * np.square(np.maximum(scores, 0))
+                embeddings = np.concatenate([embeddings, neighbours.reshape(-1, dim)])
+                weights = np.concatenate([weights, neighbours_weights.reshape(-1)])
 
-        if len(embeddings) == 0:
-            return None
-
-        embeddings = np.array(embeddings)   # Convert to numpy array
-        weights = np.array(weights)         # Convert to numpy array
+        return embeddings, weights, keyword_rows, np.array(keyword_weights, dtype=np.float32)
 
+    def get_version_weights(self, weights, version: str):
         if version == "classic" or version == "rocchio":
-            # Multiply each embedding by its weight
-            for i in range(len(embeddings)):
-                embeddings[i] *= weights[i]
+            return weights
         elif version == "power":
-            # Multiply each embedding by the power of its weight
-            for i in range(len(embeddings)):
-                sign = 1 if weights[i] >= 0 else -1
-                embeddings[i] *= np.power(weights[i], 2) * sign
-        else:
-            raise Exception("Unknown version")
+            # Signed square of the weights
+            return np.square(weights) * np.sign(weights)
+        raise Exception("Unknown version")
 
-        # Sum all the embeddings
-        embeddings = np.sum(embeddings, axis=0)
+    def get_query_embedding(
+        self, 
+        soft_constraints, 
+        model_name: str,
+        version: str = "rocchio",
+        rocchio_k: int = 5,
+        rocchio_scale: float = 1.0
+    ):
+        embeddings, weights, _, _ = self.get_query_vectors(soft_constraints, model_name, version, rocchio_k, rocchio_scale)
+        return self.combine_query_vectors(embeddings, weights, version)
+
+    def combine_query_vectors(self, embeddings, weights, version: str):
+        if len(embeddings) == 0:
+            return None
+
+        # Weighted sum of the embeddings
+        embedding = self.get_version_weights(weights, version) @ embeddings
 
         # Normalize
-        embeddings /= np.linalg.norm(embeddings)
+        embedding /= np.linalg.norm(embedding)
+
+        return embedding
 
-        return embeddings
+    def compose_query_scores(self, embeddings, weights, keyword_rows, keyword_weights, model_name: str, version: str):
+        """
+            Scores of every artwork (rows of the vector index) for the query, composed in score space:
+            the precomputed scores of the keywords plus the live scores of the other soft constraints.
+            Gives the same ranking as the (normalized) query embedding, the scores are not normalized.
+        """
+        scores = self.keyword_scores[model_name].combine(keyword_rows, self.get_version_weights(keyword_weights, version))
+        if len(embeddings) > 0:
+            scores += self.get_vector_index(model_name).scores(self.get_version_weights(weights, version) @ embeddings)
+        return scores
 
     def get_all_recordIDs(self):
         if self.preloaded_recordIDs is None:
             raise Exception("RecordIDs not preloaded")
         return self.preloaded_recordIDs
 
-    def get_closest_recordID_to_embedding(
-        self,
-        embedding,
-        recordIDs,
-        model_name,
-    ):
-        model_id = self.get_model_id_from_model_name(model_name)
-        with self._connect() as conn:
-            with conn.cursor() as cur:
-                cur.execute("""
-                    SELECT recordID
-                    FROM Embedding e
-                    WHERE e.recordID = ANY(%s) AND e.modelid = %s
-                    ORDER BY e.embedding_vector <#> %s  
-                    LIMIT 1;
-                    """,
-                    (recordIDs, model_id, embedding)
-                )
-                results = cur.fetchone()
-                if results:
-                    return results[0]
-                return None
+    def get_candidate_matrix(self, model_name, exclude_recordIDs):
+        """
+            Returns the matrix of the embeddings of every artwork, the aligned recordIDs and
+            a boolean mask of the artworks available (not in exclude_recordIDs).
+            Served by the in-memory vector index when there is one, otherwise by a single query.
+        """
+        vector_index = self.get_vector_index(model_name)
+        if vector_index is not None:
+            matrix = vector_index.matrix
+            recordIDs = vector_index.recordIDs
+        else:
+            matrix, recordIDs = self.get_embeddings_for_recordIDs(self.get_all_recordIDs(), model_name)
+            recordIDs = np.asarray(recordIDs, dtype=np.int64)
 
+        available = ~np.isin(recordIDs, np.asarray(list(exclude_recordIDs), dtype=np.int64))
+        return matrix, recordIDs, available
 
     def convex_fill(self, model_name, record_ids, parameters):
         """
@@ -1359,6 +1741,9 @@ class DatabaseManager:
 
             The approach I chose is to select two recordIDs at random (they can be equal !), then get the closest image to the intersection of the two images.
             I repeat this process k times to get k images. 
+
+            All the pairs are drawn upfront (see draw_convex_pairs), their centroids are scored against
+            every candidate with one matmul, and each centroid gets its closest candidate not already taken.
         """
         if len(record_ids) == 0:
             raise Exception("ConvexFill: No recordIDs provided")
@@ -1369,84 +1754,45 @@ class DatabaseManager:
         patience = parameters["patience"]
         if None in [number_of_images, similarity_threshold, decay_rate, patience]:
             raise Exception(f"ConvexFill: Missing parameters")
-
-        embeddings = {
-            recordID: self.get_embedding_from_recordID(recordID, model_name)
-            for recordID in record_ids
-        }
-        if any(embedding is None for embedding in embeddings.values()):
-            raise Exception(f"ConvexFill: Missing embeddings")
-
-        other_recordIDs = set(self.get_all_recordIDs())
-        recordIDs = set(record_ids)
-        other_recordIDs = other_recordIDs - recordIDs
+        # Optional, to get reproducible results
+        seed = parameters.get("seed", None)
+        max_iterations = parameters.get("maxIterations", None)
 
         # To keep the order
-        recordIDs = list(recordIDs) 
-        other_recordIDs = list(other_recordIDs)
-
-        augmented_collection = []
-
-        i = 0
-        patience_counter = 0
-        min_cosine_similarity = similarity_threshold
-
-        while i < number_of_images:
-            if len(other_recordIDs) == 0:
-                return augmented_collection
-
-            recordID1 = random.choice(recordIDs)
-            recordID2 = random.choice(recordIDs)
-            
-            vector1 = embeddings[recordID1]
-            vector2 = embeddings[recordID2]
-
-            # Get the cosine similarity between the two vectors
-            similarity = cosine_similarity([vector1], [vector2])[0][0]
-            if similarity < min_cosine_similarity:
-                # The two images are too different for the intersection to be interesting
-                patience += 1
-                min_cosine_similarity *= decay_rate
-                
-                if patience_counter < patience:
-                    continue
-                else:
-                    # We continue anyways because we reached the max_patience
-                    pass
-
-            # We reset the patience and min_cosine_similarity because we found a good intersection (or we reached the max_patience)
-            patience = 0
-            min_cosine_similarity = similarity_threshold
+        recordIDs = list(dict.fromkeys(record_ids))
+        vectors, found_recordIDs = self.get_embeddings_for_recordIDs(recordIDs, model_name)
+        if len(found_recordIDs) != len(recordIDs):
+            raise Exception(f"ConvexFill: Missing embeddings")
 
-            centroid = (vector1 + vector2) / 2
-            closestRecordID = self.get_closest_recordID_to_embedding(centroid, other_recordIDs, model_name)
-            if closestRecordID is None:
-                raise Exception("ConvexFill: No closest recordID found")
-            
-            # We remove the recordID from the available_recordIDs
-            other_recordIDs.remove(closestRecordID)
-            augmented_collection.append(closestRecordID)
+        candidates, candidate_recordIDs, available = self.get_candidate_matrix(model_name, recordIDs)
+
+        rng = np.random.default_rng(seed)
+        pairs = draw_convex_pairs(
+            vectors,
+            min(number_of_images, int(np.count_nonzero(available))),
+            similarity_threshold,
+            decay_rate,
+            patience,
+            rng,
+            max_iterations=max_iterations,
+        )
+        if len(pairs) == 0:
+            return []
 
-            i += 1
+        pairs = np.asarray(pairs, dtype=np.int64)
+        centroids = (vectors[pairs[:, 0]] + vectors[pairs[:, 1]]) / 2
+        scores = centroids @ candidates.T
 
+        assigned = greedy_unique_assignment(scores, available)
+        augmented_collection = [int(candidate_recordIDs[column]) for column in assigned]
         return augmented_collection
 
-    def find_shortest_path(self, recordIDs, embeddings_as_list):
+    def find_shortest_path(self, recordIDs, embeddings_as_list, time_budget = DEFAULT_TIME_BUDGET):
         """
             We find the shortest path between all the recordIDs
+            (exact for small collections, local search within time_budget seconds otherwise, see engine/ordering.py)
         """
-        # Initialize the distance matrix
-        cosine_similarity_matrix = cosine_similarity(embeddings_as_list)
-        # Since two vectors are more similar the closest to 1 their cosine similarity, we transform the matrix
-        cosine_similarity_matrix = 2 - cosine_similarity_matrix
-
-        # Set the diagonal to 0
-        for i in range(len(cosine_similarity_matrix)):
-            cosine_similarity_matrix[i, i] = 0
-
-        # Get the shortest path between the two points
-        G = nx.from_numpy_array(cosine_similarity_matrix)
-        shortest_path = nx.approximation.traveling_salesman_problem(G, cycle=False)
+        shortest_path = order_by_similarity(embeddings_as_list, time_budget=time_budget)
 
         # Transform from indexes to recordIDs
         shortest_path = [recordIDs[i] for i in shortest_path]
@@ -1469,20 +1815,12 @@ class DatabaseManager:
         
         model = self.models[model_name]
         
-        embeddings = {
-            recordID: self.get_embedding_from_recordID(recordID, model_name)
-            for recordID in record_ids
-        }
-        if any(embedding is None for embedding in embeddings.values()):
+        matrix, found_recordIDs = self.get_embeddings_for_recordIDs(record_ids, model_name)
+        if len(set(found_recordIDs)) != len(set(record_ids)):
             raise Exception("PathFromTwoTerms: Missing embeddings")
+        embeddings = dict(zip(found_recordIDs, matrix))
         
-        embeddings_as_list = []
-        for recordID in record_ids:
-            embeddings_as_list.append(embeddings[recordID])
-        
-        
-        term1_embedding = model.encode_text(term1)
-        term2_embedding = model.encode_text(term2)
+        term1_embedding, term2_embedding = model.encode_texts([term1, term2])
 
         if term1_embedding is None or term2_embedding is None:
             raise Exception("PathFromTwoTerms: Missing embeddings")
@@ -1505,7 +1843,7 @@ class DatabaseManager:
         sorted_recordIDs = [x[0] for x in projected_values]
         return sorted_recordIDs
 
-    def sort_by_similarity(self, model_name, record_ids):
+    def sort_by_similarity(self, model_name, record_ids, time_budget = DEFAULT_TIME_BUDGET):
         """
             We sort the recordIDs by making the shortest path between all the recordIDs.
         """
@@ -1518,18 +1856,11 @@ class DatabaseManager:
         # Sort the recordIDs (deterministic)
         record_ids = sorted(record_ids)
 
-        embeddings = {
-            recordID: self.get_embedding_from_recordID(recordID, model_name)
-            for recordID in record_ids
-        }
-        if any(embedding is None for embedding in embeddings.values()):
+        embeddings_as_list, found_recordIDs = self.get_embeddings_for_recordIDs(record_ids, model_name)
+        if len(found_recordIDs) != len(record_ids):
             raise Exception("SortBySimilarity: Missing embeddings")
 
-        embeddings_as_list = []
-        for recordID in record_ids:
-            embeddings_as_list.append(embeddings[recordID])
-
-        shortest_path = self.find_shortest_path(record_ids, embeddings_as_list)
+        shortest_path = self.find_shortest_path(record_ids, embeddings_as_list, time_budget=time_budget)
 
         return shortest_path
 
@@ -1538,32 +1869,32 @@ class DatabaseManager:
             The goal is to find the shortest path between the recordIDs.
             Then for each link between two recordIDs, we find the centroid of the two vectors and
             we add the closest recordID to the augmented collection.
+
+            The embeddings are fetched once and reused for the ordering, all the centroids are
+            scored against the candidates with one matmul, and each centroid gets its closest
+            candidate not already taken.
         """
-        embeddings = {
-            recordID: self.get_embedding_from_recordID(recordID, model_name)
-            for recordID in record_ids
-        }
-        if any(embedding is None for embedding in embeddings.values()):
+        # Sort the recordIDs (deterministic)
+        recordIDs = sorted(set(record_ids))
+        if len(recordIDs) < 2:
+            raise Exception("ShortestPath: At least two recordIDs are needed")
+
+        vectors, found_recordIDs = self.get_embeddings_for_recordIDs(recordIDs, model_name)
+        if len(found_recordIDs) != len(recordIDs):
             raise Exception("ShortestPath: Missing embeddings")
 
-        other_recordIDs = set(self.get_all_recordIDs())
-        recordIDs = set(record_ids)
-        other_recordIDs = other_recordIDs - recordIDs
-        other_recordIDs = list(other_recordIDs)
+        time_budget = parameters.get("timeBudget", DEFAULT_TIME_BUDGET)
+        order = order_by_similarity(vectors, time_budget=time_budget)
+        ordered_vectors = vectors[np.asarray(order, dtype=np.int64)]
 
-        sorted_recordIDs = self.sort_by_similarity(model_name, record_ids)
+        # Centroid of every consecutive pair of the path, (k, d)
+        centroids = (ordered_vectors[:-1] + ordered_vectors[1:]) / 2
 
-        augmented_collection = []
-        for i in range(len(sorted_recordIDs) - 1):
-            recordID1 = sorted_recordIDs[i]
-            recordID2 = sorted_recordIDs[i + 1]
-            centroid = (embeddings[recordID1] + embeddings[recordID2]) / 2
-            closestRecordID = self.get_closest_recordID_to_embedding(centroid, other_recordIDs, model_name)
-            augmented_collection.append(closestRecordID)
+        candidates, candidate_recordIDs, available = self.get_candidate_matrix(model_name, recordIDs)
+        scores = centroids @ candidates.T
 
-            # We remove the recordID from the available_recordIDs
-            other_recordIDs.remove(closestRecordID)
-        
+        assigned = greedy_unique_assignment(scores, available)
+        augmented_collection = [int(candidate_recordIDs[column]) for column in assigned]
         return augmented_collection
 
     def autocomplete(self, prefix, column, max_results):
@@ -1619,6 +1950,7 @@ class DatabaseManager:
             print("Populating embeddings table")
             self.populate_embeddings_table(self.paths["embeddings"])
             print("Done populating embeddings table")
+        self.data_changed()
 
     def populate_embeddings_table(self, embeddingsData):
         """
@@ -1673,12 +2005,15 @@ class DatabaseManager:
                 modelID,
                 embedding["keywords"],
             )
+        self.create_vector_indexes()
 
     def populate_keywords(self):
         for embedding in self.paths["embeddings"]:
             modelID = self.get_model_id_from_model_name(embedding["name"])
             keywords = embedding["keywords"]
             self.populate_keywords_table(modelID, keywords)
+        # Reloads the keyword indexes and scores
+        self.data_changed()
 
     def populate_keywords_table(
         self,
@@ -0,0 +1,360 @@
+# Columns the hard constraints can be applied to (key sent by the webtool -> alias.column)
+column_mapping = {
+    # Artwork
+    "recordID": "a.recordID",
+    "workID": "a.workID",
+    "language": "a.language",
+    "title": "a.title",
+    "objectType": "a.objectWorkType",
+    "classification": "a.termClassification",
+    "materials": "a.materials",
+    "inscription": "a.signatureFullDescription",
+    "creationEarliestDate": "a.creationEarliestDate",
+    "creationLatestDate": "a.creationLatestDate",
+    "creator": "a.creatorFullDescription",
+    "physicalAppearance": "a.physicalAppearanceDescription",
+    "imageType": "a.imageType",
+    "imageColor": "a.imageColor",
+    "imageLowResFilename": "a.imageLowResFilename",
+    "imageHighResFilename": "a.imageHighResFilename",
+    "imageCopyright": "a.imageCopyright",
+    "imageStyle": "a.formalDescriptionTermStylesPeriods",
+    "height": "a.height",
+    "width": "a.width",
+    "ratio": "a.ratio",
+    
+    # Artist
+    "creatorID": "ar.creatorID",
+    "creatorFirstName": "ar.creatorFirstName",
+    "creatorLastName": "ar.creatorLastName",
+    "creatorBirthDate": "ar.creatorBirthDate",
+    "creatorDeathDate": "ar.creatorDeathDate",
+    "creatorBirthDeathPlace": "ar.creatorBirthAndDeathDescription",
+    "creatorNationality": "ar.creatorNationality",
+
+    # ConceptualTerms_Flat
+    "CFT_values": "CFT.values",
+
+    # IconographicTerms_Flat
+    "IFT_values": "IFT.values",
+
+    # SubjectTerms_Flat
+    "STF_values": "STF.values",
+
+    # SubjectTerms_Tree
+    "STT_tree": "STT.tree",
+
+    # IconographicTerms_Tree
+    "IFT_tree": "IFT.tree",
+
+    # IconographicInterpretation
+    "II_value": "II.value",
+
+    # GeneralSubjectDescription
+    "GSD_value": "GSD.value",
+
+    # SpecificSubjectIdentification
+    "SSI_value": "SSI.value",
+}
+column_is_list = {
+    # Artwork
+    "objectType": True,
+    "materials": True,
+    "imageStyle": True,
+    
+    # ConceptualTerms_Flat
+    "CFT_values": True,
+    # IconographicTerms_Flat
+    "IFT_values": True,
+    # SubjectTerms_Flat
+    "STF_values": True,
+}
+column_types = {
+    # Artwork
+    "recordID": "INTEGER",
+    "workID": "TEXT",
+    "language": "TEXT",
+    "title": "TEXT",
+    "objectType": "TEXT[]",
+    "classification": "TEXT",
+    "materials": "TEXT[]",
+    "inscription": "TEXT",
+    "creationEarliestDate": "INTEGER",
+    "creationLatestDate": "INTEGER",
+    "creator": "TEXT",
+    "physicalAppearance": "TEXT",
+    "imageType": "TEXT",
+    "imageColor": "TEXT",
+    "imageCopyright": "TEXT",
+    "imageStyle": "TEXT",
+    "height": "NUMERIC",
+    "width": "NUMERIC",
+    "ratio": "NUMERIC",
+    
+    # Artist
+    "creatorID": "TEXT",
+    "creatorFirstName": "TEXT",
+    "creatorLastName": "TEXT",
+    "creatorBirthDate": "INTEGER",
+    "creatorDeathDate": "INTEGER",
+    "creatorBirthDeathPlace": "TEXT",
+    "creatorNationality": "TEXT",
+
+    # ConceptualTerms_Flat
+    "CFT_values": "TEXT[]",
+
+    # IconographicTerms_Flat
+    "IFT_values": "TEXT[]",
+
+    # SubjectTerms_Flat
+    "STF_values": "TEXT[]",
+
+    # IconographicInterpretation
+    "II_value": "TEXT",
+
+    # GeneralSubjectDescription
+    "GSD_value": "TEXT",
+
+    # SpecificSubjectIdentification
+    "SSI_value": "TEXT",
+
+    # SubjectTerms_Tree, IconographicTerms_Tree
+    "STT_tree": "JSONB",
+    "IFT_tree": "JSONB",
+}
+
+
+# Tables joined to Artwork (a) when one of their columns is used by the constraints, by alias
+hard_query_joins = {
+    "ar": "JOIN Artist ar ON a.creatorID = ar.creatorID",
+    "CFT": "LEFT JOIN ConceptualTerms_Flat CFT ON a.recordID = CFT.recordID",
+    "IFT": "LEFT JOIN IconographicTerms_Flat IFT ON a.recordID = IFT.recordID",
+    "STF": "LEFT JOIN SubjectTerms_Flat STF ON a.recordID = STF.recordID",
+    "IFTT": "LEFT JOIN IconographicTerms_Tree IFTT ON a.recordID = IFTT.recordID",
+    "CFTT": "LEFT JOIN ConceptualTerms_Tree CFTT ON a.recordID = CFTT.recordID",
+    "STT": "LEFT JOIN SubjectTerms_Tree STT ON a.recordID = STT.recordID",
+    "II": "LEFT JOIN IconographicInterpretation II ON a.recordID = II.recordID",
+    "GSD": "LEFT JOIN GeneralSubjectDescription GSD ON a.recordID = GSD.recordID",
+    "SSI": "LEFT JOIN SpecificSubjectIdentification SSI ON a.recordID = SSI.recordID",
+}
+
+# Table of each alias (the columns of Artwork are under "a")
+hard_query_tables = {
+    "a": "Artwork",
+    "ar": "Artist",
+    "CFT": "ConceptualTerms_Flat",
+    "IFT": "IconographicTerms_Flat",
+    "STF": "SubjectTerms_Flat",
+    "IFTT": "IconographicTerms_Tree",
+    "CFTT": "ConceptualTerms_Tree",
+    "STT": "SubjectTerms_Tree",
+    "II": "IconographicInterpretation",
+    "GSD": "GeneralSubjectDescription",
+    "SSI": "SpecificSubjectIdentification",
+}
+
+def get_column_alias(column):
+    # "CFT.values" -> "CFT"
+    return column.split(".", 1)[0]
+
+def compile_constraint(constraint, aliases):
+    """
+        Returns the SQL condition and the params of one constraint (and of its children for a GROUP),
+        and adds the aliases of the columns it uses to the set aliases.
+    """
+    constraint_type = constraint["type"]
+
+    selected_column = constraint.get("selectedColumn", {})
+    key = selected_column.get("key", None)
+
+    is_not = constraint.get("isNot", False)
+    exact_match = constraint.get("exactMatch", False)
+    case_sensitive = constraint.get("caseSensitive", False)
+    keep_null = constraint.get("keepNull", False)
+
+    column = ""
+    isColumnAList = False
+    columnType = None
+
+    if constraint_type not in ["AND", "OR", "GROUP"]:
+        if key not in column_mapping:
+            return "", []
+        column = column_mapping[key]
+        isColumnAList = column_is_list.get(key, False)
+        columnType = column_types.get(key, None)
+        aliases.add(get_column_alias(column))
+
+    # If the columnType is either INTEGER or NUMERIC, we will override the case_sensitive to True to avoid LOWER()
+    if columnType in ["INTEGER", "NUMERIC"]:
+        case_sensitive = True
+
+    if is_not:
+        not_prefix = "NOT "
+    else:
+        not_prefix = " "
+        
+    if keep_null and column:
+        suffix = f" OR {column} IS NULL "
+    else:
+        suffix = " "
+
+    if constraint_type == "AND":
+        return "AND" + suffix, []
+    elif constraint_type == "OR":
+        return "OR" + suffix, []
+    elif constraint_type == "GROUP":
+        subquery = ""
+        subparams = []
+
+        for child in constraint["children"]:
+            subquery_temp, subparams_temp = compile_constraint(child, aliases)
+            subquery += subquery_temp
+            subparams.extend(subparams_temp)
+
+        return not_prefix + "(" + subquery + ")" + suffix, subparams
+    elif constraint_type == "EQUAL":
+        """
+        ==> "column = %s", [value] if exact_match and case_sensitive
+        ==> "LOWER(column) = LOWER(%s)", [value] if exact_match and not case_sensitive
+        ==> "LIKE", ["%value%"] if not exact_match and case_sensitive
+        ==> "LOWER(column) LIKE LOWER(%s)", ["%value%"] if not exact_match and not case_sensitive
+        """
+        inp_equalTo = constraint.get("equalTo", None)
+        if inp_equalTo is None:
+            return "", []
+        if exact_match:
+            if case_sensitive:
+                if isColumnAList:
+                    return not_prefix + f"{column} @> ARRAY[%s]" + suffix, [inp_equalTo]
+                else:
+                    return not_prefix + f"{column} = %s" + suffix, [inp_equalTo]
+            else:
+                if isColumnAList:
+                    return not_prefix + f"LOWER({column}) @> ARRAY[LOWER(%s)]" + suffix, [inp_equalTo]
+                else:
+                    return not_prefix + f"LOWER({column}) = LOWER(%s)" + suffix, [inp_equalTo]
+        else:
+            if case_sensitive:
+                if isColumnAList:
+                    # At least one term from the TEXT[] column must be LIKE the input
+                    return not_prefix + f"""
+                        EXISTS (
+                            SELECT 1
+                            FROM unnest({column}) AS term
+                            WHERE term LIKE %s
+                        )
+                    """ + suffix, [f"%{inp_equalTo}%"]
+                else:
+                    return not_prefix + f"{column} LIKE %s" + suffix, [f"%{inp_equalTo}%"]
+            else:
+                if isColumnAList:
+                    # At least one lowered term from the TEXT[] column must be LIKE the lowered input
+                    return not_prefix + f"""
+                        EXISTS (
+                            SELECT 1
+                            FROM unnest({column}) AS term
+                            WHERE LOWER(term) LIKE LOWER(%s)
+                        ) 
+                    """ + suffix, [f"%{inp_equalTo}%"]
+                else:
+                    return not_prefix + f"LOWER({column}) LIKE LOWER(%s)" + suffix, [f"%{inp_equalTo}%"]
+    elif constraint_type == "BETWEEN":
+        """
+        ==> "column BETWEEN %s AND %s", [value1, value2] if case_sensitive
+        ==> "LOWER(column) BETWEEN LOWER(%s) AND LOWER(%s)", [value1, value2] if not case_sensitive (and column is text)
+        """
+        inp_from = constraint.get("from", None)
+        inp_to = constraint.get("to", None)
+        if inp_from is None or inp_to is None:
+            return "", []
+        if isColumnAList:
+            # No order on the TEXT[] columns
+            return "", []
+        else:
+            if case_sensitive:
+                q, params = f"{column} BETWEEN %s AND %s", [inp_from, inp_to]
+            else:
+                q, params = f"LOWER({column}) BETWEEN LOWER(%s) AND LOWER(%s)", [inp_from, inp_to]
+            if is_not:
+                q = f"NOT ({q}) "
+            return q + suffix, params
+    elif constraint_type == "INCLUDES":
+        """
+        Includes uses the exact_match differently, if exact match is set to true, it means that every query term
+        must be present in the selected column.
+        If exact match is set to false, it means that at least one query term must be present in the selected column.
+
+        If the selected column is a list, we want && operator (at least one term must be present) and the "@>" (all terms must be present) operator:
+            ==> "column @> ARRAY[%s]" AND "column @> ARRAY[%s]", ["value1", "value2", ...] if exact_match 
+            ==> "column && ARRAY[%s]" OR "column && ARRAY[%s]", ["value1", "value2", ...] if not exact_match
+            # TODO: Add case sensitive and not case sensitive versions (maybe one table for lower and one for upper ? Faster queries ?)
+        If the selected column is not a list:
+            ==> "column LIKE %s" AND "column LIKE %s", ["%value1%", "%value2%"], ... if exact_match and case_sensitive
+            ==> "LOWER(column) LIKE LOWER(%s)" AND "LOWER(column) LIKE LOWER(%s)", ["%value1%", "%value2%"], ... if exact_match and not case_sensitive
+            ==> "column LIKE %s" OR "column LIKE %s", ["%value1%", "%value2%"], ... if not exact_match and case_sensitive
+            ==> "LOWER(column) LIKE LOWER(%s)" OR "LOWER(column) LIKE LOWER(%s)", ["%value1%", "%value2%"], ... if not exact_match and not case_sensitive
+        """
+        inp_values = constraint.get("values", None)
+        if inp_values is None:
+            return "", []
+        if isColumnAList:
+            if exact_match:
+                return not_prefix + f"{column} @> %s" + suffix, [inp_values]
+            else:
+                return not_prefix + f"{column} && %s" + suffix, [inp_values]
+        else:
+            per_term_queries = []
+            for value in inp_values:
+                if case_sensitive:
+                    per_term_queries.append(not_prefix + f"{column} LIKE %s")
+                else:
+                    per_term_queries.append(not_prefix + f"LOWER({column}) LIKE LOWER(%s)")
+            return not_prefix + " AND ".join(per_term_queries) + suffix, [f"%{value}%" for value in inp_values]
+        
+    # If the constraint is not supported, return an empty string and an empty list
+    # We should maybe raise an error instead and log it #TODO
+    return "", []
+
+def compile_hard_constraints(constraints):
+    """
+        Returns the SQL conditions and the params of the constraints,
+        and the set of the aliases of the columns they use.
+    """
+    conditions = ""
+    params = []
+    aliases = set()
+    for constraint in constraints or []:
+        new_condition, new_params = compile_constraint(constraint, aliases)
+        conditions += new_condition
+        params.extend(new_params)
+    return conditions, params, aliases
+
+def build_hard_query(constraints):
+    """
+        Returns the query of the recordIDs of the artworks matching the hard constraints (and having an
+        embedding for the model, first param %s), and its params.
+
+        Only the tables whose columns are used by the constraints are joined.
+    """
+    conditions, params, aliases = compile_hard_constraints(constraints)
+    if len(conditions.strip()) == 0:
+        conditions, params = "", []
+
+    joins = "".join(
+        f"\n            {join}" for alias, join in hard_query_joins.items() if alias in aliases
+    )
+    if "ar" in aliases:
+        where = "1=1"
+    else:
+        # Same rows as the inner join on Artist (Artwork.creatorID references it)
+        where = "a.creatorID IS NOT NULL"
+
+    query = f"""
+            SELECT a.recordID
+            FROM Artwork a{joins}
+            JOIN Embedding e ON (a.recordID = e.recordID AND e.modelid = %s)
+            WHERE {where}
+        """
+    if len(conditions) > 0:
+        query += " AND (" + conditions + ")"
+    return query, params
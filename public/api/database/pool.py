@@ -0,0 +1,205 @@
+import threading
+import time
+from contextlib import contextmanager
+import psycopg2
+from psycopg2 import extensions
+
+class PoolTimeout(Exception):
+    pass
+
+class ConnectionPool:
+    """
+        Thread-safe pool of psycopg2 connections.
+
+        Connections are created lazily up to max_size, and min_size of them are opened upfront.
+        on_connect is called exactly once per connection (e.g. to register the pgvector adapters).
+        When every connection is in use, borrowers wait up to timeout seconds.
+    """
+    def __init__(
+        self,
+        connection_kwargs,
+        min_size = 1,
+        max_size = 10,
+        timeout = 30.0,
+        health_check_interval = 30.0,
+        on_connect = None,
+    ):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise Exception(f"ConnectionPool: Invalid sizes (min={min_size}, max={max_size})")
+
+        self.connection_kwargs = connection_kwargs
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        # Idle connections older than this are pinged before being handed out
+        self.health_check_interval = health_check_interval
+        self.on_connect = on_connect
+
+        self._condition = threading.Condition()
+        self._idle = [] # (connection, last_used)
+        self._size = 0
+        self._closed = False
+
+        self._stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "wait_time": 0.0,
+            "timeouts": 0,
+            "connections_created": 0,
+            "connections_discarded": 0,
+            "health_checks_failed": 0,
+        }
+
+        for _ in range(min_size):
+            connection = self._new_connection()
+            self._idle.append((connection, time.monotonic()))
+            self._size += 1
+            self._stats["connections_created"] += 1
+
+    def _new_connection(self):
+        connection = psycopg2.connect(**self.connection_kwargs)
+        try:
+            if self.on_connect is not None:
+                self.on_connect(connection)
+                connection.commit()
+        except Exception:
+            connection.close()
+            raise
+        return connection
+
+    def _is_healthy(self, connection, last_used):
+        if connection.closed:
+            return False
+        if connection.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            return False
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            with connection.cursor() as cur:
+                cur.execute("SELECT 1")
+            connection.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, connection):
+        # Frees the slot of the connection, then closes it outside of the lock
+        with self._condition:
+            self._size -= 1
+            self._stats["connections_discarded"] += 1
+            self._condition.notify()
+        try:
+            connection.close()
+        except psycopg2.Error:
+            pass
+
+    def getconn(self):
+        deadline = None
+        waited = False
+        start = time.monotonic()
+        while True:
+            with self._condition:
+                if self._closed:
+                    raise Exception("ConnectionPool: The pool is closed")
+
+                if len(self._idle) > 0:
+                    connection, last_used = self._idle.pop()
+                elif self._size < self.max_size:
+                    # Reserve the slot, the connection is opened outside of the lock
+                    self._size += 1
+                    connection = None
+                else:
+                    if deadline is None:
+                        deadline = start + self.timeout
+                        waited = True
+                        self._stats["waits"] += 1
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolTimeout(f"ConnectionPool: No connection available after {self.timeout}s")
+                    self._condition.wait(remaining)
+                    continue
+
+            if connection is None:
+                try:
+                    connection = self._new_connection()
+                except Exception:
+                    with self._condition:
+                        self._size -= 1
+                        self._condition.notify()
+                    raise
+                with self._condition:
+                    self._stats["connections_created"] += 1
+                break
+
+            # The health check (a round trip) runs without the lock: the other borrowers are not blocked
+            if self._is_healthy(connection, last_used):
+                break
+            with self._condition:
+                self._stats["health_checks_failed"] += 1
+            self._discard(connection)
+
+        with self._condition:
+            self._stats["checkouts"] += 1
+            if waited:
+                self._stats["wait_time"] += time.monotonic() - start
+        return connection
+
+    def putconn(self, connection, close = False):
+        with self._condition:
+            closed = self._closed
+        if close or closed or connection.closed:
+            self._discard(connection)
+            return
+        if connection.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                connection.rollback()
+            except psycopg2.Error:
+                self._discard(connection)
+                return
+        with self._condition:
+            if not self._closed:
+                self._idle.append((connection, time.monotonic()))
+                self._condition.notify()
+                return
+        # Closed during the rollback
+        self._discard(connection)
+
+    @contextmanager
+    def connection(self):
+        """
+            Borrows a connection for the duration of a transaction.
+            Like `with psycopg2.connect(...) as conn`, the transaction is committed on success
+            and rolled back on error, but the connection is returned to the pool instead of being kept open.
+        """
+        connection = self.getconn()
+        try:
+            with connection:
+                yield connection
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            self.putconn(connection, close=True)
+            raise
+        except BaseException:
+            self.putconn(connection)
+            raise
+        else:
+            self.putconn(connection)
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            for connection, _ in self._idle:
+                self._size -= 1
+                connection.close()
+            self._idle = []
+            self._condition.notify_all()
+
+    def get_stats(self):
+        with self._condition:
+            stats = dict(self._stats)
+            stats["size"] = self._size
+            stats["idle"] = len(self._idle)
+            stats["in_use"] = self._size - len(self._idle)
+            stats["min_size"] = self.min_size
+            stats["max_size"] = self.max_size
+        return stats
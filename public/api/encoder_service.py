@@ -0,0 +1,60 @@
+"""
+    Encoder sidecar: loads the models once and serves the text embeddings to every API worker
+    of the host over a Unix socket (see engine/encoder_service.py).
+
+    ENCODER_SERVICE_SOCKET=private_data/encoder.sock python encoder_service.py
+
+    The API workers started with the same ENCODER_SERVICE_SOCKET send their encode requests here
+    instead of loading the models. The requests of all workers are batched together.
+"""
+import torch
+from settings import get_paths, get_encoder_config, get_encoder_service_config, get_embedding_cache_config, get_model_registry_config
+from engine.cache import EmbeddingCache
+from engine.encoder_service import EncoderService
+from engine.model import load_model as load_model_from_config
+from engine.registry import ModelRegistry
+
+if __name__ == "__main__":
+    socket_path = get_encoder_service_config()["socket_path"]
+    if socket_path is None:
+        raise Exception("Encoder service: ENCODER_SERVICE_SOCKET is not set")
+
+    # The service owns all the inference threads of the host
+    print(f"Using {torch.get_num_threads()} threads")
+
+    encoder_config = get_encoder_config()
+    # Batching across the workers is the point of the service
+    encoder_config["micro_batching"] = True
+
+    cache = None
+    cache_config = get_embedding_cache_config()
+    if cache_config["enabled"]:
+        # In memory only: each worker also keeps its own cache (and its SQLite file, if any)
+        cache = EmbeddingCache(max_entries=cache_config["max_entries"])
+
+    embeddings_config = {embedding["name"]: embedding for embedding in get_paths()["embeddings"]}
+
+    def load_model(model_name):
+        print(f"Loading model {model_name}...")
+        model = load_model_from_config(embeddings_config[model_name], "cpu", encoder_config, cache=cache)
+        print(f"✓ : Model {model_name} loaded")
+        return model
+
+    registry_config = get_model_registry_config()
+    models = ModelRegistry(
+        list(embeddings_config.keys()),
+        load_model,
+        idle_timeout=registry_config["idle_timeout"],
+        memory_budget=registry_config["memory_budget"],
+        pinned=registry_config["pinned"],
+        load_timeout=registry_config["load_timeout"]
+    )
+    models.preload(registry_config["preload"], background=registry_config["background"])
+
+    service = EncoderService(models, socket_path)
+    print(f"✓ : Encoder service listening on {socket_path}")
+    try:
+        service.serve_forever()
+    finally:
+        service.close()
+        models.close()
@@ -0,0 +1,76 @@
+import numpy as np
+
+def normalize_rows(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+def greedy_unique_assignment(scores, available):
+    """
+        scores is a (k, n) matrix of the scores of k queries against n candidates.
+        Each query, in order, gets its best-scoring candidate that is still available,
+        so that no candidate is assigned twice (same result as taking the queries one
+        by one and removing the chosen candidate from the pool).
+
+        Returns the list of assigned candidate indexes (shorter than k if the candidates run out).
+        available is updated in place.
+    """
+    assigned = []
+    for row in range(scores.shape[0]):
+        if not available.any():
+            break
+        column = int(np.argmax(np.where(available, scores[row], -np.inf)))
+        available[column] = False
+        assigned.append(column)
+    return assigned
+
+def draw_convex_pairs(
+    vectors,
+    number_of_pairs,
+    similarity_threshold,
+    decay_rate,
+    patience,
+    rng,
+    max_iterations = None,
+):
+    """
+        Draws pairs of rows (i, j) of vectors at random (they can be equal !).
+        A pair is kept if the cosine similarity of its two vectors is above the current threshold.
+        Every rejected pair multiplies the threshold by decay_rate, and after patience rejections
+        in a row the pair is kept anyways. The threshold and the counter are reset after each kept pair.
+
+        All the candidate pairs and their similarities are drawn upfront, and at most max_iterations
+        pairs are examined (by default enough for number_of_pairs pairs given the patience).
+    """
+    if max_iterations is None:
+        max_iterations = number_of_pairs * (patience + 1)
+
+    n = len(vectors)
+    if n == 0 or number_of_pairs <= 0 or max_iterations <= 0:
+        return []
+
+    normalized = normalize_rows(vectors)
+    candidates = rng.integers(0, n, size=(max_iterations, 2))
+    similarities = np.einsum("ij,ij->i", normalized[candidates[:, 0]], normalized[candidates[:, 1]])
+
+    pairs = []
+    patience_counter = 0
+    min_cosine_similarity = similarity_threshold
+    for (i, j), similarity in zip(candidates, similarities):
+        if similarity < min_cosine_similarity:
+            # The two images are too different for the intersection to be interesting
+            patience_counter += 1
+            min_cosine_similarity *= decay_rate
+            if patience_counter < patience:
+                continue
+            # We keep the pair anyways because we reached the patience
+
+        pairs.append((int(i), int(j)))
+        if len(pairs) == number_of_pairs:
+            break
+
+        patience_counter = 0
+        min_cosine_similarity = similarity_threshold
+
+    return pairs
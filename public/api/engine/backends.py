@@ -0,0 +1,140 @@
+import os
+import numpy as np
+import torch
+
+BACKENDS = ["torch", "int8", "onnx"]
+
+class TextEncoder(torch.nn.Module):
+    """
+        (input_ids, attention_mask) -> text embeddings, for a CLIPTextModelWithProjection or a full CLIPModel.
+        This is the graph quantized by the int8 backend and exported by the onnx backend.
+    """
+    def __init__(self, model, text_only):
+        super().__init__()
+        self.model = model
+        self.text_only = text_only
+
+    def forward(self, input_ids, attention_mask):
+        if self.text_only:
+            return self.model(input_ids=input_ids, attention_mask=attention_mask).text_embeds
+        return self.model.get_text_features(input_ids=input_ids, attention_mask=attention_mask)
+
+class TorchBackend:
+    """
+        Eager PyTorch inference (fp32).
+    """
+    name = "torch"
+
+    def __init__(self, encoder, device):
+        self.encoder = encoder.eval()
+        self.device = device
+
+    def encode(self, input_ids, attention_mask):
+        with torch.no_grad():
+            if self.device != "cpu":
+                input_ids = input_ids.to(self.device)
+                attention_mask = attention_mask.to(self.device)
+            outputs = self.encoder(input_ids, attention_mask)
+        return outputs.cpu().numpy()
+
+    def get_memory_size(self):
+        size = 0
+        for tensor in list(self.encoder.parameters()) + list(self.encoder.buffers()):
+            size += tensor.numel() * tensor.element_size()
+        return size
+
+class QuantizedTorchBackend(TorchBackend):
+    """
+        PyTorch inference with the Linear layers dynamically quantized to int8 (CPU only).
+    """
+    name = "int8"
+
+    def __init__(self, encoder, device):
+        if device != "cpu":
+            raise Exception("The int8 backend only runs on CPU")
+        encoder = torch.ao.quantization.quantize_dynamic(encoder.eval(), {torch.nn.Linear}, dtype=torch.qint8)
+        super().__init__(encoder, device)
+
+    def get_memory_size(self):
+        # The quantized weights are packed and not listed by parameters()
+        size = super().get_memory_size()
+        for module in self.encoder.modules():
+            weight = getattr(module, "weight", None)
+            if callable(weight):
+                weight = weight()
+                size += weight.numel() * weight.element_size()
+        return size
+
+class OnnxBackend:
+    """
+        ONNX Runtime inference (CPU) of the exported text encoder.
+        The graph is exported once next to the weights, and again when the weights are newer.
+    """
+    name = "onnx"
+
+    def __init__(self, encoder, onnx_path, weights_path = None, opset = 17):
+        try:
+            import onnxruntime
+        except ImportError:
+            raise Exception("The onnx backend requires onnxruntime (pip install onnxruntime)")
+
+        is_stale = (
+            weights_path is not None
+            and os.path.exists(onnx_path)
+            and os.path.getmtime(onnx_path) < os.path.getmtime(weights_path)
+        )
+        if not os.path.exists(onnx_path) or is_stale:
+            print(f"    Exporting the text encoder to {onnx_path}...")
+            export_onnx(encoder, onnx_path, opset)
+            print(f"    ✓ : Text encoder exported")
+
+        self.onnx_path = onnx_path
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+
+    def encode(self, input_ids, attention_mask):
+        outputs = self.session.run(
+            ["text_embeds"],
+            {
+                "input_ids": np.asarray(input_ids, dtype=np.int64),
+                "attention_mask": np.asarray(attention_mask, dtype=np.int64),
+            }
+        )
+        return outputs[0]
+
+    def get_memory_size(self):
+        return os.path.getsize(self.onnx_path)
+
+def export_onnx(encoder, onnx_path, opset = 17):
+    directory = os.path.dirname(onnx_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    encoder = encoder.cpu().eval()
+    input_ids = torch.ones((2, 8), dtype=torch.int64)
+    attention_mask = torch.ones((2, 8), dtype=torch.int64)
+    with torch.no_grad():
+        torch.onnx.export(
+            encoder,
+            (input_ids, attention_mask),
+            onnx_path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["text_embeds"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "text_embeds": {0: "batch"},
+            },
+            opset_version=opset,
+        )
+
+def create_backend(name, encoder, device, onnx_path = None, weights_path = None):
+    if name == "torch":
+        return TorchBackend(encoder, device)
+    elif name == "int8":
+        return QuantizedTorchBackend(encoder, device)
+    elif name == "onnx":
+        if onnx_path is None:
+            raise Exception("The onnx backend requires an onnx_path")
+        return OnnxBackend(encoder, onnx_path, weights_path=weights_path)
+    raise Exception(f"Unknown backend {name} (available: {', '.join(BACKENDS)})")
@@ -0,0 +1,130 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+import numpy as np
+from engine.cache import encode_with_cache
+
+class MicroBatcher:
+    """
+        Wraps a Model and coalesces the encode requests made concurrently by different threads
+        (i.e. different requests) into a single batch.
+
+        The first request of a batch waits at most window_ms for other requests to join,
+        a batch is sent as soon as it holds max_batch_size texts.
+        A request waits at most timeout seconds for its batch, and fails once the batcher is closed.
+        It exposes the same encode_text / encode_texts interface as Model.
+    """
+    def __init__(self, model, window_ms = 5, max_batch_size = 32, timeout = 60.0):
+        self.model = model
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.timeout = timeout
+
+        self._queue = queue.Queue()
+        # The requests queued before close are still encoded, the later ones fail
+        self._closed_lock = threading.Lock()
+        self._closed = False
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "batches": 0,
+            "texts": 0,
+        }
+        self._worker = threading.Thread(target=self._run, name=f"MicroBatcher-{model.get_model_name()}", daemon=True)
+        self._worker.start()
+
+    def get_model_name(self):
+        return self.model.get_model_name()
+
+    def get_embedding_dim(self):
+        return self.model.get_embedding_dim()
+
+    def get_memory_size(self):
+        get_memory_size = getattr(self.model, "get_memory_size", None)
+        return get_memory_size() if get_memory_size is not None else 0
+
+    def encode_text(self, text):
+        return self.encode_texts([text])[0]
+
+    def encode_texts(self, texts):
+        # The cached texts are answered right away, only the other ones wait for a batch
+        cache = getattr(self.model, "cache", None)
+        cache_key = getattr(self.model, "cache_key", self.get_model_name())
+        return encode_with_cache(cache, cache_key, texts, self._submit)
+
+    def _submit(self, texts):
+        texts = list(texts)
+        if len(texts) == 0:
+            return self._encode(texts)
+        future = Future()
+        with self._closed_lock:
+            if self._closed:
+                raise Exception("MicroBatcher: Closed")
+            self._queue.put((texts, future))
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise Exception(f"MicroBatcher: No result after {self.timeout} seconds")
+
+    def _encode(self, texts):
+        # The cache is handled in encode_texts
+        encode = getattr(self.model, "encode_texts_uncached", self.model.encode_texts)
+        return encode(texts)
+
+    def get_stats(self):
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def close(self):
+        with self._closed_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._worker.join()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                break
+
+            batch = [item]
+            number_of_texts = len(item[0])
+            deadline = time.monotonic() + self.window
+            while number_of_texts < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+                number_of_texts += len(item[0])
+
+            self._process(batch)
+
+    def _process(self, batch):
+        texts = [text for texts, _ in batch for text in texts]
+        try:
+            embeddings = self._encode(texts)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        with self._stats_lock:
+            self._stats["requests"] += len(batch)
+            self._stats["batches"] += 1
+            self._stats["texts"] += len(texts)
+
+        start = 0
+        for texts, future in batch:
+            future.set_result(np.array(embeddings[start:start + len(texts)]))
+            start += len(texts)
@@ -0,0 +1,140 @@
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+import numpy as np
+
+def get_file_fingerprint(path):
+    """
+        Size and modification time of a file, None if it does not exist: changes when the file is replaced.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+def normalize_text(text):
+    # The CLIP tokenizer is uncased and ignores repeated whitespaces
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+class EmbeddingCache:
+    """
+        Cache of text embeddings keyed by (model name, normalized text).
+
+        - A bounded in-memory LRU (max_entries)
+        - An optional SQLite store (path) that survives restarts, read when the LRU misses
+    """
+    def __init__(self, max_entries = 10000, path = None):
+        self.max_entries = max_entries
+        self.path = path
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._stats = {
+            "hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+        }
+
+        self._db = None
+        if path is not None:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    model_name TEXT,
+                    text TEXT,
+                    embedding BLOB,
+                    PRIMARY KEY (model_name, text)
+                )
+            """)
+            self._db.commit()
+
+    def _put_in_memory(self, key, embedding):
+        # Must be called while holding the lock
+        self._entries[key] = embedding
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def get(self, model_name, text):
+        key = (model_name, normalize_text(text))
+        with self._lock:
+            embedding = self._entries.get(key, None)
+            if embedding is not None:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return embedding
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT embedding FROM embeddings WHERE model_name = ? AND text = ?", key
+                ).fetchone()
+                if row is not None:
+                    embedding = np.frombuffer(row[0], dtype=np.float32)
+                    self._put_in_memory(key, embedding)
+                    self._stats["disk_hits"] += 1
+                    return embedding
+
+            self._stats["misses"] += 1
+            return None
+
+    def put(self, model_name, text, embedding):
+        key = (model_name, normalize_text(text))
+        embedding = np.array(embedding, dtype=np.float32)
+        # Cached embeddings are shared between requests
+        embedding.setflags(write=False)
+        with self._lock:
+            self._put_in_memory(key, embedding)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO embeddings (model_name, text, embedding) VALUES (?, ?, ?)",
+                    (key[0], key[1], embedding.tobytes())
+                )
+                self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM embeddings")
+                self._db.commit()
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["max_entries"] = self.max_entries
+            lookups = stats["hits"] + stats["disk_hits"] + stats["misses"]
+            stats["hit_rate"] = (stats["hits"] + stats["disk_hits"]) / lookups if lookups > 0 else 0.0
+        return stats
+
+def encode_with_cache(cache, model_name, texts, encode):
+    """
+        Returns the (n, d) embeddings of texts, only the texts missing from the cache are sent to encode
+        (a function encoding a list of texts), and their embeddings are added to the cache.
+    """
+    texts = list(texts)
+    if cache is None:
+        return encode(texts)
+
+    embeddings = [cache.get(model_name, text) for text in texts]
+    missing = list(dict.fromkeys(normalize_text(text) for text, embedding in zip(texts, embeddings) if embedding is None))
+    if len(missing) > 0:
+        missing_embeddings = dict(zip(missing, encode(missing)))
+        for text, embedding in missing_embeddings.items():
+            cache.put(model_name, text, embedding)
+        for index, text in enumerate(texts):
+            if embeddings[index] is None:
+                embeddings[index] = missing_embeddings[normalize_text(text)]
+
+    if len(embeddings) == 0:
+        return encode(texts)
+    return np.stack(embeddings).astype(np.float32)
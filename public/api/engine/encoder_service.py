@@ -0,0 +1,212 @@
+import json
+import os
+import socket
+import socketserver
+import struct
+import threading
+import numpy as np
+from engine.cache import encode_with_cache
+
+# Every message is: header length, payload length (uint32, big-endian), JSON header, payload
+# The payload of an encode reply is the (n, d) float32 embeddings (little-endian, row-major)
+MESSAGE_PREFIX = struct.Struct(">II")
+
+def receive_exactly(sock, size):
+    chunks = []
+    remaining = size
+    while remaining > 0:
+        chunk = sock.recv(min(remaining, 1 << 20))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+def send_message(sock, header, payload = b""):
+    header = json.dumps(header).encode("utf-8")
+    sock.sendall(MESSAGE_PREFIX.pack(len(header), len(payload)) + header + payload)
+
+def receive_message(sock):
+    """
+        Returns (header, payload), or None if the connection was closed.
+    """
+    prefix = receive_exactly(sock, MESSAGE_PREFIX.size)
+    if prefix is None:
+        return None
+    header_size, payload_size = MESSAGE_PREFIX.unpack(prefix)
+    header = receive_exactly(sock, header_size)
+    payload = receive_exactly(sock, payload_size) if payload_size > 0 else b""
+    if header is None or payload is None:
+        return None
+    return json.loads(header.decode("utf-8")), payload
+
+class _ThreadingUnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+class _ConnectionHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        # A client keeps its connection open for many requests
+        while True:
+            message = receive_message(self.request)
+            if message is None:
+                return
+            header, payload = self.server.service.handle(message[0])
+            send_message(self.request, header, payload)
+
+class EncoderService:
+    """
+        Encoder sidecar: owns the models (a dict or a ModelRegistry of Model / MicroBatcher) and
+        answers the encode requests of every API worker of the host over a Unix socket.
+        With MicroBatcher models, the requests of different workers are batched together.
+
+        Requests:
+            {"op": "encode", "model": model_name, "texts": [...]} -> {"shape": [n, d]} + float32 payload
+            {"op": "info", "model": model_name} -> {"dim": d}
+        Errors are answered with {"error": message}.
+    """
+    def __init__(self, models, socket_path):
+        self.models = models
+        self.socket_path = socket_path
+        self._lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "texts": 0,
+            "errors": 0,
+        }
+
+        directory = os.path.dirname(socket_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.exists(socket_path):
+            # Left by a previous run
+            os.remove(socket_path)
+        self.server = _ThreadingUnixServer(socket_path, _ConnectionHandler)
+        self.server.service = self
+
+    def handle(self, request):
+        try:
+            op = request.get("op", None)
+            model_name = request.get("model", None)
+            if model_name not in self.models:
+                raise Exception(f"Model {model_name} not found")
+            model = self.models[model_name]
+
+            if op == "info":
+                return {"dim": int(model.get_embedding_dim())}, b""
+            elif op == "encode":
+                texts = request.get("texts", [])
+                embeddings = np.ascontiguousarray(model.encode_texts(texts), dtype="<f4")
+                with self._lock:
+                    self._stats["requests"] += 1
+                    self._stats["texts"] += len(texts)
+                return {"shape": list(embeddings.shape)}, embeddings.tobytes()
+            raise Exception(f"Unknown op {op}")
+        except Exception as e:
+            with self._lock:
+                self._stats["errors"] += 1
+            return {"error": str(e)}, b""
+
+    def serve_forever(self):
+        self.server.serve_forever()
+
+    def start(self):
+        # Serves in a background thread (used by the tests)
+        thread = threading.Thread(target=self.serve_forever, name="EncoderService", daemon=True)
+        thread.start()
+        return thread
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+class RemoteModel:
+    """
+        Client of an EncoderService, with the same interface as Model.
+        Each thread keeps its own connection to the service, and reconnects once if it was closed.
+        The optional cache (an EmbeddingCache) is local to the worker.
+    """
+    def __init__(self, model_name, socket_path, timeout = 30.0, cache = None, cache_key = None):
+        self.model_name = model_name
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.cache = cache
+        self.cache_key = cache_key if cache_key is not None else model_name
+
+        self._embedding_dim = None
+        self._local = threading.local()
+        self._sockets_lock = threading.Lock()
+        self._sockets = []
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        with self._sockets_lock:
+            self._sockets.append(sock)
+        return sock
+
+    def _disconnect(self, sock):
+        with self._sockets_lock:
+            if sock in self._sockets:
+                self._sockets.remove(sock)
+        sock.close()
+        self._local.sock = None
+
+    def _request(self, header):
+        for attempt in range(2):
+            sock = getattr(self._local, "sock", None)
+            try:
+                if sock is None:
+                    sock = self._connect()
+                    self._local.sock = sock
+                send_message(sock, header)
+                message = receive_message(sock)
+                if message is None:
+                    raise ConnectionError("Connection closed by the encoder service")
+                break
+            except (OSError, ConnectionError) as e:
+                if sock is not None:
+                    self._disconnect(sock)
+                if attempt == 1:
+                    raise Exception(f"RemoteModel: Encoder service unavailable at {self.socket_path} ({e})")
+
+        reply, payload = message
+        if "error" in reply:
+            raise Exception(f"RemoteModel: {reply['error']}")
+        return reply, payload
+
+    def get_model_name(self):
+        return self.model_name
+
+    def get_embedding_dim(self):
+        if self._embedding_dim is None:
+            reply, _ = self._request({"op": "info", "model": self.model_name})
+            self._embedding_dim = reply["dim"]
+        return self._embedding_dim
+
+    def get_memory_size(self):
+        # The weights live in the encoder service
+        return 0
+
+    def encode_text(self, text):
+        return self.encode_texts([text])[0]
+
+    def encode_texts(self, texts):
+        return encode_with_cache(self.cache, self.cache_key, texts, self.encode_texts_uncached)
+
+    def encode_texts_uncached(self, texts):
+        reply, payload = self._request({"op": "encode", "model": self.model_name, "texts": list(texts)})
+        return np.frombuffer(payload, dtype="<f4").reshape(reply["shape"]).astype(np.float32)
+
+    def close(self):
+        with self._sockets_lock:
+            sockets = list(self._sockets)
+            self._sockets = []
+        for sock in sockets:
+            sock.close()
@@ -0,0 +1,70 @@
+import re
+import unicodedata
+import numpy as np
+
+def fold_keyword(keyword):
+    """
+        Case-folded and with single spaces, accents kept: "Été  Bleu" -> "été bleu"
+    """
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", keyword)).strip().casefold()
+
+def normalize_keyword(keyword):
+    """
+        Case-folded, without accents and with single spaces: "Été  Bleu" -> "ete bleu"
+    """
+    decomposed = unicodedata.normalize("NFKD", keyword)
+    without_accents = "".join(character for character in decomposed if not unicodedata.combining(character))
+    return re.sub(r"\s+", " ", without_accents).strip().casefold()
+
+class KeywordIndex:
+    """
+        In-memory index of the precomputed keyword embeddings (every language and type) of one model.
+
+        The embeddings are the rows of one float32 matrix (one per case-folded keyword, the first one is kept).
+        A lookup tries the case-folded keyword first, like LOWER(keyword) = LOWER(%s), then the keyword
+        without accents: "marche" and "marché" are distinct keywords, "marche" finds "Marché" when
+        there is no "marche". When several keywords share the same form without accents, the first one is kept.
+        langs (optional) gives the language of each keyword.
+    """
+    def __init__(self, model_name, keywords, vectors, langs = None):
+        self.model_name = model_name
+
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) != len(keywords):
+            raise Exception(f"KeywordIndex: Invalid vectors for model {model_name}")
+
+        # Case-folded keyword -> row, and keyword without accents -> row (fallback)
+        self.folded_to_row = {}
+        self.keyword_to_row = {}
+        rows = []
+        for row, keyword in enumerate(keywords):
+            folded = fold_keyword(keyword)
+            if folded in self.folded_to_row:
+                continue
+            self.folded_to_row[folded] = len(rows)
+            self.keyword_to_row.setdefault(normalize_keyword(keyword), len(rows))
+            rows.append(row)
+
+        rows = np.asarray(rows, dtype=np.int64)
+        self.matrix = np.ascontiguousarray(vectors[rows], dtype=np.float32)
+        self.langs = None if langs is None else np.asarray(langs, dtype=object)[rows]
+        # The rows are returned without copy
+        self.matrix.setflags(write=False)
+
+    def __len__(self):
+        return len(self.folded_to_row)
+
+    def __contains__(self, keyword):
+        return self.get_row(keyword) is not None
+
+    def get_row(self, keyword):
+        row = self.folded_to_row.get(fold_keyword(keyword), None)
+        if row is None:
+            row = self.keyword_to_row.get(normalize_keyword(keyword), None)
+        return row
+
+    def get(self, keyword):
+        row = self.get_row(keyword)
+        if row is None:
+            return None
+        return self.matrix[row]
@@ -0,0 +1,58 @@
+import numpy as np
+
+# Number of keywords scored at once against the whole collection
+DEFAULT_BLOCK_SIZE = 1024
+
+class KeywordScores:
+    """
+        Precomputed scores (inner products) of every keyword against every artwork of one model,
+        as one (keywords, artworks) matrix per language.
+
+        A query is a weighted sum of embeddings, so the score of an artwork for the keyword part of a
+        query is the same weighted sum of these rows: no encoding and no scan of the embeddings.
+        The columns follow the rows of the vector index.
+        With float16 (about 3 significant digits), the artworks with close scores may be reordered.
+    """
+    def __init__(self, keyword_index, vector_index, langs = None, dtype = np.float32, block_size = DEFAULT_BLOCK_SIZE):
+        self.model_name = keyword_index.model_name
+        self.recordIDs = vector_index.recordIDs
+
+        keyword_langs = keyword_index.langs
+        if keyword_langs is None:
+            keyword_langs = np.full(len(keyword_index.matrix), None, dtype=object)
+        if langs is None:
+            langs = list(dict.fromkeys(keyword_langs.tolist()))
+
+        self.matrices = {}
+        # Row of the keyword index -> (language, row of the matrix of the language)
+        self.positions = {}
+        for lang in langs:
+            rows = np.flatnonzero(keyword_langs == lang)
+            if len(rows) == 0:
+                continue
+            matrix = np.empty((len(rows), len(vector_index)), dtype=dtype)
+            for start in range(0, len(rows), block_size):
+                block_rows = rows[start:start + block_size]
+                matrix[start:start + len(block_rows)] = keyword_index.matrix[block_rows] @ vector_index.matrix.T
+            self.matrices[lang] = matrix
+            for position, row in enumerate(rows):
+                self.positions[int(row)] = (lang, position)
+
+    def __contains__(self, keyword_row):
+        return keyword_row in self.positions
+
+    def get_memory_size(self):
+        return sum(matrix.nbytes for matrix in self.matrices.values())
+
+    def get_scores(self, keyword_row):
+        lang, position = self.positions[keyword_row]
+        return self.matrices[lang][position]
+
+    def combine(self, keyword_rows, weights):
+        """
+            Returns the float32 scores of every artwork for the weighted sum of the keywords.
+        """
+        scores = np.zeros(len(self.recordIDs), dtype=np.float32)
+        for keyword_row, weight in zip(keyword_rows, weights):
+            scores += np.float32(weight) * self.get_scores(keyword_row).astype(np.float32)
+        return scores
@@ -0,0 +1,163 @@
+import json
+import os
+import time
+import numpy as np
+
+# Number of neighbours stored per artwork
+DEFAULT_K = 100
+# Number of artworks scored at once against the whole collection
+DEFAULT_BLOCK_SIZE = 1024
+
+def compute_knn_graph(matrix, k, block_size = DEFAULT_BLOCK_SIZE):
+    """
+        Top-k neighbours (itself excluded) of every row of matrix by inner product, computed by
+        blocks of block_size rows so that only a (block_size, n) score matrix is held at once.
+
+        Returns the (n, k) matrices of the neighbour rows and of their scores, by decreasing score.
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    n = len(matrix)
+    k = max(0, min(k, n - 1))
+    neighbours = np.empty((n, k), dtype=np.int64)
+    scores = np.empty((n, k), dtype=np.float32)
+    if k == 0:
+        return neighbours, scores
+
+    for start in range(0, n, block_size):
+        end = min(start + block_size, n)
+        block_scores = matrix[start:end] @ matrix.T
+        # An artwork is not its own neighbour
+        block_scores[np.arange(end - start), np.arange(start, end)] = -np.inf
+
+        rows = np.argpartition(-block_scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(block_scores, rows, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        neighbours[start:end] = np.take_along_axis(rows, order, axis=1)
+        scores[start:end] = np.take_along_axis(top_scores, order, axis=1)
+
+    return neighbours, scores
+
+class KnnGraph:
+    """
+        Precomputed k nearest neighbours of every artwork of one model.
+
+        Stored as three .npy files per model (recordIDs, neighbour recordIDs, scores) plus a small
+        JSON file, and memory-mapped when loaded: every worker shares the same pages.
+        checksum is the one of the vector index the graph was built from (see VectorIndex.get_checksum).
+    """
+    FILES = ("recordIDs", "neighbours", "scores")
+
+    def __init__(self, model_name, recordIDs, neighbours, scores, checksum = None):
+        self.model_name = model_name
+        self.recordIDs = recordIDs
+        self.neighbours = neighbours
+        self.scores = scores
+        self.checksum = checksum
+        self.recordID_to_row = {int(recordID): row for row, recordID in enumerate(recordIDs)}
+
+    @property
+    def k(self):
+        return self.neighbours.shape[1]
+
+    @property
+    def is_complete(self):
+        # Every other artwork is a neighbour: any page can be answered
+        return self.k >= len(self.recordIDs) - 1
+
+    @classmethod
+    def build(cls, vector_index, k = DEFAULT_K, block_size = DEFAULT_BLOCK_SIZE):
+        rows, scores = compute_knn_graph(vector_index.matrix, k, block_size=block_size)
+        recordIDs = vector_index.recordIDs.astype(np.int32)
+        return cls(vector_index.model_name, recordIDs, recordIDs[rows], scores, checksum=vector_index.get_checksum())
+
+    def matches(self, vector_index):
+        # Built from these embeddings: a graph without checksum cannot be validated
+        return self.checksum is not None and vector_index is not None and self.checksum == vector_index.get_checksum()
+
+    @staticmethod
+    def get_path(folder, model_name, name):
+        return os.path.join(folder, f"{model_name}.{name}.npy")
+
+    def save(self, folder):
+        os.makedirs(folder, exist_ok=True)
+        arrays = {
+            "recordIDs": np.asarray(self.recordIDs, dtype=np.int32),
+            "neighbours": np.asarray(self.neighbours, dtype=np.int32),
+            "scores": np.asarray(self.scores, dtype=np.float32),
+        }
+        for name in self.FILES:
+            path = self.get_path(folder, self.model_name, name)
+            # Written aside then renamed: a running API never maps a partial file
+            temporary_path = f"{path}.{os.getpid()}.tmp"
+            with open(temporary_path, "wb") as file:
+                np.save(file, arrays[name])
+            os.replace(temporary_path, path)
+
+        with open(os.path.join(folder, f"{self.model_name}.json"), "w") as file:
+            json.dump({"k": self.k, "count": len(self.recordIDs), "checksum": self.checksum, "created": time.time()}, file)
+
+    @classmethod
+    def load(cls, folder, model_name):
+        """
+            Returns the graph of the model, or None if it was not built.
+        """
+        paths = [cls.get_path(folder, model_name, name) for name in cls.FILES]
+        if not all(os.path.exists(path) for path in paths):
+            return None
+        recordIDs, neighbours, scores = [np.load(path, mmap_mode="r") for path in paths]
+        if neighbours.shape != scores.shape or len(neighbours) != len(recordIDs):
+            raise Exception(f"KnnGraph: Inconsistent files for model {model_name}")
+        checksum = None
+        metadata_path = os.path.join(folder, f"{model_name}.json")
+        if os.path.exists(metadata_path):
+            with open(metadata_path) as file:
+                checksum = json.load(file).get("checksum", None)
+        return cls(model_name, recordIDs, neighbours, scores, checksum=checksum)
+
+    def get_neighbours(self, recordID, offset, count, keep_original_record = False):
+        """
+            Returns the list of (recordID, score) of the neighbours of recordID, skipping the first offset ones,
+            with the artwork itself first (score 1) if keep_original_record.
+            Returns None if the artwork is unknown or if the page goes beyond the stored neighbours.
+        """
+        row = self.recordID_to_row.get(recordID, None)
+        if row is None:
+            return None
+
+        start = offset
+        end = offset + count
+        if keep_original_record:
+            start -= 1
+            end -= 1
+        if end > self.k and not self.is_complete:
+            return None
+
+        results = []
+        if keep_original_record and start < 0:
+            # Normalized embeddings: the artwork is its own best match
+            results.append((int(recordID), 1.0))
+            start = 0
+        end = max(start, min(end, self.k))
+        results.extend(
+            (int(neighbour), float(score))
+            for neighbour, score in zip(self.neighbours[row, start:end], self.scores[row, start:end])
+        )
+        return results
+
+    def get_depth(self, keep_original_record = False):
+        # Number of results of the ranking of an artwork the graph can serve
+        depth = len(self.recordIDs) - 1 if self.is_complete else self.k
+        return depth + 1 if keep_original_record else depth
+
+    def get_ranking(self, recordID, page, page_size, depth, keep_original_record = False):
+        """
+            Returns the first min(depth, get_depth()) results of the ranking of recordID (see get_neighbours)
+            and their number, or None if the page goes beyond them or if the artwork is unknown.
+        """
+        depth = min(depth, self.get_depth(keep_original_record))
+        if page * page_size > depth:
+            return None
+        results = self.get_neighbours(recordID, 0, depth, keep_original_record=keep_original_record)
+        if results is None:
+            return None
+        return results, depth
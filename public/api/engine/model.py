@@ -1,6 +1,26 @@
-from transformers import CLIPProcessor, CLIPModel
+import os
+from transformers import CLIPProcessor, CLIPModel, CLIPTextModelWithProjection
 import torch
+import numpy as np
 from transformers import AutoTokenizer
+from transformers.modeling_utils import no_init_weights
+from engine.cache import encode_with_cache, get_file_fingerprint
+from engine.batcher import MicroBatcher
+from engine.backends import TextEncoder, create_backend
+from engine.weights import ensure_safetensors, load_safetensors
+
+# Maximum number of texts sent to the text tower at once
+DEFAULT_BATCH_SIZE = 32
+
+# Keys of the CLIPModel state dict used by CLIPTextModelWithProjection
+TEXT_TOWER_PREFIXES = ("text_model.", "text_projection.")
+
+def get_cache_key(model_name, backend, weights_path = None):
+    # Embeddings of another backend are slightly different: they are cached separately
+    cache_key = model_name if backend == "torch" else f"{model_name}@{backend}"
+    # New weights under the same name (retraining): the embeddings of the previous ones are not served
+    fingerprint = get_file_fingerprint(weights_path) if weights_path is not None else None
+    return cache_key if fingerprint is None else f"{cache_key}#{fingerprint}"
 
 class Model:
     def __init__(
@@ -9,40 +29,137 @@ class Model:
         base_name,
         weights_path,
         device,
+        batch_size = DEFAULT_BATCH_SIZE,
+        cache = None,
+        text_only = True,
+        backend = "torch",
+        onnx_path = None,
     ):
         self.model_name = model_name
         self.base_name = base_name
         self.weights_path = weights_path
         self.device = device
+        self.batch_size = batch_size
+        # Optional EmbeddingCache (see engine/cache.py)
+        self.cache = cache
+        # The server only encodes texts: the vision tower and the processor are not loaded
+        self.text_only = text_only
+        # Inference backend of the text tower: "torch", "int8" or "onnx" (see engine/backends.py)
+        self.backend_name = backend
+        self.cache_key = get_cache_key(model_name, backend, weights_path)
+        self.onnx_path = onnx_path if onnx_path is not None else os.path.splitext(weights_path)[0] + ".text.onnx"
 
-        print(f"    Loading processor, model and tokenizer...")
-        self.processor = CLIPProcessor.from_pretrained(base_name)
-        self.model = CLIPModel.from_pretrained(base_name).to(device)
+        # The architecture is built without initializing (nor downloading) the base weights,
+        # every parameter is then replaced by the finetuned weights
+        model_class = CLIPTextModelWithProjection if self.text_only else CLIPModel
+        if self.text_only:
+            print(f"    Loading text model and tokenizer...")
+            self.processor = None
+        else:
+            print(f"    Loading processor, model and tokenizer...")
+            self.processor = CLIPProcessor.from_pretrained(base_name)
+        config = model_class.config_class.from_pretrained(base_name)
+        with no_init_weights():
+            self.model = model_class(config)
         self.tokenizer = AutoTokenizer.from_pretrained(base_name)
-        print(f"    ✓ : Processor, model and tokenizer loaded")
+        print(f"    ✓ : Model and tokenizer loaded")
         print(f"Loading weights...")
-        if self.device != "cpu":
-            self.model.load_state_dict(torch.load(weights_path, weights_only=True))
-        else:
-            self.model.load_state_dict(torch.load(weights_path, map_location=torch.device('cpu')))
+        # The finetuned weights are saved from a full CLIPModel
+        prefixes = TEXT_TOWER_PREFIXES if self.text_only else None
+        try:
+            # Memory-mapped: the pages of the weights are shared by every worker of the host
+            state_dict = load_safetensors(ensure_safetensors(weights_path), prefixes=prefixes)
+        except Exception as e:
+            print(f"Error: Could not use safetensors weights for {model_name} ({e}), loading {weights_path}")
+            state_dict = torch.load(weights_path, map_location=torch.device('cpu'), weights_only=True, mmap=True)
+            if prefixes is not None:
+                state_dict = {key: value for key, value in state_dict.items() if key.startswith(prefixes)}
+        # assign: the parameters become the loaded tensors instead of copies
+        self.model.load_state_dict(state_dict, assign=True)
+        del state_dict
+        self.model.to(device)
+        self.model.eval()
         print(f"    ✓ : Weights loaded")
 
+        self.embedding_dim = self.model.config.projection_dim
+        print(f"    Preparing the {self.backend_name} backend...")
+        self.backend = create_backend(
+            self.backend_name,
+            TextEncoder(self.model, self.text_only),
+            device,
+            onnx_path=self.onnx_path,
+            weights_path=weights_path
+        )
+        if self.backend_name != "torch":
+            # The backend holds its own (quantized or exported) copy of the text tower
+            self.model = None
+        print(f"    ✓ : {self.backend_name} backend ready")
+
     def get_model_name(self):
         return self.model_name
 
+    def get_embedding_dim(self):
+        return self.embedding_dim
+
+    def get_memory_size(self):
+        # Approximate size of the weights of the text tower (in bytes)
+        return self.backend.get_memory_size()
+
     def encode_text(self, text):
-        with torch.no_grad():
-            inputs = self.tokenizer(text, return_tensors="pt", padding=True, truncation=True)
+        return self.encode_texts([text])[0]
+
+    def encode_texts(self, texts):
+        """
+            Encodes a list of texts, returns a (n, d) float32 numpy array.
+            Only the texts missing from the cache (if any) go through the text tower.
+        """
+        return encode_with_cache(self.cache, self.cache_key, texts, self.encode_texts_uncached)
+
+    def encode_texts_uncached(self, texts):
+        """
+            Encodes a list of texts with the text tower (without the cache).
+            The texts are sorted by tokenized length and sent by batches of batch_size,
+            so that each batch is only padded to the length of its longest text.
+        """
+        texts = list(texts)
+        embeddings = np.empty((len(texts), self.get_embedding_dim()), dtype=np.float32)
+        if len(texts) == 0:
+            return embeddings
 
-            if self.device != "cpu":
-                inputs = inputs.to(self.device)
+        input_ids = self.tokenizer(texts, truncation=True)["input_ids"]
+        order = sorted(range(len(texts)), key=lambda index: len(input_ids[index]))
 
-            outputs = self.model.get_text_features(**inputs).squeeze()
-            # If the device is not cpu, convert the output to a numpy array
+        for start in range(0, len(order), self.batch_size):
+            batch_indexes = order[start:start + self.batch_size]
+            inputs = self.tokenizer.pad(
+                {"input_ids": [input_ids[index] for index in batch_indexes]},
+                padding=True,
+                return_tensors="pt"
+            )
+            embeddings[batch_indexes] = self.backend.encode(inputs["input_ids"], inputs["attention_mask"])
 
-            if self.device != "cpu":
-                outputs = outputs.cpu().numpy()
-            else:
-                outputs = outputs.numpy()
+        return embeddings
 
-        return outputs
\ No newline at end of file
+def load_model(embedding, device, encoder_config, cache = None):
+    """
+        Builds the Model of an embedding configuration (see settings.get_paths), wrapped in a
+        MicroBatcher when encoder_config (see settings.get_encoder_config) enables micro-batching.
+    """
+    model = Model(
+        embedding["name"],
+        embedding["base_name"],
+        embedding["weights_path"],
+        device=device,
+        batch_size=encoder_config["batch_size"],
+        cache=cache,
+        text_only=encoder_config["text_only"],
+        backend=embedding["backend"],
+        onnx_path=embedding["onnx_path"]
+    )
+    if encoder_config["micro_batching"]:
+        model = MicroBatcher(
+            model,
+            window_ms=encoder_config["micro_batching_window_ms"],
+            max_batch_size=encoder_config["micro_batching_max_batch_size"]
+        )
+    return model
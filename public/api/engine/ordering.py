@@ -0,0 +1,200 @@
+import time
+import numpy as np
+
+# Default time budget (in seconds) of the local search
+DEFAULT_TIME_BUDGET = 0.5
+# Collections up to this size are ordered with an exact solver
+EXACT_SOLVER_MAX_SIZE = 10
+# Number of starting points tried by the nearest neighbour construction
+MAX_NEAREST_NEIGHBOUR_STARTS = 16
+
+EPSILON = 1e-9
+
+def distance_matrix(vectors):
+    """
+        Cosine distance (1 - cosine similarity) between every pair of vectors, with a zero diagonal.
+    """
+    vectors = np.asarray(vectors, dtype=np.float64)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    vectors = vectors / norms
+    distances = 1 - vectors @ vectors.T
+    np.fill_diagonal(distances, 0)
+    return np.maximum(distances, 0)
+
+def path_length(path, distances):
+    path = np.asarray(path)
+    return float(distances[path[:-1], path[1:]].sum())
+
+def solve_exact(distances):
+    """
+        Shortest open path visiting every node (any start, any end) with the Held-Karp dynamic programming.
+        O(2^n * n^2), only for small n.
+    """
+    n = len(distances)
+    if n <= 2:
+        return list(range(n))
+
+    number_of_masks = 1 << n
+    dp = np.full((number_of_masks, n), np.inf)
+    parent = np.full((number_of_masks, n), -1, dtype=np.int64)
+    for node in range(n):
+        dp[1 << node, node] = 0
+
+    nodes = np.arange(n)
+    for mask in range(1, number_of_masks):
+        row = dp[mask]
+        if not np.isfinite(row).any():
+            continue
+        # candidates[j, k] = cost of the path ending in j, then going to k
+        candidates = row[:, None] + distances
+        best_previous = np.argmin(candidates, axis=0)
+        best_cost = candidates[best_previous, nodes]
+
+        next_nodes = nodes[((mask >> nodes) & 1) == 0]
+        next_masks = mask | (1 << next_nodes)
+        # Each (next_mask, next_node) can only be reached from mask
+        dp[next_masks, next_nodes] = best_cost[next_nodes]
+        parent[next_masks, next_nodes] = best_previous[next_nodes]
+
+    mask = number_of_masks - 1
+    node = int(np.argmin(dp[mask]))
+    path = []
+    while node != -1:
+        path.append(node)
+        previous = int(parent[mask, node])
+        mask ^= 1 << node
+        node = previous
+    return path[::-1]
+
+def nearest_neighbour_path(distances, start):
+    n = len(distances)
+    visited = np.zeros(n, dtype=bool)
+    path = [start]
+    visited[start] = True
+    current = start
+    for _ in range(n - 1):
+        row = np.where(visited, np.inf, distances[current])
+        current = int(np.argmin(row))
+        visited[current] = True
+        path.append(current)
+    return path
+
+def two_opt(tour, distances, deadline):
+    """
+        2-opt on a closed tour whose first node never moves.
+        For each edge (a, b), every other edge (c, d) is evaluated at once, and the best
+        reversal is applied. Stops at a local optimum or at the deadline.
+    """
+    m = len(tour)
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for i in range(m - 2):
+            a, b = tour[i], tour[i + 1]
+            js = np.arange(i + 2, m if i > 0 else m - 1)
+            if len(js) == 0:
+                continue
+            c = tour[js]
+            d = tour[(js + 1) % m]
+            delta = distances[a, c] + distances[b, d] - distances[a, b] - distances[c, d]
+            best = int(np.argmin(delta))
+            if delta[best] < -EPSILON:
+                j = js[best]
+                tour[i + 1:j + 1] = tour[i + 1:j + 1][::-1]
+                improved = True
+            if time.perf_counter() >= deadline:
+                break
+    return tour
+
+def or_opt(tour, distances, deadline, max_segment_length = 3):
+    """
+        Or-opt on a closed tour whose first node never moves.
+        Segments of 1 to max_segment_length nodes are moved (possibly reversed) to the best
+        position of the rest of the tour, every position being evaluated at once.
+    """
+    m = len(tour)
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for segment_length in range(1, max_segment_length + 1):
+            i = 1
+            while i + segment_length <= m:
+                if time.perf_counter() >= deadline:
+                    return tour
+                segment = tour[i:i + segment_length]
+                previous = tour[i - 1]
+                following = tour[(i + segment_length) % m]
+                first, last = segment[0], segment[-1]
+                removal_gain = distances[previous, first] + distances[last, following] - distances[previous, following]
+
+                rest = np.concatenate([tour[:i], tour[i + segment_length:]])
+                r = rest
+                r_next = np.roll(rest, -1)
+                base = distances[r, r_next]
+                forward = distances[r, first] + distances[last, r_next] - base
+                backward = distances[r, last] + distances[first, r_next] - base
+                # Inserting back at the original position is not a move
+                forward[i - 1] = np.inf
+                backward[i - 1] = np.inf
+
+                best_forward = int(np.argmin(forward))
+                best_backward = int(np.argmin(backward))
+                if forward[best_forward] <= backward[best_backward]:
+                    k, cost, inserted = best_forward, forward[best_forward], segment
+                else:
+                    k, cost, inserted = best_backward, backward[best_backward], segment[::-1]
+
+                if cost - removal_gain < -EPSILON:
+                    tour = np.concatenate([rest[:k + 1], inserted, rest[k + 1:]])
+                    improved = True
+                else:
+                    i += 1
+    return tour
+
+def order_by_similarity(vectors, time_budget = DEFAULT_TIME_BUDGET, exact_max_size = EXACT_SOLVER_MAX_SIZE):
+    """
+        Orders the vectors so that consecutive vectors are as similar as possible
+        (shortest open path with the cosine distance). Returns the list of row indexes.
+
+        - Up to exact_max_size vectors: exact solution (Held-Karp)
+        - Otherwise: nearest neighbour construction from several starts, then 2-opt and Or-opt
+          improvements until a local optimum or until the time budget is spent.
+    """
+    start_time = time.perf_counter()
+    deadline = start_time + time_budget
+
+    distances = distance_matrix(vectors)
+    n = len(distances)
+    if n <= 2:
+        return list(range(n))
+    if n <= exact_max_size:
+        return solve_exact(distances)
+
+    # The open path is solved as a closed tour with a dummy node at distance 0 of every node
+    extended = np.zeros((n + 1, n + 1))
+    extended[:n, :n] = distances
+    dummy = n
+
+    # Nearest neighbour construction, from the nodes at the border of the collection first
+    starts = np.argsort(-distances.mean(axis=1))[:MAX_NEAREST_NEIGHBOUR_STARTS]
+    construction_deadline = start_time + time_budget / 4
+    best_path = None
+    best_length = np.inf
+    for start in starts:
+        path = nearest_neighbour_path(distances, int(start))
+        length = path_length(path, distances)
+        if length < best_length:
+            best_path, best_length = path, length
+        if time.perf_counter() >= construction_deadline:
+            break
+
+    tour = np.array([dummy] + best_path, dtype=np.int64)
+    while time.perf_counter() < deadline:
+        length = path_length(tour[1:], distances)
+        tour = two_opt(tour, extended, deadline)
+        tour = or_opt(tour, extended, deadline)
+        if path_length(tour[1:], distances) >= length - EPSILON:
+            break
+
+    return [int(node) for node in tour[1:]]
@@ -0,0 +1,84 @@
+import secrets
+import numpy as np
+from engine.ttl_cache import TTLCache
+
+class Ranking:
+    """
+        The first depth results of a query, as a dict of aligned numpy arrays.
+        Shorter than depth when the query has fewer results.
+    """
+    def __init__(self, arrays, depth):
+        self.arrays = arrays
+        self.depth = depth
+
+    def __len__(self):
+        return min(len(values) for values in self.arrays.values()) if len(self.arrays) > 0 else 0
+
+    def covers(self, page, page_size):
+        # Every result of the page is in the ranking (or the query has no more results)
+        return page * page_size <= self.depth or len(self) < self.depth
+
+class RankingCache:
+    """
+        Ranked lists of results (the first depth ones), stored under an opaque cursor.
+
+        The first page of a query computes the ranked list once, the next pages (sent with the cursor)
+        are slices of it: a page costs the same whatever its number, and the results do not drift
+        between pages. A cursor only answers the query it was created for (same canonical key).
+    """
+    def __init__(self, max_entries = 1000, ttl = 600.0, depth = 1000):
+        self.depth = depth
+        self.cache = TTLCache(max_entries=max_entries, ttl=ttl)
+
+    def covers(self, page, page_size):
+        return page * page_size <= self.depth
+
+    def get(self, cursor, key):
+        """
+            Returns the Ranking stored under the cursor, or None if it expired or if it was created for another query.
+        """
+        if not cursor:
+            return None
+        entry = self.cache.get(cursor)
+        if entry is None or entry[0] != key:
+            return None
+        return entry[1]
+
+    def create(self, ranking, depth = None):
+        """
+            Returns the Ranking of a dict of aligned arrays (the first depth results).
+            depth defaults to the depth of the cache, a shorter ranking (e.g. served by a nearest
+            neighbours graph) only answers the pages within its own depth.
+        """
+        arrays = {name: np.asarray(values) for name, values in ranking.items()}
+        depth = self.depth if depth is None else min(depth, self.depth)
+        return Ranking(arrays, depth)
+
+    def put(self, key, ranking, depth = None):
+        """
+            Stores a ranking (a Ranking, or a dict of aligned arrays, see create) and returns its cursor.
+        """
+        if not isinstance(ranking, Ranking):
+            ranking = self.create(ranking, depth=depth)
+        cursor = secrets.token_urlsafe(16)
+        self.cache.put(cursor, (key, ranking))
+        return cursor
+
+    def get_page(self, ranking, page, page_size):
+        """
+            Returns the page of the Ranking (a dict of lists), or None if the page goes
+            beyond the stored results (only the first ranking.depth results are stored).
+        """
+        if not ranking.covers(page, page_size):
+            return None
+        start = (page - 1) * page_size
+        end = start + page_size
+        return {name: values[start:end].tolist() for name, values in ranking.arrays.items()}
+
+    def clear(self):
+        self.cache.clear()
+
+    def get_stats(self):
+        stats = self.cache.get_stats()
+        stats["depth"] = self.depth
+        return stats
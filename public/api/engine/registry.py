@@ -0,0 +1,229 @@
+import threading
+import time
+from concurrent.futures import Future
+
+class ModelRegistry:
+    """
+        Loads the models on demand, and behaves like a read-only dict {model_name: model}.
+
+        - A model is loaded on first use (registry[model_name]), or in a background thread with preload()
+        - A request for a model that is still loading waits for it (at most load_timeout seconds)
+        - A model unused for idle_timeout seconds can be evicted: idle models are evicted, least
+          recently used first, until the loaded models fit in memory_budget bytes
+          (every idle model is evicted when memory_budget is None). Pinned models are never evicted.
+
+        loader is a function model_name -> model. The models may expose get_memory_size() (in bytes)
+        and close(), which is called when the model is evicted.
+    """
+    def __init__(
+        self,
+        model_names,
+        loader,
+        idle_timeout = None,
+        memory_budget = None,
+        pinned = None,
+        load_timeout = 600.0,
+        eviction_interval = 60.0,
+    ):
+        self.model_names = list(model_names)
+        self.loader = loader
+        self.idle_timeout = idle_timeout
+        self.memory_budget = memory_budget
+        self.pinned = set(pinned or [])
+        self.load_timeout = load_timeout
+
+        self._lock = threading.Lock()
+        # model_name -> Future of the model, while loading and once loaded
+        self._futures = {}
+        self._last_used = {}
+        self._sizes = {}
+        self._stats = {
+            "loads": 0,
+            "load_failures": 0,
+            "load_time": 0.0,
+            "waits": 0,
+            "evictions": 0,
+        }
+
+        self._closed = threading.Event()
+        self._evictor = None
+        if idle_timeout is not None:
+            self._evictor = threading.Thread(
+                target=self._run_evictor,
+                args=(eviction_interval,),
+                name="ModelRegistry-evictor",
+                daemon=True
+            )
+            self._evictor.start()
+
+    # dict interface (the DatabaseManager and the routes only use these)
+    def __contains__(self, model_name):
+        return model_name in self.model_names
+
+    def __iter__(self):
+        return iter(self.model_names)
+
+    def __len__(self):
+        return len(self.model_names)
+
+    def keys(self):
+        return list(self.model_names)
+
+    def __getitem__(self, model_name):
+        return self.get(model_name)
+
+    def get(self, model_name):
+        if model_name not in self.model_names:
+            raise KeyError(model_name)
+
+        while True:
+            with self._lock:
+                future = self._futures.get(model_name, None)
+                is_loader = future is None
+                if is_loader:
+                    future = Future()
+                    self._futures[model_name] = future
+                elif not future.done():
+                    self._stats["waits"] += 1
+
+            if is_loader:
+                self._load(model_name, future)
+
+            model = future.result(timeout=self.load_timeout)
+            with self._lock:
+                # Evicted (and closed) since: loaded again
+                if self._futures.get(model_name, None) is not future:
+                    continue
+                # Under the same lock as evict, an idle eviction decided before is cancelled
+                self._last_used[model_name] = time.monotonic()
+            return model
+
+    def _load(self, model_name, future):
+        start_time = time.perf_counter()
+        try:
+            model = self.loader(model_name)
+        except Exception as e:
+            with self._lock:
+                # The next request will try again
+                self._futures.pop(model_name, None)
+                self._stats["load_failures"] += 1
+            future.set_exception(e)
+            return
+
+        get_memory_size = getattr(model, "get_memory_size", None)
+        size = get_memory_size() if get_memory_size is not None else 0
+        with self._lock:
+            self._sizes[model_name] = size
+            self._last_used[model_name] = time.monotonic()
+            self._stats["loads"] += 1
+            self._stats["load_time"] += time.perf_counter() - start_time
+        future.set_result(model)
+
+    def preload(self, model_names = None, background = True):
+        """
+            Starts loading the models (all of them by default).
+            In background, returns the threads right away, otherwise returns once they are all loaded.
+        """
+        if model_names is None:
+            model_names = self.model_names
+
+        threads = []
+        for model_name in model_names:
+            thread = threading.Thread(
+                target=self._preload_one,
+                args=(model_name,),
+                name=f"ModelRegistry-load-{model_name}",
+                daemon=True
+            )
+            thread.start()
+            threads.append(thread)
+
+        if not background:
+            for thread in threads:
+                thread.join()
+        return threads
+
+    def _preload_one(self, model_name):
+        try:
+            self.get(model_name)
+        except Exception as e:
+            print(f"Error: Could not load model {model_name}: {e}")
+
+    def is_loaded(self, model_name):
+        with self._lock:
+            future = self._futures.get(model_name, None)
+        return future is not None and future.done() and future.exception() is None
+
+    def evict(self, model_name, last_used = None):
+        """
+            Evicts a loaded model. With last_used, only when the model has not been used since then.
+        """
+        with self._lock:
+            future = self._futures.get(model_name, None)
+            if future is None or not future.done():
+                return False
+            if last_used is not None and self._last_used.get(model_name, None) != last_used:
+                return False
+            del self._futures[model_name]
+            self._sizes.pop(model_name, None)
+            self._last_used.pop(model_name, None)
+            self._stats["evictions"] += 1
+
+        if future.exception() is None:
+            close = getattr(future.result(), "close", None)
+            if close is not None:
+                close()
+        print(f"✓ : Model {model_name} evicted")
+        return True
+
+    def evict_idle(self, now = None):
+        """
+            Evicts the models unused for idle_timeout seconds, least recently used first,
+            until the loaded models fit in the memory budget. Returns the evicted model names.
+        """
+        if self.idle_timeout is None:
+            return []
+        if now is None:
+            now = time.monotonic()
+
+        with self._lock:
+            loaded = [model_name for model_name, future in self._futures.items() if future.done()]
+            total_size = sum(self._sizes.get(model_name, 0) for model_name in loaded)
+            idle = [
+                model_name for model_name in loaded
+                if model_name not in self.pinned
+                and now - self._last_used.get(model_name, now) >= self.idle_timeout
+            ]
+            idle.sort(key=lambda model_name: self._last_used.get(model_name, now))
+
+            to_evict = []
+            for model_name in idle:
+                if self.memory_budget is not None and total_size <= self.memory_budget:
+                    break
+                to_evict.append((model_name, self._last_used.get(model_name, None)))
+                total_size -= self._sizes.get(model_name, 0)
+
+        # The models used in the meantime are kept
+        return [model_name for model_name, last_used in to_evict if self.evict(model_name, last_used=last_used)]
+
+    def _run_evictor(self, interval):
+        while not self._closed.wait(interval):
+            try:
+                self.evict_idle()
+            except Exception as e:
+                print(f"Error: Model eviction failed: {e}")
+
+    def close(self):
+        self._closed.set()
+        for model_name in list(self.model_names):
+            self.evict(model_name)
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["configured"] = len(self.model_names)
+            stats["loaded"] = [model_name for model_name, future in self._futures.items() if future.done()]
+            stats["loading"] = [model_name for model_name, future in self._futures.items() if not future.done()]
+            stats["memory_size"] = sum(self._sizes.values())
+            stats["memory_budget"] = self.memory_budget
+        return stats
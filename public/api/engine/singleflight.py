@@ -0,0 +1,67 @@
+import threading
+from concurrent.futures import Future, TimeoutError
+
+class SingleFlight:
+    """
+        Coalesces the concurrent calls with the same key: the first one (the leader) computes the
+        result, the others wait for it (at most timeout seconds) and share it.
+
+        The result is shared as is: it must not be modified by the callers.
+        A waiter that times out computes the result on its own, an exception of the leader is raised to every waiter.
+    """
+    def __init__(self, timeout = 30.0):
+        self.timeout = timeout
+
+        self._lock = threading.Lock()
+        # key -> Future of the result, while it is computed
+        self._futures = {}
+        self._stats = {
+            "calls": 0,
+            "coalesced": 0,
+            "timeouts": 0,
+            "errors": 0,
+        }
+
+    def do(self, key, function):
+        with self._lock:
+            self._stats["calls"] += 1
+            future = self._futures.get(key, None)
+            is_leader = future is None
+            if is_leader:
+                future = Future()
+                self._futures[key] = future
+            else:
+                self._stats["coalesced"] += 1
+
+        if is_leader:
+            try:
+                result = function()
+            except Exception as e:
+                with self._lock:
+                    self._stats["errors"] += 1
+                future.set_exception(e)
+                raise
+            else:
+                future.set_result(result)
+                return result
+            finally:
+                # The next calls compute a fresh result
+                with self._lock:
+                    self._futures.pop(key, None)
+                if not future.done():
+                    # Interrupted by a BaseException (KeyboardInterrupt, SystemExit, ...): the waiters must not hang
+                    future.set_exception(RuntimeError("SingleFlight: The leader was interrupted"))
+
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            with self._lock:
+                self._stats["timeouts"] += 1
+            return function()
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._futures)
+            stats["coalesced_rate"] = stats["coalesced"] / stats["calls"] if stats["calls"] > 0 else 0.0
+        return stats
@@ -0,0 +1,101 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+def canonical_key(value):
+    """
+        Hash of a JSON-like value that does not depend on the order of the keys of its dicts.
+    """
+    serialized = json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+class TTLCache:
+    """
+        Thread-safe LRU cache whose entries expire ttl seconds after being stored.
+
+        Bounded by max_entries and, when sizeof (a function value -> size in bytes) is given,
+        by max_size bytes: the least recently used entries are evicted first.
+    """
+    def __init__(self, max_entries = 1000, ttl = 300.0, max_size = None, sizeof = None, clock = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_size = max_size
+        self.sizeof = sizeof
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        # key -> (value, expiry, size)
+        self._entries = OrderedDict()
+        self._size = 0
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "expirations": 0,
+            "evictions": 0,
+            "invalidations": 0,
+        }
+
+    def _remove(self, key):
+        # Must be called while holding the lock
+        _, _, size = self._entries.pop(key)
+        self._size -= size
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key, None)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            value, expiry, _ = entry
+            if self.clock() >= expiry:
+                self._remove(key)
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return value
+
+    def put(self, key, value):
+        size = self.sizeof(value) if self.sizeof is not None else 0
+        if self.max_size is not None and size > self.max_size:
+            # Would evict everything else
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, self.clock() + self.ttl, size)
+            self._size += size
+            while len(self._entries) > self.max_entries or (self.max_size is not None and self._size > self.max_size):
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self._stats["evictions"] += 1
+
+    def pop(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            if len(self._entries) > 0:
+                self._stats["invalidations"] += 1
+            self._entries.clear()
+            self._size = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["max_entries"] = self.max_entries
+            stats["size"] = self._size
+            stats["max_size"] = self.max_size
+            lookups = stats["hits"] + stats["misses"]
+            stats["hit_rate"] = stats["hits"] / lookups if lookups > 0 else 0.0
+        return stats
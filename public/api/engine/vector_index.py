@@ -0,0 +1,147 @@
+import hashlib
+import numpy as np
+
+class VectorIndex:
+    """
+        Exact in-memory vector index for the embeddings of one model.
+
+        Every vector is L2-normalized and stored as one row of a contiguous float32 matrix,
+        so that the inner product of a (normalized) query with the matrix gives the cosine
+        similarity to every artwork in a single BLAS call.
+    """
+    def __init__(self, model_name, recordIDs, vectors):
+        self.model_name = model_name
+
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) != len(recordIDs):
+            raise Exception(f"VectorIndex: Invalid vectors for model {model_name}")
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        self.matrix = np.ascontiguousarray(vectors / norms, dtype=np.float32)
+
+        self.recordIDs = np.asarray(recordIDs, dtype=np.int64)
+        self.recordID_to_row = {int(recordID): row for row, recordID in enumerate(self.recordIDs)}
+        self._checksum = None
+
+    def __len__(self):
+        return len(self.recordIDs)
+
+    def __contains__(self, recordID):
+        return recordID in self.recordID_to_row
+
+    @property
+    def dim(self):
+        return self.matrix.shape[1]
+
+    def get_checksum(self):
+        """
+            Returns the SHA-256 of the recordIDs and of the vectors (computed once): the data derived
+            from the index (e.g. the nearest neighbours graph) is only valid for the same checksum.
+        """
+        if self._checksum is None:
+            digest = hashlib.sha256()
+            digest.update(self.recordIDs.tobytes())
+            digest.update(self.matrix.tobytes())
+            self._checksum = digest.hexdigest()
+        return self._checksum
+
+    def get_row(self, recordID):
+        return self.recordID_to_row.get(recordID, None)
+
+    def get_vector(self, recordID):
+        row = self.get_row(recordID)
+        if row is None:
+            return None
+        return self.matrix[row]
+
+    def get_vectors(self, recordIDs):
+        """
+            Returns the (n, d) matrix of the vectors of the recordIDs found in the index,
+            and the list of these recordIDs (aligned with the rows of the matrix).
+        """
+        rows = []
+        found_recordIDs = []
+        for recordID in recordIDs:
+            row = self.get_row(recordID)
+            if row is not None:
+                rows.append(row)
+                found_recordIDs.append(recordID)
+        return self.matrix[np.asarray(rows, dtype=np.int64)], found_recordIDs
+
+    def scores(self, query):
+        """
+            Returns the inner product between the query and every vector of the index.
+        """
+        return self.matrix @ np.asarray(query, dtype=np.float32)
+
+    def top_k(self, scores, k, offset=0, mask=None):
+        """
+            Returns the rows of the k best scores after skipping the first offset ones,
+            sorted by decreasing score. Rows where mask is False are never returned.
+        """
+        if mask is not None:
+            scores = np.where(mask, scores, -np.inf)
+            available = int(np.count_nonzero(mask))
+        else:
+            available = len(scores)
+
+        end = min(offset + k, available)
+        if end <= offset:
+            return np.empty(0, dtype=np.int64)
+
+        if end < len(scores):
+            # Only the end best rows are sorted
+            rows = np.argpartition(-scores, end - 1)[:end]
+        else:
+            rows = np.arange(len(scores))
+        rows = rows[np.argsort(-scores[rows], kind="stable")]
+        return rows[offset:end]
+
+    def search(self, query, k, offset=0, exclude=None, mask=None):
+        """
+            Returns a list of (recordID, score) of the k vectors closest to the query,
+            skipping the first offset ones.
+        """
+        scores = self.scores(query)
+
+        if exclude:
+            mask = np.ones(len(scores), dtype=bool) if mask is None else mask.copy()
+            for recordID in exclude:
+                row = self.get_row(recordID)
+                if row is not None:
+                    mask[row] = False
+
+        rows = self.top_k(scores, k, offset=offset, mask=mask)
+        return [(int(self.recordIDs[row]), float(scores[row])) for row in rows]
+
+    def search_batch(self, queries, k, exclude=None):
+        """
+            Searches several queries at once (one matrix product).
+            exclude is an optional list (one entry per query) of recordIDs to skip.
+
+            Returns the (q, k) matrices of the rows and of the scores of the k best vectors of
+            each query, sorted by decreasing score. Missing results (fewer than k vectors available)
+            have a score of -inf.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        scores = queries @ self.matrix.T
+
+        if exclude is not None:
+            for query_index, recordIDs in enumerate(exclude):
+                for recordID in recordIDs or []:
+                    row = self.get_row(recordID)
+                    if row is not None:
+                        scores[query_index, row] = -np.inf
+
+        k = min(k, len(self))
+        if k <= 0:
+            return np.empty((len(queries), 0), dtype=np.int64), np.empty((len(queries), 0), dtype=np.float32)
+
+        if k < len(self):
+            rows = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            rows = np.tile(np.arange(len(self)), (len(queries), 1))
+        top_scores = np.take_along_axis(scores, rows, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        return np.take_along_axis(rows, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
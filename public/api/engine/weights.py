@@ -0,0 +1,86 @@
+import json
+import os
+import struct
+import torch
+
+# dtypes of the safetensors format
+SAFETENSORS_DTYPES = {
+    "F64": torch.float64,
+    "F32": torch.float32,
+    "F16": torch.float16,
+    "BF16": torch.bfloat16,
+    "I64": torch.int64,
+    "I32": torch.int32,
+    "I16": torch.int16,
+    "I8": torch.int8,
+    "U8": torch.uint8,
+    "BOOL": torch.bool,
+}
+
+def get_safetensors_path(weights_path):
+    return os.path.splitext(weights_path)[0] + ".safetensors"
+
+def ensure_safetensors(weights_path, safetensors_path = None):
+    """
+        Converts the PyTorch checkpoint weights_path to safetensors (once, and again when the
+        checkpoint is newer), returns the path of the safetensors file.
+        The file is written under a temporary name then renamed, so that concurrent workers
+        never read a partial file.
+    """
+    from safetensors.torch import save_file
+
+    if safetensors_path is None:
+        safetensors_path = get_safetensors_path(weights_path)
+
+    if os.path.exists(safetensors_path):
+        if not os.path.exists(weights_path) or os.path.getmtime(safetensors_path) >= os.path.getmtime(weights_path):
+            return safetensors_path
+
+    print(f"    Converting {weights_path} to safetensors...")
+    state_dict = torch.load(weights_path, map_location=torch.device('cpu'), weights_only=True)
+    # safetensors refuses shared or non-contiguous tensors
+    state_dict = {key: value.detach().clone().contiguous() for key, value in state_dict.items()}
+    temporary_path = f"{safetensors_path}.{os.getpid()}.tmp"
+    save_file(state_dict, temporary_path)
+    os.replace(temporary_path, safetensors_path)
+    del state_dict
+    print(f"    ✓ : Weights converted to {safetensors_path}")
+    return safetensors_path
+
+def load_safetensors(path, prefixes = None):
+    """
+        Loads the tensors of a safetensors file without copying them: the file is memory-mapped
+        (copy-on-write) and every tensor is a view of the mapping, so the pages are read lazily and
+        shared through the page cache by every process loading the same file.
+        Only the keys starting with one of prefixes are loaded (all of them by default).
+    """
+    with open(path, "rb") as file:
+        header_size = struct.unpack("<Q", file.read(8))[0]
+        header = json.loads(file.read(header_size))
+    header.pop("__metadata__", None)
+    data_start = 8 + header_size
+
+    storage = torch.UntypedStorage.from_file(path, shared=False, nbytes=os.path.getsize(path))
+
+    state_dict = {}
+    for key, info in header.items():
+        if prefixes is not None and not key.startswith(tuple(prefixes)):
+            continue
+        if info["dtype"] not in SAFETENSORS_DTYPES:
+            raise Exception(f"load_safetensors: Unsupported dtype {info['dtype']} for {key}")
+        dtype = SAFETENSORS_DTYPES[info["dtype"]]
+        begin, end = info["data_offsets"]
+        begin += data_start
+        end += data_start
+
+        element_size = torch.empty(0, dtype=dtype).element_size()
+        if begin % element_size == 0:
+            tensor = torch.empty(0, dtype=dtype)
+            tensor.set_(storage, begin // element_size, info["shape"])
+        else:
+            # A misaligned tensor cannot be a view of the mapping
+            with open(path, "rb") as file:
+                file.seek(begin)
+                tensor = torch.frombuffer(bytearray(file.read(end - begin)), dtype=dtype).reshape(info["shape"])
+        state_dict[key] = tensor
+    return state_dict
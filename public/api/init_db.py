@@ -1,22 +1,20 @@
-from settings import get_db_config, get_paths
+from settings import get_db_config, get_paths, get_vector_index_config, get_knn_graph_config, get_keyword_scores_config, get_columnar_index_config, get_encoder_config
 from database.db import DatabaseManager
-from engine.model import Model
+from engine.model import load_model as load_model_from_config
+from engine.registry import ModelRegistry
 
-# Start the Database manager
-MODELS = {}
-print(f"Loading models...")
-for embedding in get_paths()["embeddings"]:
-    print(f"Loading model {embedding['name']}...")
-    MODELS[embedding["name"]] = Model(
-        embedding["name"],
-        embedding["base_name"],
-        embedding["weights_path"],
-        device="cpu"
-    )
-    print(f"✓ : Model {embedding['name']} loaded")
-print(f"Models loaded")
+def load_model(model_name):
+    embedding = next(embedding for embedding in get_paths()["embeddings"] if embedding["name"] == model_name)
+    print(f"Loading model {model_name}...")
+    model = load_model_from_config(embedding, "cpu", get_encoder_config())
+    print(f"✓ : Model {model_name} loaded")
+    return model
+
+# Populating the database only reads the precomputed embeddings: the models are loaded on first use
+MODELS = ModelRegistry([embedding["name"] for embedding in get_paths()["embeddings"]], load_model)
 
-DB_MANAGER = DatabaseManager(get_db_config(), get_paths(), MODELS)
+# Start the Database manager
+DB_MANAGER = DatabaseManager(get_db_config(), get_paths(), MODELS, get_vector_index_config(), get_knn_graph_config(), get_keyword_scores_config(), get_columnar_index_config())
 
 if __name__ == "__main__":
     DB_MANAGER.populate_keywords()
@@ -25,3 +23,7 @@ if __name__ == "__main__":
     if yesno == "y":
         DB_MANAGER.reset(full_reset=True)
         DB_MANAGER.populate()
+
+    yesno = input("Build the nearest neighbours graphs? (y/n): ")
+    if yesno == "y":
+        DB_MANAGER.build_knn_graphs()
@@ -10,6 +10,10 @@ DB_INPUT_ARTISTS = PARENT + os.getenv("DB_INPUT_ARTISTS")
 DB_INPUT_SUBJECTMATTER = PARENT + os.getenv("DB_INPUT_SUBJECTMATTER")
 FILE_SUBJECTMATTERS_PARSED = PARENT + os.getenv("FILE_SUBJECTMATTERS_PARSED")
 
+def get_optional_path(name):
+    path = os.getenv(name)
+    return PARENT + path if path else None
+
 def get_paths():
     return {
         "artpieces": DB_INPUT_ARTPIECES,
@@ -86,6 +90,9 @@ def get_paths():
                 "img_dim": 512,
                 "base_name": os.getenv("art-mini_model_name"),
                 "weights_path": PARENT + os.getenv("art-mini_weights_path"),
+                # Inference backend of the text tower: "torch", "int8" or "onnx" (see engine/backends.py)
+                "backend": os.getenv("art-mini_backend", "torch"),
+                "onnx_path": get_optional_path("art-mini_onnx_path"),
                 "description": "Art-mini embeddings",
                 "metrics": [
                     {"name": "loss", "value": 1.097012},
@@ -116,6 +123,9 @@ def get_paths():
                 "img_dim": 768,
                 "base_name": os.getenv("art-base_model_name"),
                 "weights_path": PARENT + os.getenv("art-base_weights_path"),
+                # Inference backend of the text tower: "torch", "int8" or "onnx" (see engine/backends.py)
+                "backend": os.getenv("art-base_backend", "torch"),
+                "onnx_path": get_optional_path("art-base_onnx_path"),
                 "description": "Art-base embeddings",
                 "metrics": [
                     {"name": "loss", "value": 0.270707},
@@ -146,6 +156,9 @@ def get_paths():
                 "img_dim": 768,
                 "base_name": os.getenv("art-large_model_name"),
                 "weights_path": PARENT + os.getenv("art-large_weights_path"),
+                # Inference backend of the text tower: "torch", "int8" or "onnx" (see engine/backends.py)
+                "backend": os.getenv("art-large_backend", "torch"),
+                "onnx_path": get_optional_path("art-large_onnx_path"),
                 "description": "Art-large embeddings",
                 "metrics": [
                     {"name": "loss", "value": 0.119609},
@@ -165,6 +178,125 @@ def get_db_config():
         "name": os.getenv("DB_NAME"),
         "user": os.getenv("DB_USER"),
         "password": os.getenv("DB_PASSWORD"),
+        "pool_min_size": int(os.getenv("DB_POOL_MIN_SIZE", 1)),
+        "pool_max_size": int(os.getenv("DB_POOL_MAX_SIZE", 10)),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", 30)),
+    }
+
+def get_encoder_config():
+    return {
+        # Only load the text tower of the models (the API never encodes images)
+        "text_only": os.getenv("ENCODER_TEXT_ONLY", "true").lower() == "true",
+        # Maximum number of texts sent to the text tower at once
+        "batch_size": int(os.getenv("ENCODER_BATCH_SIZE", 32)),
+        # Coalesce the encode requests of concurrent API requests (see engine/batcher.py)
+        "micro_batching": os.getenv("ENCODER_MICRO_BATCHING", "false").lower() == "true",
+        "micro_batching_window_ms": float(os.getenv("ENCODER_MICRO_BATCHING_WINDOW_MS", 5)),
+        "micro_batching_max_batch_size": int(os.getenv("ENCODER_MICRO_BATCHING_MAX_BATCH_SIZE", 32)),
+    }
+
+def get_encoder_service_config():
+    # Encoder sidecar shared by the API workers (see encoder_service.py)
+    socket_path = os.getenv("ENCODER_SERVICE_SOCKET")
+    return {
+        # The API workers use the service when set, and load the models themselves otherwise
+        "socket_path": PARENT + socket_path if socket_path else None,
+        "timeout": float(os.getenv("ENCODER_SERVICE_TIMEOUT", 30)),
+    }
+
+def get_model_registry_config():
+    # Lazy loading and eviction of the models (see engine/registry.py)
+    preload = os.getenv("MODEL_REGISTRY_PRELOAD", "all")
+    idle_timeout = os.getenv("MODEL_REGISTRY_IDLE_TIMEOUT")
+    memory_budget = os.getenv("MODEL_REGISTRY_MEMORY_BUDGET_MB")
+    return {
+        # Models loaded at startup: "all", "none" or a comma separated list of model names (the other ones load on first use)
+        "preload": None if preload == "all" else [name.strip() for name in preload.split(",") if name.strip() and preload != "none"],
+        # Load the preloaded models in background threads (the app serves right away)
+        "background": os.getenv("MODEL_REGISTRY_BACKGROUND", "true").lower() == "true",
+        # Models unused for this many seconds can be evicted (no eviction when not set)
+        "idle_timeout": float(idle_timeout) if idle_timeout else None,
+        # Idle models are evicted until the loaded ones fit in this budget (every idle model when not set)
+        "memory_budget": int(float(memory_budget) * 1024 * 1024) if memory_budget else None,
+        # Models never evicted
+        "pinned": [name.strip() for name in os.getenv("MODEL_REGISTRY_PINNED", "").split(",") if name.strip()],
+        # Maximum wait (in seconds) of a request for a model that is loading
+        "load_timeout": float(os.getenv("MODEL_REGISTRY_LOAD_TIMEOUT", 600)),
+    }
+
+def get_embedding_cache_config():
+    # Cache of the text embeddings (see engine/cache.py)
+    path = os.getenv("EMBEDDING_CACHE_PATH")
+    return {
+        "enabled": os.getenv("EMBEDDING_CACHE", "true").lower() == "true",
+        "max_entries": int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", 10000)),
+        # Optional SQLite file, the cache survives restarts
+        "path": PARENT + path if path else None,
+    }
+
+def get_vector_index_config():
+    # Approximate nearest neighbour indexes built by pgvector on the Embedding table
+    return {
+        # "none" (exact scans), "hnsw" or "ivfflat"; the approximate searches may miss artworks (see README)
+        "method": os.getenv("VECTOR_INDEX_METHOD", "none"),
+        # HNSW
+        "m": int(os.getenv("VECTOR_INDEX_HNSW_M", 16)),
+        "ef_construction": int(os.getenv("VECTOR_INDEX_HNSW_EF_CONSTRUCTION", 64)),
+        "ef_search": int(os.getenv("VECTOR_INDEX_HNSW_EF_SEARCH", 100)),
+        # IVFFlat
+        "lists": int(os.getenv("VECTOR_INDEX_IVFFLAT_LISTS", 100)),
+        "probes": int(os.getenv("VECTOR_INDEX_IVFFLAT_PROBES", 10)),
+    }
+
+def get_knn_graph_config():
+    # Precomputed nearest neighbours of every artwork (built by init_db.py, see engine/knn_graph.py)
+    return {
+        "folder": PARENT + os.getenv("KNN_GRAPH_FOLDER", "private_data/knn_graph"),
+        # Number of neighbours stored per artwork (pages beyond are computed live)
+        "k": int(os.getenv("KNN_GRAPH_K", 100)),
+        "block_size": int(os.getenv("KNN_GRAPH_BLOCK_SIZE", 1024)),
+    }
+
+def get_keyword_scores_config():
+    # Precomputed keywords x artworks scores, used by the queries with keywords, colors or luminosities
+    langs = os.getenv("KEYWORD_SCORES_LANGS")
+    return {
+        "enabled": os.getenv("KEYWORD_SCORES", "true").lower() == "true",
+        # Comma separated list of languages (all of them when not set)
+        "langs": [lang.strip() for lang in langs.split(",") if lang.strip()] if langs else None,
+        # "float32" keeps the ranking of the query embedding, "float16" halves the memory (approximate ranking)
+        "dtype": os.getenv("KEYWORD_SCORES_DTYPE", "float32"),
+    }
+
+def get_columnar_index_config():
+    # In-memory evaluation of the hard constraints (see database/columnar.py), the database answers the others
+    return {
+        "enabled": os.getenv("COLUMNAR_INDEX", "true").lower() == "true",
+    }
+
+def get_ranking_cache_config():
+    # Ranked lists kept under a cursor for the next pages (see engine/ranking_cache.py)
+    return {
+        # Number of results ranked at once (the pages beyond are computed one by one)
+        "depth": int(os.getenv("RANKING_CACHE_DEPTH", 1000)),
+        "ttl": float(os.getenv("RANKING_CACHE_TTL", 600)),
+        "max_entries": int(os.getenv("RANKING_CACHE_MAX_ENTRIES", 1000)),
+    }
+
+def get_result_cache_config():
+    # Serialized responses of the identical /api/query requests (cleared when the data changes)
+    return {
+        "enabled": os.getenv("RESULT_CACHE", "true").lower() == "true",
+        "max_entries": int(os.getenv("RESULT_CACHE_MAX_ENTRIES", 2000)),
+        "max_size": int(float(os.getenv("RESULT_CACHE_MAX_SIZE_MB", 64)) * 1024 * 1024),
+        "ttl": float(os.getenv("RESULT_CACHE_TTL", 300)),
+    }
+
+def get_single_flight_config():
+    # Concurrent identical requests share one computation (see engine/singleflight.py)
+    return {
+        # Seconds a request waits for the identical one in flight before computing on its own
+        "timeout": float(os.getenv("SINGLE_FLIGHT_TIMEOUT", 30)),
     }
 
 # Testing
@@ -175,6 +307,9 @@ def get_db_config_test():
         "name": "test_db",
         "user": os.getenv("DB_USER"),
         "password": os.getenv("DB_PASSWORD"),
+        "pool_min_size": int(os.getenv("DB_POOL_MIN_SIZE", 1)),
+        "pool_max_size": int(os.getenv("DB_POOL_MAX_SIZE", 10)),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", 30)),
     }
 
 def get_paths_test():
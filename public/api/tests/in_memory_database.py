@@ -0,0 +1,50 @@
+import numpy as np
+from database.db import DatabaseManager
+from engine.keyword_index import KeywordIndex
+from engine.vector_index import VectorIndex
+
+class InMemoryDatabaseManager(DatabaseManager):
+    """
+        DatabaseManager whose preloaded data comes from dicts instead of the database:
+        embeddings maps model_name -> (recordIDs, vectors) and keywords maps model_name -> (keywords, vectors, langs).
+    """
+    def __init__(self, embeddings, keywords = None, models = None, keyword_scores_config = None):
+        self.embeddings = embeddings
+        self.keywords = keywords if keywords is not None else {}
+        self.models = models if models is not None else {model_name: None for model_name in embeddings}
+        self.data_change_handlers = []
+        self.columnar_index_config = {}
+        self.columnar_index = None
+        self.knn_graph_config = {}
+        self.keyword_scores_config = keyword_scores_config if keyword_scores_config is not None else {}
+        self.vector_indexes = {}
+        self.knn_graphs = {}
+        self.keyword_indexes = {}
+        self.keyword_scores = {}
+        self.reload_indexes()
+        self.indexes_loaded = True
+
+    def preload_models(self):
+        self.preloaded_models = {model_name: position for position, model_name in enumerate(self.embeddings)}
+        self.preloaded_models_dims = {model_name: np.shape(vectors)[1] for model_name, (_, vectors) in self.embeddings.items()}
+
+    def preload_vector_indexes(self):
+        for model_name, (recordIDs, vectors) in self.embeddings.items():
+            self.vector_indexes[model_name] = VectorIndex(model_name, recordIDs, vectors)
+
+    def preload_keyword_indexes(self):
+        for model_name, (keywords, vectors, langs) in self.keywords.items():
+            self.keyword_indexes[model_name] = KeywordIndex(model_name, keywords, vectors, langs=langs)
+
+    def preload_keywords(self):
+        self.preloaded_keywords = []
+
+    def preload_colors(self):
+        self.preloaded_colors = []
+
+    def preload_luminosities(self):
+        self.preloaded_luminosities = []
+
+    def preload_recordIDs(self):
+        self.preloaded_recordIDs = []
+
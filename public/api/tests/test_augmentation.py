@@ -0,0 +1,36 @@
+import unittest
+import numpy as np
+from engine.augmentation import draw_convex_pairs, greedy_unique_assignment
+
+class TestAugmentation(unittest.TestCase):
+    def test_greedy_unique_assignment(self):
+        scores = np.array([
+            [0.9, 0.8, 0.1],
+            [0.95, 0.2, 0.3],
+            [0.5, 0.6, 0.7],
+        ])
+        available = np.array([True, True, True])
+        # The first row takes 0, so the second one falls back to 2, and the third one to 1
+        self.assertEqual(greedy_unique_assignment(scores, available), [0, 2, 1])
+        self.assertFalse(available.any())
+
+    def test_greedy_unique_assignment_runs_out_of_candidates(self):
+        scores = np.ones((3, 2))
+        available = np.array([False, True])
+        self.assertEqual(greedy_unique_assignment(scores, available), [1])
+
+    def test_draw_convex_pairs_is_reproducible(self):
+        vectors = np.random.default_rng(0).normal(size=(6, 4))
+        pairs_1 = draw_convex_pairs(vectors, 5, 0.5, 0.5, 3, np.random.default_rng(42))
+        pairs_2 = draw_convex_pairs(vectors, 5, 0.5, 0.5, 3, np.random.default_rng(42))
+        self.assertEqual(pairs_1, pairs_2)
+        self.assertEqual(len(pairs_1), 5)
+
+    def test_draw_convex_pairs_respects_the_budget(self):
+        # Opposite vectors never pass the threshold, the patience forces a pair every 2 draws
+        vectors = np.array([[1.0, 0.0], [-1.0, 0.0]])
+        pairs = draw_convex_pairs(vectors, 10, 2.0, 1.0, 2, np.random.default_rng(0), max_iterations=4)
+        self.assertEqual(len(pairs), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+import threading
+import numpy as np
+from engine.batcher import MicroBatcher
+
+class FakeModel:
+    """Encodes a text as [len(text), number of texts in the batch]"""
+    def __init__(self):
+        self.batches = []
+
+    def get_model_name(self):
+        return "fake"
+
+    def encode_texts(self, texts):
+        self.batches.append(list(texts))
+        return np.array([[len(text), len(texts)] for text in texts], dtype=np.float32).reshape(-1, 2)
+
+class TestMicroBatcher(unittest.TestCase):
+    def test_results_are_split_per_request(self):
+        batcher = MicroBatcher(FakeModel(), window_ms=1)
+        try:
+            embeddings = batcher.encode_texts(["a", "abc"])
+            self.assertEqual(embeddings[:, 0].tolist(), [1, 3])
+            self.assertEqual(batcher.encode_text("ab")[0], 2)
+        finally:
+            batcher.close()
+
+    def test_concurrent_requests_are_coalesced(self):
+        model = FakeModel()
+        batcher = MicroBatcher(model, window_ms=200, max_batch_size=4)
+        results = {}
+
+        def encode(text):
+            results[text] = batcher.encode_text(text)
+
+        try:
+            threads = [threading.Thread(target=encode, args=("x" * i,)) for i in range(1, 5)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            batcher.close()
+
+        for i in range(1, 5):
+            self.assertEqual(results["x" * i][0], i)
+        self.assertLess(len(model.batches), 4)
+        self.assertEqual(batcher.get_stats()["texts"], 4)
+
+    def test_closed_batcher_and_timeout(self):
+        release = threading.Event()
+
+        class BlockingModel(FakeModel):
+            def encode_texts(self, texts):
+                release.wait(5)
+                return super().encode_texts(texts)
+
+        batcher = MicroBatcher(BlockingModel(), window_ms=1, timeout=0.05)
+        try:
+            with self.assertRaises(Exception) as context:
+                batcher.encode_text("a")
+            self.assertIn("No result", str(context.exception))
+        finally:
+            release.set()
+            batcher.close()
+
+        with self.assertRaises(Exception) as context:
+            batcher.encode_text("a")
+        self.assertEqual(str(context.exception), "MicroBatcher: Closed")
+
+if __name__ == '__main__':
+    unittest.main()
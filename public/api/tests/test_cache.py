@@ -0,0 +1,61 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from engine.cache import EmbeddingCache, encode_with_cache, get_file_fingerprint
+
+class TestEmbeddingCache(unittest.TestCase):
+    def test_lru_eviction_and_stats(self):
+        cache = EmbeddingCache(max_entries=2)
+        cache.put("model", "a", [1, 0])
+        cache.put("model", "b", [0, 1])
+        self.assertIsNotNone(cache.get("model", "a"))
+        cache.put("model", "c", [1, 1])
+        # "b" was the least recently used
+        self.assertIsNone(cache.get("model", "b"))
+        self.assertIsNotNone(cache.get("model", "c"))
+        stats = cache.get_stats()
+        self.assertEqual(stats["hits"], 2)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["evictions"], 1)
+
+    def test_keys_are_normalized_and_per_model(self):
+        cache = EmbeddingCache()
+        cache.put("model", "  Un   Portrait ", [1, 2])
+        np.testing.assert_array_equal(cache.get("model", "un portrait"), [1, 2])
+        self.assertIsNone(cache.get("other_model", "un portrait"))
+
+    def test_persistent_store(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "cache.sqlite3")
+            EmbeddingCache(path=path).put("model", "paysage", [0.5, 0.25])
+            cache = EmbeddingCache(path=path)
+            np.testing.assert_array_equal(cache.get("model", "paysage"), [0.5, 0.25])
+            self.assertEqual(cache.get_stats()["disk_hits"], 1)
+
+    def test_file_fingerprint_changes_with_the_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "weights.pt")
+            self.assertIsNone(get_file_fingerprint(path))
+            with open(path, "wb") as file:
+                file.write(b"old weights")
+            fingerprint = get_file_fingerprint(path)
+            with open(path, "wb") as file:
+                file.write(b"new weights!")
+            # Retrained weights: the embeddings cached under the previous fingerprint are not served
+            self.assertNotEqual(get_file_fingerprint(path), fingerprint)
+
+    def test_encode_with_cache_only_encodes_missing_texts(self):
+        cache = EmbeddingCache()
+        calls = []
+        def encode(texts):
+            calls.append(list(texts))
+            return np.array([[len(text)] for text in texts], dtype=np.float32)
+
+        encode_with_cache(cache, "model", ["ab", "abc"], encode)
+        embeddings = encode_with_cache(cache, "model", ["abc", "abcd", "ABCD"], encode)
+        self.assertEqual(embeddings[:, 0].tolist(), [3, 4, 4])
+        self.assertEqual(calls, [["ab", "abc"], ["abcd"]])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+from database.columnar import ColumnarIndex, UnsupportedConstraint
+
+def equal(key, value, **options):
+    return {"type": "EQUAL", "selectedColumn": {"key": key}, "equalTo": value, **options}
+
+class TestColumnarIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = ColumnarIndex(
+            [1, 2, 3, 4],
+            {
+                "title": ["Une femme", "Un homme", None, "La mer_100%"],
+                "creationEarliestDate": [1500, 1890, None, 1920],
+                "materials": [["huile", "toile"], ["toile"], None, []],
+                "GSD_value": ["mer", None, None, "Femme"],
+            }
+        )
+
+    def filter(self, constraints):
+        return self.index.filter(constraints).tolist()
+
+    def test_equal(self):
+        self.assertEqual(self.filter([equal("title", "FEMME")]), [1])
+        self.assertEqual(self.filter([equal("title", "FEMME", caseSensitive=True)]), [])
+        self.assertEqual(self.filter([equal("title", "un homme", exactMatch=True)]), [2])
+        # NOT of NULL is NULL: the artworks without title never match
+        self.assertEqual(self.filter([equal("title", "femme", isNot=True)]), [2, 4])
+        self.assertEqual(self.filter([equal("title", "femme", isNot=True, keepNull=True)]), [2, 3, 4])
+        # The LIKE wildcards of the input are kept, like in SQL
+        self.assertEqual(self.filter([equal("title", "r_1")]), [4])
+        self.assertEqual(self.filter([equal("creationEarliestDate", "1890", exactMatch=True)]), [2])
+
+    def test_lists(self):
+        self.assertEqual(self.filter([equal("materials", "toile", exactMatch=True, caseSensitive=True)]), [1, 2])
+        self.assertEqual(self.filter([equal("materials", "UIL")]), [1])
+        # NOT EXISTS is never NULL
+        self.assertEqual(self.filter([equal("materials", "huile", isNot=True)]), [2, 3, 4])
+        includes = {"type": "INCLUDES", "selectedColumn": {"key": "materials"}, "values": ["huile", "toile"]}
+        self.assertEqual(self.filter([includes]), [1, 2])
+        self.assertEqual(self.filter([dict(includes, exactMatch=True)]), [1])
+        with self.assertRaises(UnsupportedConstraint):
+            # LOWER(text[]) does not exist
+            self.filter([equal("materials", "toile", exactMatch=True)])
+
+    def test_between_and_includes(self):
+        between = {"type": "BETWEEN", "selectedColumn": {"key": "creationEarliestDate"}, "from": 1800, "to": 1900}
+        self.assertEqual(self.filter([between]), [2])
+        self.assertEqual(self.filter([dict(between, isNot=True)]), [1, 4])
+        self.assertEqual(self.filter([dict(between, isNot=True, keepNull=True)]), [1, 3, 4])
+        # Every term must be present, the first one is negated twice by the SQL path
+        includes = {"type": "INCLUDES", "selectedColumn": {"key": "title"}, "values": ["un", "femme"]}
+        self.assertEqual(self.filter([includes]), [1])
+        self.assertEqual(self.filter([dict(includes, isNot=True)]), [2])
+
+    def test_precedence_and_groups(self):
+        # AND binds before OR, as in the flat SQL condition
+        constraints = [
+            equal("title", "homme"), {"type": "OR"},
+            equal("title", "femme"), {"type": "AND"}, equal("GSD_value", "mer"),
+        ]
+        self.assertEqual(self.filter(constraints), [1, 2])
+        group = {"type": "GROUP", "children": [equal("title", "homme"), {"type": "OR"}, equal("title", "femme")]}
+        self.assertEqual(self.filter([group, {"type": "AND"}, equal("GSD_value", "mer")]), [1])
+        self.assertEqual(self.filter([dict(group, isNot=True)]), [4])
+        self.assertEqual(self.filter([]), [1, 2, 3, 4])
+
+    def test_unsupported(self):
+        for constraints in [
+            [equal("title", "a"), equal("title", "b")],
+            [{"type": "AND"}, equal("title", "a")],
+            [equal("creationEarliestDate", "18")],
+            [equal("title", 5, exactMatch=True)],
+            [equal("STF_values", "a")],
+            [{"type": "BETWEEN", "selectedColumn": {"key": "title"}, "from": "a", "to": "b"}],
+        ]:
+            with self.assertRaises(UnsupportedConstraint):
+                self.filter(constraints)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+import numpy as np
+from engine.knn_graph import KnnGraph
+from tests.in_memory_database import InMemoryDatabaseManager
+
+def search(db, query):
+    scores = db.get_vector_index("model").scores(np.asarray(query, dtype=np.float32))
+    return db.get_nearest_artworks_from_scores(None, [], "model", scores, 1, 2, is_subset=False)
+
+class TestDataChanges(unittest.TestCase):
+    def test_data_change_after_query_yields_fresh_results(self):
+        db = InMemoryDatabaseManager({"model": ([1, 2, 3], np.eye(3, dtype=np.float32))})
+        self.assertEqual(search(db, [1, 0, 0]), [1, 2])
+
+        # Artwork 4 is ingested, closest to the query
+        db.embeddings["model"] = ([1, 2, 3, 4], np.array([[0, 1, 0], [0, 0, 1], [0.5, 0.5, 0], [1, 0, 0]], dtype=np.float32))
+        seen_by_handler = []
+        db.data_change_handlers.append(lambda: seen_by_handler.append(search(db, [1, 0, 0])))
+        db.data_changed()
+
+        self.assertEqual(search(db, [1, 0, 0]), [4, 3])
+        # The handlers (e.g. the caches of the API) run after the reload
+        self.assertEqual(seen_by_handler, [[4, 3]])
+
+    def test_outdated_knn_graph_is_dropped(self):
+        db = InMemoryDatabaseManager({"model": ([1, 2, 3], np.eye(3, dtype=np.float32))})
+        knn_graph = KnnGraph.build(db.get_vector_index("model"), k=2)
+        db.knn_graphs["model"] = knn_graph
+
+        # Same embeddings: the graph is kept
+        db.data_changed()
+        self.assertIs(db.knn_graphs.get("model"), knn_graph)
+
+        db.embeddings["model"] = ([1, 2, 3, 4], np.eye(4, 3, dtype=np.float32))
+        db.data_changed()
+        self.assertNotIn("model", db.knn_graphs)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -13,9 +13,10 @@ class TestDatabaseManager(unittest.TestCase):
 
         cls.db = DatabaseManager(cls.config, cls.paths, {})
 
+        # Every table joined, as before the join pruning: the results must be the same
         cls.base_query = """
             SELECT
-            *
+            a.recordID
             FROM Artwork a
             JOIN Artist ar ON a.creatorID = ar.creatorID
             LEFT JOIN ConceptualTerms_Flat CFT ON a.recordID = CFT.recordID
@@ -27,9 +28,19 @@ class TestDatabaseManager(unittest.TestCase):
             LEFT JOIN IconographicInterpretation II ON a.recordID = II.recordID
             LEFT JOIN GeneralSubjectDescription GSD ON a.recordID = GSD.recordID
             LEFT JOIN SpecificSubjectIdentification SSI ON a.recordID = SSI.recordID
-            JOIN Embedding e ON a.recordID = e.recordID
+            JOIN Embedding e ON (a.recordID = e.recordID AND e.modelid = %s)
             WHERE 1=1
         """
+        with cls.db._connect() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT modelID FROM Model ORDER BY modelID LIMIT 1")
+                cls.model_id = cursor.fetchone()[0]
+
+    def get_titles(self, recordIDs):
+        with self.db._connect() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT title FROM Artwork WHERE recordID = ANY(%s)", (list(recordIDs),))
+                return [row[0] for row in cursor.fetchall()]
 
     def setUp(self):
         # We assume that test_db is already populated ! (a copy of the original db)
@@ -37,14 +48,16 @@ class TestDatabaseManager(unittest.TestCase):
 
     def test_apply_hard_constraints_empty(self):
         query, params = self.db.get_hard_query([])
-        self.assertEqual(query, self.base_query)
+        self.assertNotIn("JOIN Artist", query)
         self.assertEqual(params, [])
         # Execute the query and check that there are results !
         with self.db._connect() as conn:
             with conn.cursor() as cursor:
-                cursor.execute(query, params)
+                cursor.execute(query, [self.model_id] + params)
                 results = cursor.fetchall()
                 self.assertGreater(len(results), 0)
+                cursor.execute(self.base_query, [self.model_id])
+                self.assertEqual(sorted(results), sorted(cursor.fetchall()))
 
     def test_apply_hard_constraints_1D_mix(self):
         constraints = [
@@ -94,18 +107,18 @@ class TestDatabaseManager(unittest.TestCase):
         # Execute both queries and compare the results (compare the recordIDs)
         with self.db._connect() as conn:
             with conn.cursor() as cursor:
-                cursor.execute(expected_query, expected_params)
+                cursor.execute(expected_query, [self.model_id] + expected_params)
                 expected_results = cursor.fetchall()
                 expected_recordIDs = [row[0] for row in expected_results]
 
-                cursor.execute(generated_query, generated_params)
+                cursor.execute(generated_query, [self.model_id] + generated_params)
                 results = cursor.fetchall()
 
                 recordIDs = [row[0] for row in results]
 
                 self.assertGreaterEqual(len(results), 0)
                 self.assertEqual(len(expected_results), len(results))
-                self.assertEqual(expected_recordIDs, recordIDs)
+                self.assertEqual(sorted(expected_recordIDs), sorted(recordIDs))
 
     def test_apply_hard_constraints_1D_INCLUDES(self):
         constraints = [
@@ -133,19 +146,19 @@ class TestDatabaseManager(unittest.TestCase):
         # Execute both queries and compare the results (compare the recordIDs)
         with self.db._connect() as conn:
             with conn.cursor() as cursor:
-                cursor.execute(expected_query, expected_params)
+                cursor.execute(expected_query, [self.model_id] + expected_params)
                 expected_results = cursor.fetchall()
                 expected_recordIDs = [row[0] for row in expected_results]
 
-                cursor.execute(generated_query, generated_params)
+                cursor.execute(generated_query, [self.model_id] + generated_params)
                 results = cursor.fetchall()
                 recordIDs = [row[0] for row in results]
 
                 self.assertGreaterEqual(len(results), 0)
-                self.assertEqual(expected_recordIDs, recordIDs)
+                self.assertEqual(sorted(expected_recordIDs), sorted(recordIDs))
 
                 # Verify the results
-                titles = [row[4] for row in results]
+                titles = self.get_titles(recordIDs)
                 for title in titles:
                     title = title.lower()
                     self.assertIn("caravane", title)
@@ -205,19 +218,19 @@ class TestDatabaseManager(unittest.TestCase):
         # Execute both queries and compare the results (compare the recordIDs)
         with self.db._connect() as conn:
             with conn.cursor() as cursor:
-                cursor.execute(expected_query, expected_params)
+                cursor.execute(expected_query, [self.model_id] + expected_params)
                 expected_results = cursor.fetchall()
                 expected_recordIDs = [row[0] for row in expected_results]
 
-                cursor.execute(generated_query, generated_params)
+                cursor.execute(generated_query, [self.model_id] + generated_params)
                 results = cursor.fetchall()
                 recordIDs = [row[0] for row in results]
 
                 self.assertGreaterEqual(len(results), 0)
-                self.assertEqual(expected_recordIDs, recordIDs)
+                self.assertEqual(sorted(expected_recordIDs), sorted(recordIDs))
 
                 # Verify the results
-                titles = [row[4] for row in results]
+                titles = self.get_titles(recordIDs)
                 for title in titles:
                     title = title.lower()
                     first_equal_true = "un père" in title
@@ -225,6 +238,43 @@ class TestDatabaseManager(unittest.TestCase):
                     self.assertTrue(first_equal_true or second_equal_true)
 
 
+    def test_columnar_index_matches_the_database(self):
+        self.db.columnar_index_config = {"enabled": True}
+        self.db.preload_columnar_index()
+        constraints_list = [
+            [],
+            [{"type": "EQUAL", "selectedColumn": {"key": "title"}, "equalTo": "femme", "isNot": True, "keepNull": True}],
+            [
+                {"type": "BETWEEN", "selectedColumn": {"key": "creationEarliestDate"}, "from": 1500, "to": 1900},
+                {"type": "OR"},
+                {"type": "INCLUDES", "selectedColumn": {"key": "IFT_values"}, "values": ["femme", "homme"]},
+            ],
+            [
+                {"type": "EQUAL", "selectedColumn": {"key": "creatorNationality"}, "equalTo": "belge"},
+                {"type": "AND"},
+                {
+                    "type": "GROUP",
+                    "isNot": True,
+                    "children": [
+                        {"type": "EQUAL", "selectedColumn": {"key": "GSD_value"}, "equalTo": "mer"},
+                        {"type": "OR"},
+                        {"type": "INCLUDES", "selectedColumn": {"key": "title"}, "values": ["un", "la"], "isNot": True},
+                    ]
+                },
+            ],
+        ]
+        for constraints in constraints_list:
+            query, params = self.db.get_hard_query(constraints)
+            with self.db._connect() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(query, [self.model_id] + params)
+                    expected_recordIDs = {row[0] for row in cursor.fetchall()}
+                    cursor.execute("SELECT recordID FROM Embedding WHERE modelID = %s", (self.model_id,))
+                    embedded_recordIDs = {row[0] for row in cursor.fetchall()}
+            recordIDs = set(self.db.columnar_index.filter(constraints).tolist()) & embedded_recordIDs
+            self.assertEqual(recordIDs, expected_recordIDs)
+
+
 
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
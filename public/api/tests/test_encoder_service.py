@@ -0,0 +1,84 @@
+import os
+import tempfile
+import threading
+import unittest
+import numpy as np
+from engine.encoder_service import EncoderService, RemoteModel
+from engine.cache import EmbeddingCache
+
+class FakeModel:
+    """Encodes a text as [len(text), 1, 2]"""
+    def __init__(self):
+        self.calls = 0
+
+    def get_embedding_dim(self):
+        return 3
+
+    def encode_texts(self, texts):
+        self.calls += 1
+        return np.array([[len(text), 1, 2] for text in texts], dtype=np.float32).reshape(-1, 3)
+
+class TestEncoderService(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.directory.name, "encoder.sock")
+        self.model = FakeModel()
+        self.service = EncoderService({"fake": self.model}, self.socket_path)
+        self.service.start()
+
+    def tearDown(self):
+        self.service.close()
+        self.directory.cleanup()
+
+    def test_remote_model_returns_the_embeddings(self):
+        remote = RemoteModel("fake", self.socket_path)
+        try:
+            embeddings = remote.encode_texts(["a", "abc"])
+            self.assertEqual(embeddings.dtype, np.float32)
+            self.assertEqual(embeddings.tolist(), [[1, 1, 2], [3, 1, 2]])
+            self.assertEqual(remote.encode_text("ab").tolist(), [2, 1, 2])
+            self.assertEqual(remote.get_embedding_dim(), 3)
+            self.assertEqual(self.service.get_stats()["texts"], 3)
+        finally:
+            remote.close()
+
+    def test_errors_are_raised_by_the_client(self):
+        remote = RemoteModel("unknown", self.socket_path)
+        try:
+            with self.assertRaises(Exception):
+                remote.encode_text("a")
+        finally:
+            remote.close()
+
+    def test_concurrent_clients_and_reconnection(self):
+        remote = RemoteModel("fake", self.socket_path)
+        results = {}
+
+        def encode(text):
+            results[text] = remote.encode_text(text)[0]
+
+        try:
+            threads = [threading.Thread(target=encode, args=("x" * i,)) for i in range(1, 6)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(5)
+            self.assertEqual(results, {"x" * i: i for i in range(1, 6)})
+
+            # The connections are closed, the next request reconnects
+            remote.close()
+            self.assertEqual(remote.encode_text("abcd")[0], 4)
+        finally:
+            remote.close()
+
+    def test_cached_texts_are_not_sent(self):
+        remote = RemoteModel("fake", self.socket_path, cache=EmbeddingCache())
+        try:
+            remote.encode_texts(["a", "b"])
+            remote.encode_texts(["A", "b "])
+            self.assertEqual(self.model.calls, 1)
+        finally:
+            remote.close()
+
+if __name__ == '__main__':
+    unittest.main()
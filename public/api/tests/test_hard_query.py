@@ -0,0 +1,80 @@
+import unittest
+from database.hard_query import build_hard_query, compile_hard_constraints
+
+def normalize(query):
+    return " ".join(query.split())
+
+class TestHardQuery(unittest.TestCase):
+    def test_empty(self):
+        query, params = build_hard_query([])
+        self.assertEqual(
+            normalize(query),
+            "SELECT a.recordID FROM Artwork a "
+            "JOIN Embedding e ON (a.recordID = e.recordID AND e.modelid = %s) "
+            "WHERE a.creatorID IS NOT NULL"
+        )
+        self.assertEqual(params, [])
+
+    def test_artwork_columns_need_no_join(self):
+        constraints = [
+            {"type": "EQUAL", "selectedColumn": {"key": "title"}, "equalTo": "un", "exactMatch": False},
+            {"type": "AND"},
+            {
+                "type": "BETWEEN",
+                "selectedColumn": {"key": "creationEarliestDate"},
+                "from": 1500,
+                "to": 2000,
+                "isNot": True,
+            },
+        ]
+        query, params = build_hard_query(constraints)
+        self.assertEqual(
+            normalize(query),
+            "SELECT a.recordID FROM Artwork a "
+            "JOIN Embedding e ON (a.recordID = e.recordID AND e.modelid = %s) "
+            "WHERE a.creatorID IS NOT NULL "
+            "AND ( LOWER(a.title) LIKE LOWER(%s) AND NOT (a.creationEarliestDate BETWEEN %s AND %s) )"
+        )
+        self.assertEqual(params, ["%un%", 1500, 2000])
+
+    def test_only_the_used_tables_are_joined(self):
+        constraints = [
+            {"type": "INCLUDES", "selectedColumn": {"key": "IFT_values"}, "values": ["femme", "homme"]},
+            {"type": "OR"},
+            {
+                "type": "GROUP",
+                "children": [
+                    {"type": "EQUAL", "selectedColumn": {"key": "creatorLastName"}, "equalTo": "Ensor", "exactMatch": True},
+                    {"type": "AND"},
+                    {"type": "EQUAL", "selectedColumn": {"key": "GSD_value"}, "equalTo": "mer", "keepNull": True},
+                ]
+            },
+        ]
+        conditions, params, aliases = compile_hard_constraints(constraints)
+        self.assertEqual(aliases, {"IFT", "ar", "GSD"})
+        self.assertEqual(params, [["femme", "homme"], "Ensor", "%mer%"])
+
+        query, _ = build_hard_query(constraints)
+        self.assertEqual(
+            normalize(query),
+            "SELECT a.recordID FROM Artwork a "
+            "JOIN Artist ar ON a.creatorID = ar.creatorID "
+            "LEFT JOIN IconographicTerms_Flat IFT ON a.recordID = IFT.recordID "
+            "LEFT JOIN GeneralSubjectDescription GSD ON a.recordID = GSD.recordID "
+            "JOIN Embedding e ON (a.recordID = e.recordID AND e.modelid = %s) "
+            "WHERE 1=1 "
+            "AND ( IFT.values && %s OR ( LOWER(ar.creatorLastName) = LOWER(%s) AND "
+            "LOWER(GSD.value) LIKE LOWER(%s) OR GSD.value IS NULL ) )"
+        )
+
+    def test_unsupported_constraints_are_ignored(self):
+        constraints = [
+            {"type": "BETWEEN", "selectedColumn": {"key": "materials"}, "from": "a", "to": "b"},
+            {"type": "EQUAL", "selectedColumn": {"key": "unknown"}, "equalTo": "x"},
+        ]
+        query, params = build_hard_query(constraints)
+        self.assertEqual(query, build_hard_query([])[0])
+        self.assertEqual(params, [])
+
+if __name__ == '__main__':
+    unittest.main()
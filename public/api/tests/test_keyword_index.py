@@ -0,0 +1,40 @@
+import unittest
+import numpy as np
+from engine.keyword_index import KeywordIndex, normalize_keyword
+
+class TestKeywordIndex(unittest.TestCase):
+    def test_normalize_keyword(self):
+        self.assertEqual(normalize_keyword("  Été   Bleu "), "ete bleu")
+        self.assertEqual(normalize_keyword("STRASSE"), normalize_keyword("straße"))
+        self.assertEqual(normalize_keyword("Ñandú"), "nandu")
+
+    def test_lookups_are_case_and_accent_insensitive(self):
+        index = KeywordIndex("model", ["Été", "rouge", "BLUE", "Blue"], np.eye(4))
+
+        # "Blue" is case-folded like "BLUE", the first one is kept
+        self.assertEqual(len(index), 3)
+        self.assertEqual(index.get("ETE").tolist(), [1, 0, 0, 0])
+        self.assertEqual(index.get("Rouge").tolist(), [0, 1, 0, 0])
+        self.assertEqual(index.get("blue").tolist(), [0, 0, 1, 0])
+        self.assertIn("été", index)
+        self.assertIsNone(index.get("green"))
+        self.assertEqual(index.matrix.dtype, np.float32)
+        self.assertFalse(index.matrix.flags.writeable)
+
+    def test_keywords_differing_by_accents_are_distinct(self):
+        index = KeywordIndex("model", ["marché", "Marche", "pêche", "pèche"], np.eye(4))
+        self.assertEqual(len(index), 4)
+        self.assertEqual(index.get("marche").tolist(), [0, 1, 0, 0])
+        self.assertEqual(index.get("MARCHÉ").tolist(), [1, 0, 0, 0])
+        self.assertEqual(index.get("pèche").tolist(), [0, 0, 0, 1])
+        self.assertEqual(index.get("pêche").tolist(), [0, 0, 1, 0])
+        # Without an exact match, the first keyword without accents is used
+        self.assertEqual(index.get("peche").tolist(), [0, 0, 1, 0])
+        self.assertEqual(index.get("marchè").tolist(), [1, 0, 0, 0])
+
+    def test_invalid_vectors(self):
+        with self.assertRaises(Exception):
+            KeywordIndex("model", ["a", "b"], np.eye(3))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+import numpy as np
+from engine.keyword_index import KeywordIndex
+from engine.keyword_scores import KeywordScores
+from engine.vector_index import VectorIndex
+
+class TestKeywordScores(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.vector_index = VectorIndex("model", list(range(20)), rng.normal(size=(20, 8)))
+        self.keyword_index = KeywordIndex(
+            "model",
+            ["red", "blue", "rouge", "dark"],
+            rng.normal(size=(4, 8)),
+            langs=["en", "en", "fr", "en"]
+        )
+
+    def test_scores_match_the_weighted_query(self):
+        keyword_scores = KeywordScores(self.keyword_index, self.vector_index, dtype=np.float32)
+        self.assertEqual(sorted(keyword_scores.matrices.keys()), ["en", "fr"])
+        self.assertEqual(keyword_scores.matrices["en"].shape, (3, 20))
+
+        rows = [self.keyword_index.get_row("Red"), self.keyword_index.get_row("rouge")]
+        weights = np.array([1.0, -0.5], dtype=np.float32)
+        expected = self.vector_index.scores(weights @ self.keyword_index.matrix[rows])
+        np.testing.assert_allclose(keyword_scores.combine(rows, weights), expected, rtol=1e-5, atol=1e-6)
+
+    def test_languages_and_precision(self):
+        self.assertEqual(KeywordScores(self.keyword_index, self.vector_index).matrices["fr"].dtype, np.float32)
+        keyword_scores = KeywordScores(self.keyword_index, self.vector_index, langs=["fr"], dtype=np.float16)
+        self.assertEqual(keyword_scores.matrices["fr"].dtype, np.float16)
+        self.assertIn(self.keyword_index.get_row("rouge"), keyword_scores)
+        self.assertNotIn(self.keyword_index.get_row("red"), keyword_scores)
+        row = self.keyword_index.get_row("rouge")
+        np.testing.assert_allclose(
+            keyword_scores.get_scores(row),
+            self.vector_index.scores(self.keyword_index.matrix[row]),
+            atol=1e-2
+        )
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from engine.knn_graph import KnnGraph, compute_knn_graph
+from engine.vector_index import VectorIndex
+
+class TestKnnGraph(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.index = VectorIndex("model", list(range(100, 130)), rng.normal(size=(30, 8)))
+
+    def test_blocks_match_a_single_block(self):
+        neighbours, scores = compute_knn_graph(self.index.matrix, 5, block_size=7)
+        expected_neighbours, expected_scores = compute_knn_graph(self.index.matrix, 5, block_size=1000)
+        np.testing.assert_array_equal(neighbours, expected_neighbours)
+        np.testing.assert_allclose(scores, expected_scores, rtol=1e-5)
+        self.assertFalse((neighbours == np.arange(30)[:, None]).any())
+
+    def test_neighbours_match_the_vector_index(self):
+        knn_graph = KnnGraph.build(self.index, k=6, block_size=4)
+        for recordID in [100, 117, 129]:
+            expected = self.index.search(self.index.get_vector(recordID), 6, exclude=[recordID])
+            results = knn_graph.get_neighbours(recordID, 0, 6)
+            self.assertEqual([resultRecordID for resultRecordID, _ in results], [resultRecordID for resultRecordID, _ in expected])
+            np.testing.assert_allclose([score for _, score in results], [score for _, score in expected], rtol=1e-5)
+
+    def test_pages_within_k(self):
+        knn_graph = KnnGraph.build(self.index, k=6)
+        full = knn_graph.get_neighbours(110, 0, 6)
+        self.assertEqual(knn_graph.get_neighbours(110, 2, 2), full[2:4])
+        # Beyond k: computed live
+        self.assertIsNone(knn_graph.get_neighbours(110, 4, 4))
+        self.assertIsNone(knn_graph.get_neighbours(999, 0, 2))
+
+        with_original = knn_graph.get_neighbours(110, 0, 3, keep_original_record=True)
+        self.assertEqual(with_original[0], (110, 1.0))
+        self.assertEqual(with_original[1:], full[:2])
+        self.assertEqual(knn_graph.get_neighbours(110, 3, 4, keep_original_record=True), full[2:6])
+
+    def test_complete_graph_answers_every_page(self):
+        knn_graph = KnnGraph.build(self.index, k=1000)
+        self.assertEqual(knn_graph.k, 29)
+        self.assertEqual(knn_graph.get_neighbours(110, 25, 10)[-1], knn_graph.get_neighbours(110, 0, 29)[-1])
+        self.assertEqual(knn_graph.get_neighbours(110, 40, 10), [])
+
+    def test_save_and_load(self):
+        knn_graph = KnnGraph.build(self.index, k=4)
+        with tempfile.TemporaryDirectory() as folder:
+            self.assertIsNone(KnnGraph.load(folder, "model"))
+            knn_graph.save(folder)
+            loaded = KnnGraph.load(folder, "model")
+            np.testing.assert_array_equal(loaded.neighbours, knn_graph.neighbours)
+            np.testing.assert_array_equal(loaded.recordIDs, self.index.recordIDs)
+            self.assertEqual(loaded.get_neighbours(120, 0, 4), knn_graph.get_neighbours(120, 0, 4))
+            self.assertTrue(loaded.matches(self.index))
+            del loaded
+
+    def test_graph_of_other_embeddings_is_refused(self):
+        knn_graph = KnnGraph.build(self.index, k=4)
+        # Same recordIDs, new weights of the model
+        rng = np.random.default_rng(1)
+        reembedded = VectorIndex("model", list(range(100, 130)), rng.normal(size=(30, 8)))
+        self.assertFalse(knn_graph.matches(reembedded))
+        self.assertFalse(knn_graph.matches(None))
+
+        with tempfile.TemporaryDirectory() as folder:
+            knn_graph.save(folder)
+            # Without its metadata, the graph cannot be validated
+            os.remove(os.path.join(folder, "model.json"))
+            loaded = KnnGraph.load(folder, "model")
+            self.assertFalse(loaded.matches(self.index))
+            del loaded
+
+if __name__ == '__main__':
+    unittest.main()
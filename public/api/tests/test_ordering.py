@@ -0,0 +1,32 @@
+import unittest
+import itertools
+import numpy as np
+from engine.ordering import distance_matrix, order_by_similarity, path_length, solve_exact
+
+class TestOrdering(unittest.TestCase):
+    def test_exact_solver_matches_brute_force(self):
+        rng = np.random.default_rng(0)
+        for n in [3, 5, 7]:
+            distances = distance_matrix(rng.normal(size=(n, 4)))
+            best = min(itertools.permutations(range(n)), key=lambda path: path_length(path, distances))
+            path = solve_exact(distances)
+            self.assertEqual(sorted(path), list(range(n)))
+            self.assertAlmostEqual(path_length(path, distances), path_length(best, distances))
+
+    def test_order_is_a_permutation(self):
+        vectors = np.random.default_rng(1).normal(size=(200, 16))
+        path = order_by_similarity(vectors, time_budget=0.2)
+        self.assertEqual(sorted(path), list(range(200)))
+
+    def test_order_follows_a_line(self):
+        # Points on an arc: the best order is the order along the arc
+        angles = np.random.default_rng(2).permutation(np.linspace(0, np.pi / 2, 50))
+        vectors = np.stack([np.cos(angles), np.sin(angles)], axis=1)
+        path = order_by_similarity(vectors, time_budget=0.2)
+        ordered_angles = angles[path]
+        self.assertTrue(
+            np.all(np.diff(ordered_angles) > 0) or np.all(np.diff(ordered_angles) < 0)
+        )
+
+if __name__ == '__main__':
+    unittest.main()
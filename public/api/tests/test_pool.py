@@ -0,0 +1,155 @@
+import unittest
+import threading
+import time
+import psycopg2
+from psycopg2 import extensions
+from database.pool import ConnectionPool, PoolTimeout
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def execute(self, query):
+        self.connection.pings += 1
+        if self.connection.broken:
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+        self.broken = False
+        self.pings = 0
+        self.rollbacks = 0
+
+    def get_transaction_status(self):
+        return self.status
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        if self.broken:
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+        self.rollbacks += 1
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+
+    def commit(self):
+        pass
+
+    def close(self):
+        self.closed = 1
+
+class FakePool(ConnectionPool):
+    def _new_connection(self):
+        return FakeConnection()
+
+class TestConnectionPool(unittest.TestCase):
+    def test_connections_are_reused(self):
+        pool = FakePool({}, min_size=1, max_size=2)
+        connection = pool.getconn()
+        pool.putconn(connection)
+        self.assertIs(pool.getconn(), connection)
+        stats = pool.get_stats()
+        self.assertEqual(stats["checkouts"], 2)
+        self.assertEqual(stats["connections_created"], 1)
+        self.assertEqual(stats["in_use"], 1)
+        self.assertEqual(stats["idle"], 0)
+
+    def test_borrowers_wait_when_max_size_is_reached(self):
+        pool = FakePool({}, min_size=0, max_size=1, timeout=5)
+        connection = pool.getconn()
+        borrowed = []
+        waiter = threading.Thread(target=lambda: borrowed.append(pool.getconn()))
+        waiter.start()
+        while pool.get_stats()["waits"] == 0:
+            time.sleep(0.001)
+        pool.putconn(connection)
+        waiter.join(5)
+
+        self.assertEqual(borrowed, [connection])
+        stats = pool.get_stats()
+        self.assertEqual(stats["waits"], 1)
+        self.assertGreater(stats["wait_time"], 0)
+        self.assertEqual(stats["size"], 1)
+
+    def test_checkout_timeout(self):
+        pool = FakePool({}, min_size=0, max_size=1, timeout=0.05)
+        pool.getconn()
+        with self.assertRaises(PoolTimeout):
+            pool.getconn()
+        self.assertEqual(pool.get_stats()["timeouts"], 1)
+
+    def test_broken_and_non_idle_connections_are_discarded(self):
+        pool = FakePool({}, min_size=2, max_size=2, health_check_interval=0)
+        broken, non_idle = list(connection for connection, _ in pool._idle)
+        broken.broken = True
+        non_idle.status = extensions.TRANSACTION_STATUS_INERROR
+
+        connection = pool.getconn()
+        self.assertNotIn(connection, [broken, non_idle])
+        self.assertTrue(broken.closed and non_idle.closed)
+        stats = pool.get_stats()
+        self.assertEqual(stats["health_checks_failed"], 2)
+        self.assertEqual(stats["connections_discarded"], 2)
+        self.assertEqual(stats["size"], 1)
+
+        # Returned in a transaction: rolled back, or discarded if the rollback fails
+        connection.status = extensions.TRANSACTION_STATUS_INTRANS
+        pool.putconn(connection)
+        self.assertEqual(connection.rollbacks, 1)
+        self.assertEqual(pool.get_stats()["idle"], 1)
+        connection = pool.getconn()
+        connection.status = extensions.TRANSACTION_STATUS_INTRANS
+        connection.broken = True
+        pool.putconn(connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.get_stats()["size"], 0)
+
+    def test_health_check_runs_without_the_lock(self):
+        pool = FakePool({}, min_size=1, max_size=2, health_check_interval=0)
+        slow = pool._idle[0][0]
+        checking = threading.Event()
+        release = threading.Event()
+
+        def slow_execute(query):
+            checking.set()
+            release.wait(5)
+        slow.cursor = lambda: type("SlowCursor", (FakeCursor,), {"execute": lambda self, query: slow_execute(query)})(slow)
+
+        borrowed = []
+        borrower = threading.Thread(target=lambda: borrowed.append(pool.getconn()))
+        borrower.start()
+        checking.wait(5)
+        # Another borrower is not blocked by the health check in progress
+        start = time.monotonic()
+        other = pool.getconn()
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertIsNot(other, slow)
+        release.set()
+        borrower.join(5)
+        self.assertEqual(borrowed, [slow])
+
+    def test_putconn_after_close(self):
+        pool = FakePool({}, min_size=1, max_size=2)
+        connection = pool.getconn()
+        idle = pool.getconn()
+        pool.putconn(idle)
+        pool.close()
+        self.assertTrue(idle.closed)
+        pool.putconn(connection)
+        self.assertTrue(connection.closed)
+        stats = pool.get_stats()
+        self.assertEqual(stats["size"], 0)
+        self.assertEqual(stats["idle"], 0)
+        with self.assertRaises(Exception):
+            pool.getconn()
+
+if __name__ == '__main__':
+    unittest.main()
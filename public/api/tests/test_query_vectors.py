@@ -0,0 +1,53 @@
+import unittest
+import numpy as np
+from engine.registry import ModelRegistry
+from tests.in_memory_database import InMemoryDatabaseManager
+
+def failing_loader(model_name):
+    raise Exception("The text encoder must not be loaded")
+
+class TestQueryVectors(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.db = InMemoryDatabaseManager(
+            {"model": (list(range(1, 21)), rng.normal(size=(20, 8)))},
+            keywords={"model": (["red", "blue", "dark"], rng.normal(size=(3, 8)), ["en", "en", "en"])},
+            models=ModelRegistry(["model"], failing_loader),
+            keyword_scores_config={"enabled": True, "dtype": "float32"}
+        )
+
+    def rank(self, soft_constraints):
+        return self.db.rank_query([], soft_constraints, 1, 5, "model", "classic", 0, 1.0)
+
+    def test_palette_query_does_not_load_the_text_encoder(self):
+        ranking = self.rank([
+            {"type": "COLOR", "color": "red", "weight": 1},
+            {"type": "LUMINOSITY", "luminosity": "dark", "weight": 0.5},
+        ])
+        self.assertEqual(len(ranking), 5)
+        self.assertFalse(self.db.models.is_loaded("model"))
+
+        # The terms still need it
+        with self.assertRaises(Exception):
+            self.rank([{"type": "TERM", "term": "a painting", "weight": 1}])
+
+    def test_composed_scores_rank_like_the_query_embedding(self):
+        soft_constraints = [
+            {"type": "KEYWORD", "keyword": "red", "weight": 1},
+            {"type": "COLOR", "color": "blue", "weight": -0.3},
+            {"type": "PRECOMPUTED", "recordID": 3, "weight": 0.5},
+        ]
+        for version in ["classic", "power"]:
+            embeddings, weights, keyword_rows, keyword_weights = self.db.get_query_vectors(
+                soft_constraints, "model", version, keyword_scores=self.db.keyword_scores["model"]
+            )
+            self.assertEqual(len(keyword_rows), 2)
+            composed = self.db.compose_query_scores(embeddings, weights, keyword_rows, keyword_weights, "model", version)
+
+            all_embeddings, all_weights, _, _ = self.db.get_query_vectors(soft_constraints, "model", version)
+            vector_index = self.db.get_vector_index("model")
+            exact = vector_index.scores(self.db.combine_query_vectors(all_embeddings, all_weights, version))
+            self.assertEqual(vector_index.top_k(composed, 10).tolist(), vector_index.top_k(exact, 10).tolist())
+
+if __name__ == '__main__':
+    unittest.main()
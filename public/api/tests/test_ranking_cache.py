@@ -0,0 +1,93 @@
+import unittest
+import numpy as np
+from engine.knn_graph import KnnGraph
+from engine.ranking_cache import RankingCache
+from engine.vector_index import VectorIndex
+from engine.ttl_cache import TTLCache, canonical_key
+
+class TestTTLCache(unittest.TestCase):
+    def test_canonical_key(self):
+        self.assertEqual(canonical_key({"a": 1, "b": [1, 2]}), canonical_key({"b": [1, 2], "a": 1}))
+        self.assertNotEqual(canonical_key({"a": 1}), canonical_key({"a": 2}))
+
+    def test_expiration_and_eviction(self):
+        now = [0.0]
+        cache = TTLCache(max_entries=2, ttl=10, clock=lambda: now[0])
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        # "b" is the least recently used
+        cache.put("c", 3)
+        self.assertIsNone(cache.get("b"))
+        now[0] = 10
+        self.assertIsNone(cache.get("a"))
+        stats = cache.get_stats()
+        self.assertEqual(stats["evictions"], 1)
+        self.assertEqual(stats["expirations"], 1)
+        self.assertEqual(stats["hits"], 1)
+
+    def test_size_budget(self):
+        cache = TTLCache(max_size=10, sizeof=len)
+        cache.put("a", "x" * 6)
+        cache.put("b", "x" * 6)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get_stats()["size"], 6)
+        # Larger than the whole budget: not stored
+        cache.put("c", "x" * 11)
+        self.assertIsNone(cache.get("c"))
+
+    def test_clear(self):
+        cache = TTLCache()
+        cache.put("a", 1)
+        cache.clear()
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get_stats()["invalidations"], 1)
+
+class TestRankingCache(unittest.TestCase):
+    def test_pages_of_a_cursor(self):
+        cache = RankingCache(depth=10)
+        cursor = cache.put("query", {"recordID": list(range(10))})
+        ranking = cache.get(cursor, "query")
+        self.assertEqual(cache.get_page(ranking, 2, 4)["recordID"], [4, 5, 6, 7])
+        # Beyond the depth: computed live
+        self.assertIsNone(cache.get_page(ranking, 3, 4))
+        self.assertFalse(cache.covers(3, 4))
+        # A cursor only answers its own query
+        self.assertIsNone(cache.get(cursor, "other query"))
+        self.assertIsNone(cache.get("unknown", "query"))
+
+    def test_short_ranking_is_complete(self):
+        cache = RankingCache(depth=10)
+        ranking = cache.get(cache.put("query", {"recordID": [1, 2, 3]}), "query")
+        self.assertEqual(cache.get_page(ranking, 1, 2)["recordID"], [1, 2])
+        self.assertEqual(cache.get_page(ranking, 3, 2)["recordID"], [])
+
+    def test_ranking_created_without_cursor(self):
+        # A ranking computed before a data change is served once but not stored
+        cache = RankingCache(depth=10)
+        ranking = cache.create({"recordID": list(range(10))}, depth=5)
+        self.assertEqual(cache.get_page(ranking, 1, 5)["recordID"], [0, 1, 2, 3, 4])
+        self.assertIsNone(cache.get_page(ranking, 2, 5))
+        self.assertEqual(cache.get_stats()["entries"], 0)
+        cursor = cache.put("query", ranking)
+        self.assertIs(cache.get(cursor, "query"), ranking)
+
+    def test_first_similar_page_is_served_by_the_graph(self):
+        rng = np.random.default_rng(0)
+        vector_index = VectorIndex("model", list(range(100, 130)), rng.normal(size=(30, 8)))
+        knn_graph = KnnGraph.build(vector_index, k=6)
+        cache = RankingCache(depth=1000)
+
+        # The depth of the cache is beyond k: the ranking is capped to the neighbours of the graph
+        results, depth = knn_graph.get_ranking(110, 1, 4, cache.depth, keep_original_record=True)
+        self.assertEqual(depth, 7)
+        self.assertEqual(results, knn_graph.get_neighbours(110, 0, 7, keep_original_record=True))
+        recordIDs = [recordID for recordID, _ in results]
+        ranking = cache.get(cache.put("similar", {"recordID": recordIDs}, depth=depth), "similar")
+        self.assertEqual(cache.get_page(ranking, 1, 4)["recordID"], recordIDs[:4])
+        # The next pages beyond k need a deeper ranking
+        self.assertIsNone(cache.get_page(ranking, 2, 4))
+        self.assertIsNone(knn_graph.get_ranking(110, 2, 4, cache.depth, keep_original_record=True))
+
+if __name__ == '__main__':
+    unittest.main()
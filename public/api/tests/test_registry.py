@@ -0,0 +1,117 @@
+import unittest
+import threading
+from engine.registry import ModelRegistry
+
+class FakeModel:
+    def __init__(self, model_name, size):
+        self.model_name = model_name
+        self.size = size
+        self.closed = False
+
+    def get_memory_size(self):
+        return self.size
+
+    def close(self):
+        self.closed = True
+
+class TestModelRegistry(unittest.TestCase):
+    def test_models_are_loaded_once_on_first_use(self):
+        loads = []
+
+        def loader(model_name):
+            loads.append(model_name)
+            return FakeModel(model_name, 1)
+
+        registry = ModelRegistry(["a", "b"], loader)
+        self.assertIn("a", registry)
+        self.assertNotIn("c", registry)
+        self.assertEqual(list(registry), ["a", "b"])
+        self.assertEqual(loads, [])
+
+        self.assertIs(registry["a"], registry["a"])
+        self.assertEqual(loads, ["a"])
+        self.assertFalse(registry.is_loaded("b"))
+        with self.assertRaises(KeyError):
+            registry["c"]
+
+    def test_requests_wait_for_a_loading_model(self):
+        release = threading.Event()
+        loads = []
+
+        def loader(model_name):
+            loads.append(model_name)
+            release.wait(5)
+            return FakeModel(model_name, 1)
+
+        registry = ModelRegistry(["a"], loader)
+        registry.preload(background=True)
+        results = []
+        waiter = threading.Thread(target=lambda: results.append(registry["a"]))
+        waiter.start()
+        release.set()
+        waiter.join(5)
+
+        self.assertEqual(len(results), 1)
+        self.assertIs(results[0], registry["a"])
+        self.assertEqual(loads, ["a"])
+
+    def test_failed_loads_are_retried(self):
+        attempts = []
+
+        def loader(model_name):
+            attempts.append(model_name)
+            if len(attempts) == 1:
+                raise Exception("Loader: failure")
+            return FakeModel(model_name, 1)
+
+        registry = ModelRegistry(["a"], loader)
+        with self.assertRaises(Exception):
+            registry["a"]
+        self.assertEqual(registry["a"].model_name, "a")
+        self.assertEqual(registry.get_stats()["load_failures"], 1)
+
+    def test_idle_models_are_evicted_under_the_memory_budget(self):
+        registry = ModelRegistry(
+            ["a", "b", "c"],
+            lambda model_name: FakeModel(model_name, 10),
+            idle_timeout=100,
+            memory_budget=15,
+            pinned=["c"],
+            eviction_interval=3600
+        )
+        a = registry["a"]
+        registry["b"]
+        registry["c"]
+
+        # Nothing is idle yet
+        self.assertEqual(registry.evict_idle(), [])
+
+        # a is the least recently used, evicting it is not enough for the budget, c is pinned
+        now = registry._last_used["c"] + 1000
+        self.assertEqual(registry.evict_idle(now=now), ["a", "b"])
+        self.assertTrue(a.closed)
+        self.assertFalse(registry.is_loaded("a"))
+        self.assertTrue(registry.is_loaded("c"))
+
+        # An evicted model is loaded again on next use
+        self.assertIsNot(registry["a"], a)
+        registry.close()
+
+    def test_models_used_since_the_idle_check_are_kept(self):
+        registry = ModelRegistry(["a"], lambda model_name: FakeModel(model_name, 10), idle_timeout=100, eviction_interval=3600)
+        a = registry["a"]
+        last_used = registry._last_used["a"]
+
+        # Used between the idle check and the eviction
+        registry["a"]
+        registry._last_used["a"] = last_used + 1
+        self.assertFalse(registry.evict("a", last_used=last_used))
+        self.assertFalse(a.closed)
+        self.assertTrue(registry.is_loaded("a"))
+
+        self.assertTrue(registry.evict("a", last_used=last_used + 1))
+        self.assertTrue(a.closed)
+        registry.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import unittest
+import threading
+import time
+from engine.singleflight import SingleFlight
+
+class TestSingleFlight(unittest.TestCase):
+    def start_leader(self, flight, key, function, errors = None):
+        results = []
+        if errors is None:
+            target = lambda: results.append(flight.do(key, function))
+        else:
+            target = lambda: self.collect_error(flight, errors, function)
+        leader = threading.Thread(target=target)
+        leader.start()
+        # Wait for the leader to be in flight
+        while flight.get_stats()["in_flight"] == 0:
+            time.sleep(0.001)
+        return leader, results
+
+    def test_concurrent_calls_share_the_result(self):
+        flight = SingleFlight()
+        release = threading.Event()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            release.wait(5)
+            return ["result"]
+
+        leader, results = self.start_leader(flight, "key", compute)
+        waiters = [threading.Thread(target=lambda: results.append(flight.do("key", compute))) for _ in range(3)]
+        for waiter in waiters:
+            waiter.start()
+        while flight.get_stats()["coalesced"] < 3:
+            time.sleep(0.001)
+        release.set()
+        for thread in [leader] + waiters:
+            thread.join(5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(results), 4)
+        self.assertTrue(all(result is results[0] for result in results))
+        stats = flight.get_stats()
+        self.assertEqual(stats["in_flight"], 0)
+        self.assertEqual(stats["calls"], 4)
+        # Once done, the next call computes again
+        self.assertEqual(flight.do("key", lambda: "again"), "again")
+
+    def test_errors_and_bounded_wait(self):
+        flight = SingleFlight(timeout=0.05)
+        release = threading.Event()
+
+        def failing():
+            release.wait(5)
+            raise Exception("Failure")
+
+        errors = []
+        leader, _ = self.start_leader(flight, "key", failing, errors=errors)
+        # Gives up waiting and computes on its own
+        self.assertEqual(flight.do("key", lambda: "own"), "own")
+        self.assertEqual(flight.get_stats()["timeouts"], 1)
+
+        waiter = threading.Thread(target=lambda: self.collect_error(flight, errors, lambda: "unused"))
+        flight.timeout = 5
+        waiter.start()
+        while flight.get_stats()["coalesced"] < 2:
+            time.sleep(0.001)
+        release.set()
+        leader.join(5)
+        waiter.join(5)
+        self.assertEqual(errors, ["Failure", "Failure"])
+        self.assertEqual(flight.get_stats()["errors"], 1)
+
+    def test_interrupted_leader_releases_the_waiters(self):
+        flight = SingleFlight(timeout=5)
+        release = threading.Event()
+
+        class Interrupted(BaseException):
+            pass
+
+        def interrupted():
+            release.wait(5)
+            raise Interrupted()
+
+        interruptions = []
+
+        def lead():
+            try:
+                flight.do("key", interrupted)
+            except Interrupted:
+                interruptions.append(1)
+
+        leader = threading.Thread(target=lead)
+        leader.start()
+        while flight.get_stats()["in_flight"] == 0:
+            time.sleep(0.001)
+        errors = []
+        waiter = threading.Thread(target=lambda: self.collect_error(flight, errors, lambda: "unused"))
+        waiter.start()
+        while flight.get_stats()["coalesced"] < 1:
+            time.sleep(0.001)
+        started = time.monotonic()
+        release.set()
+        leader.join(5)
+        waiter.join(5)
+        # Released right away, not after the timeout
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(interruptions, [1])
+        self.assertEqual(errors, ["SingleFlight: The leader was interrupted"])
+        self.assertEqual(flight.get_stats()["in_flight"], 0)
+
+    def collect_error(self, flight, errors, function):
+        try:
+            flight.do("key", function)
+        except Exception as e:
+            errors.append(str(e))
+
+if __name__ == '__main__':
+    unittest.main()
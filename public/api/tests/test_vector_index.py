@@ -0,0 +1,57 @@
+import unittest
+import numpy as np
+from engine.vector_index import VectorIndex
+
+class TestVectorIndex(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.recordIDs = [10, 20, 30, 40, 50, 60]
+        self.vectors = rng.normal(size=(len(self.recordIDs), 8))
+        self.index = VectorIndex("test", self.recordIDs, self.vectors)
+
+    def brute_force(self, query):
+        vectors = self.vectors / np.linalg.norm(self.vectors, axis=1, keepdims=True)
+        scores = vectors @ query
+        order = np.argsort(-scores)
+        return [self.recordIDs[i] for i in order]
+
+    def test_matrix_is_normalized(self):
+        self.assertEqual(self.index.matrix.dtype, np.float32)
+        np.testing.assert_allclose(np.linalg.norm(self.index.matrix, axis=1), 1, rtol=1e-5)
+
+    def test_search_matches_brute_force(self):
+        query = self.index.get_vector(30)
+        expected = self.brute_force(query)
+        results = self.index.search(query, 3)
+        self.assertEqual([recordID for recordID, _ in results], expected[:3])
+        self.assertEqual(results[0][0], 30)
+
+    def test_search_pagination_and_exclude(self):
+        query = self.index.get_vector(30)
+        expected = [recordID for recordID in self.brute_force(query) if recordID != 30]
+        page_1 = self.index.search(query, 2, offset=0, exclude=[30])
+        page_2 = self.index.search(query, 2, offset=2, exclude=[30])
+        page_3 = self.index.search(query, 2, offset=4, exclude=[30])
+        recordIDs = [recordID for recordID, _ in page_1 + page_2 + page_3]
+        self.assertEqual(recordIDs, expected)
+
+    def test_search_out_of_range(self):
+        query = self.index.get_vector(10)
+        self.assertEqual(self.index.search(query, 5, offset=10), [])
+        self.assertIsNone(self.index.get_vector(1234))
+    def test_search_batch_matches_search(self):
+        queries = np.stack([self.index.get_vector(10), self.index.get_vector(30)])
+        rows, scores = self.index.search_batch(queries, 3, exclude=[[10], [30]])
+        for query, query_rows, query_scores, recordID in zip(queries, rows, scores, [10, 30]):
+            results = self.index.search(query, 3, exclude=[recordID])
+            self.assertEqual(self.index.recordIDs[query_rows].tolist(), [resultRecordID for resultRecordID, _ in results])
+            np.testing.assert_allclose(query_scores, [score for _, score in results], rtol=1e-5)
+
+        # More results than vectors: the excluded one comes last with a score of -inf
+        rows, scores = self.index.search_batch(queries[:1], 100, exclude=[[10]])
+        self.assertEqual(rows.shape, (1, len(self.index)))
+        self.assertEqual(self.index.recordIDs[rows[0, -1]], 10)
+        self.assertEqual(scores[0, -1], -np.inf)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+"""
+    Compares the text embeddings of the inference backends (see engine/backends.py)
+    with the fp32 embeddings, on the stored keyword set of each model.
+
+    python verify_backends.py [--models art-mini art-large] [--backends int8 onnx] [--min-cosine 0.99]
+
+    For every model and backend, prints the cosine similarity between the backend embeddings and
+        - the fp32 PyTorch embeddings computed now ("vs fp32")
+        - the keyword embeddings stored on disk ("vs stored")
+    and the encoding time. Exits with code 1 if a backend drifts below --min-cosine.
+"""
+import argparse
+import json
+import sys
+import time
+import numpy as np
+from settings import get_paths
+from engine.backends import BACKENDS
+from engine.augmentation import normalize_rows
+from engine.model import Model
+
+def load_keyword_set(keywords, langs = None, limit = None):
+    texts = []
+    stored = []
+    for lang in keywords:
+        if langs is not None and lang not in langs:
+            continue
+        term_data = json.load(open(keywords[lang]["term_data"], "r", encoding="utf-8"))
+        embeddings = np.load(keywords[lang]["path"])
+        # The rows of the embeddings follow the order of the keys of term_data
+        terms = list(term_data.keys())
+        if limit is not None:
+            terms = terms[:limit]
+        texts.extend(terms)
+        stored.append(embeddings[:len(terms)])
+    return texts, np.concatenate(stored, axis=0)
+
+def cosine_report(embeddings, reference):
+    cosines = np.einsum("ij,ij->i", normalize_rows(embeddings), normalize_rows(reference))
+    return {
+        "mean": float(cosines.mean()),
+        "min": float(cosines.min()),
+        "p01": float(np.percentile(cosines, 1)),
+    }
+
+def encode_timed(model, texts):
+    start_time = time.perf_counter()
+    embeddings = model.encode_texts_uncached(texts)
+    return embeddings, time.perf_counter() - start_time
+
+def format_report(report):
+    return f"mean={report['mean']:.5f} min={report['min']:.5f} p01={report['p01']:.5f}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Cosine drift of the inference backends against fp32")
+    parser.add_argument("--models", nargs="*", default=None, help="Names of the models (default: all)")
+    parser.add_argument("--backends", nargs="*", default=["int8", "onnx"], choices=BACKENDS)
+    parser.add_argument("--langs", nargs="*", default=None, help="Languages of the keywords (default: all)")
+    parser.add_argument("--limit", type=int, default=None, help="Maximum number of keywords per language")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--min-cosine", type=float, default=0.99, help="Minimum accepted cosine similarity vs fp32")
+    args = parser.parse_args()
+
+    failed = False
+    for embedding in get_paths()["embeddings"]:
+        if args.models is not None and embedding["name"] not in args.models:
+            continue
+
+        print(f"Model {embedding['name']}")
+        texts, stored = load_keyword_set(embedding["keywords"], langs=args.langs, limit=args.limit)
+        print(f"    {len(texts)} keywords")
+
+        reference_model = Model(
+            embedding["name"],
+            embedding["base_name"],
+            embedding["weights_path"],
+            device="cpu",
+            batch_size=args.batch_size,
+            backend="torch"
+        )
+        reference, reference_time = encode_timed(reference_model, texts)
+        del reference_model
+        print(f"    torch : {reference_time:.2f}s, vs stored {format_report(cosine_report(reference, stored))}")
+
+        for backend in args.backends:
+            if backend == "torch":
+                continue
+            model = Model(
+                embedding["name"],
+                embedding["base_name"],
+                embedding["weights_path"],
+                device="cpu",
+                batch_size=args.batch_size,
+                backend=backend,
+                onnx_path=embedding.get("onnx_path", None)
+            )
+            embeddings, backend_time = encode_timed(model, texts)
+            del model
+
+            vs_fp32 = cosine_report(embeddings, reference)
+            vs_stored = cosine_report(embeddings, stored)
+            speedup = reference_time / backend_time if backend_time > 0 else float("inf")
+            print(f"    {backend} : {backend_time:.2f}s (x{speedup:.2f})")
+            print(f"        vs fp32   {format_report(vs_fp32)}")
+            print(f"        vs stored {format_report(vs_stored)}")
+            if vs_fp32["min"] < args.min_cosine:
+                print(f"    ✗ : {backend} drifts below {args.min_cosine}")
+                failed = True
+            else:
+                print(f"    ✓ : {backend} within {args.min_cosine}")
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
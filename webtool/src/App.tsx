@@ -143,7 +143,9 @@ const App: React.FC = () => {
           "page_size": 30,
           "version": settings.method,
           "rocchio_k": settings.rocchio_k,
-          "rocchio_scale": settings.rocchio_scale
+          "rocchio_scale": settings.rocchio_scale,
+          // The next pages are read from the ranked list of the first one
+          "cursor": isFollowingOfPreviousQuery ? updatedTabs[tabIndex].cursor : undefined
         };
         body["soft_constraints"] = body["soft_constraints"].map((part: QueryPart) => {
           return {
@@ -188,6 +190,7 @@ const App: React.FC = () => {
             // We are not following the previous query ==> We replace the existing results
             updatedTabs[tabIndex].content.results = (data as SuccessfulQueryResponse).data;
           }
+          updatedTabs[tabIndex].cursor = data["cursor"];
 
           setTabs(updatedTabs);
         } catch (error) {
@@ -6,6 +6,7 @@ interface ApiResponse {
     error_code?: number;
     error_message?: string;
     data?: any;
+    cursor?: string;
 }
 
 interface SuccessfulQueryResponse extends ApiResponse {
@@ -3,4 +3,5 @@ export interface TabData {
     identifier: string;
     content: Record<string, any>; // Dictionary-like structure
     page?: number;
+    cursor?: string; // Ranked list of the query kept by the server (next pages)
 }
\ No newline at end of file